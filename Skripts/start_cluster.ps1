@@ -0,0 +1,6 @@
+$ErrorActionPreference = "Stop"
+Set-Location (Join-Path $PSScriptRoot "..\backend")
+.\.venv\Scripts\Activate.ps1
+# ZEO-Server + mehrere uvicorn-Worker (Standard: 4)
+$workers = if ($env:WORKERS) { $env:WORKERS } else { 4 }
+python -m app.launcher --workers $workers --port 8000
@@ -0,0 +1,7 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# ZEO-Server + mehrere uvicorn-Worker (Standard: 4)
+cd "$(dirname "$0")/../backend"
+source .venv/bin/activate
+python -m app.launcher --workers "${WORKERS:-4}" --port 8000
@@ -1,6 +1,6 @@
 from __future__ import annotations
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Dict, Any, Optional
 from .schemas import RouteCreateRequest, RouteResponse, RouteListResponse
 from .models import PersonalRoute, Coordinates, OpenRouteServiceGeometry
 from .repository import create_route, list_routes, get_route, delete_route
@@ -8,8 +8,11 @@ from .repository import create_route, list_routes, get_route, delete_route
 router = APIRouter(prefix="/api/routes", tags=["PersonalRoutes"])
 
 @router.get("", response_model=List[RouteResponse])
-def list_personal_routes() -> List[Dict[str, Any]]:
-    return list_routes()
+def list_personal_routes(
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    return list_routes(limit=limit, after=after)
 
 @router.post("", response_model=RouteResponse, status_code=201)
 def create_personal_route(payload: RouteCreateRequest) -> Dict[str, Any]:
@@ -0,0 +1,236 @@
+from __future__ import annotations
+import asyncio
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+class TtlLruCache:
+    """
+    Begrenzter In-Memory-Cache mit Ablaufzeit pro Eintrag.
+    Ist der Cache voll, wird der am längsten nicht genutzte Eintrag verdrängt (LRU).
+    Abgelaufene Einträge bleiben noch `stale_seconds` für `get_stale()` erhalten
+    (stale-while-revalidate), `get()` liefert sie nicht mehr.
+    Alle Methoden sind thread-sicher (FastAPI führt sync-Handler im Threadpool aus).
+    """
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        stale_seconds: float = 0,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key: Hashable, count: bool) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return None
+        expires_at, value = entry
+        now = self._clock()
+        if expires_at <= now:
+            if expires_at + self.stale_seconds <= now:
+                del self._entries[key]
+                self.expirations += 1
+            if count:
+                self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            return self._lookup(key, count=True)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Wie get(), zählt aber weder Treffer noch Fehlschläge."""
+        with self._lock:
+            return self._lookup(key, count=False)
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Abgelaufener, aber noch nicht verworfener Eintrag (None, wenn frisch oder fehlend)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            now = self._clock()
+            if expires_at > now or expires_at + self.stale_seconds <= now:
+                return None
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Leert den Cache und setzt die Zähler zurück."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def normalize_query(text: str) -> str:
+    """Vereinheitlicht Suchtexte: Unicode-NFC, Kleinschreibung, einfache Leerzeichen."""
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+def _feature_label(feature: Dict[str, Any]) -> str:
+    properties = feature.get("properties") or {}
+    return normalize_query(str(properties.get("label") or properties.get("name") or ""))
+
+
+def _label_matches(label: str, query_terms: List[str]) -> bool:
+    label_terms = label.replace(",", " ").split()
+    return all(
+        any(label_term.startswith(query_term) for label_term in label_terms)
+        for query_term in query_terms
+    )
+
+
+class AutocompleteCache:
+    """
+    Cache für ORS-Autocomplete-Antworten, Schlüssel: (normalisierter Text, size).
+
+    Für einen längeren Suchtext ("züri") wird ein gecachtes Ergebnis eines kürzeren
+    Präfixes ("zür") wiederverwendet, sofern nach dem Filtern noch mindestens
+    `size` Vorschläge übrig bleiben oder ORS für den Präfix weniger als `size`
+    Vorschläge geliefert hat (dann ist das Präfix-Ergebnis bereits vollständig).
+    """
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        min_prefix_length: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+        stale_seconds: float = 0,
+    ) -> None:
+        self._cache = TtlLruCache(max_entries, ttl_seconds, clock=clock, stale_seconds=stale_seconds)
+        self.min_prefix_length = min_prefix_length
+        self.prefix_hits = 0
+
+    def lookup(self, text: str, size: int) -> Optional[Dict[str, Any]]:
+        normalized = normalize_query(text)
+        cached = self._cache.peek((normalized, size))
+        if cached is not None:
+            self._cache.get((normalized, size))
+            return cached
+
+        query_terms = normalized.split()
+        for length in range(len(normalized) - 1, self.min_prefix_length - 1, -1):
+            prefix = normalized[:length].rstrip()
+            prefix_result = self._cache.peek((prefix, size))
+            if prefix_result is None:
+                continue
+            features = prefix_result.get("features") or []
+            matching = [
+                feature for feature in features
+                if _label_matches(_feature_label(feature), query_terms)
+            ]
+            if len(matching) >= size or len(features) < size:
+                self.prefix_hits += 1
+                return {**prefix_result, "features": matching[:size]}
+            break
+
+        self._cache.get((normalized, size))  # zählt den Fehlschlag
+        return None
+
+    def lookup_stale(self, text: str, size: int) -> Optional[Dict[str, Any]]:
+        """Abgelaufene Antwort für genau diesen Text (ohne Präfix-Suche), siehe TtlLruCache.get_stale."""
+        return self._cache.get_stale((normalize_query(text), size))
+
+    def store(self, text: str, size: int, response: Dict[str, Any]) -> None:
+        self._cache.set((normalize_query(text), size), response)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self.prefix_hits = 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats["prefix_hits"] = self.prefix_hits
+        return stats
+
+
+def quantize_coordinates(coordinates: Sequence[float], precision: int) -> Tuple[float, ...]:
+    """Rundet Koordinaten auf `precision` Nachkommastellen (5 ≈ 1 m), als Cache-Schlüssel."""
+    return tuple(round(value, precision) for value in coordinates)
+
+
+class SingleFlight:
+    """
+    Bündelt gleichzeitige Aufrufe mit gleichem Schlüssel: nur der erste Aufrufer
+    führt die Coroutine aus, alle anderen warten und erhalten dasselbe Ergebnis
+    (bzw. dieselbe Exception). Läuft vollständig im Event-Loop, daher ohne Lock.
+    """
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            # shield: bricht ein Wartender ab, läuft der gemeinsame Aufruf weiter
+            return await asyncio.shield(flight)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        self.executions += 1
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as error:
+            flight.set_exception(error)
+            # verhindert "exception was never retrieved", falls niemand gewartet hat
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
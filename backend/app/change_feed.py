@@ -0,0 +1,166 @@
+"""
+Änderungsprotokoll der gespeicherten Routen (angelegt/gelöscht) für inkrementelles Abgleichen.
+
+Jedes Ereignis ist ein eigener kleiner Datensatz, geschrieben in derselben Transaktion wie
+die Änderung selbst. Sein `_p_serial` ist danach die Kennung der ZODB-Transaktion – über
+alle Worker hinweg monoton in Commit-Reihenfolge. Clients merken sich diese Kennung als
+Token und fragen nur die Ereignisse danach ab. Einen gemeinsamen Zähler, an dem sich jede
+Schreibtransaktion einen Konflikt holen würde, gibt es nicht: die Ereignisse sind auf
+Teilbereiche (Hash der Kennung) verteilt und darin nach Aufnahmezeit sortiert. Eine
+Abfrage führt die Teilbereiche ab dem Token (minus der maximal erwarteten
+Transaktionsdauer) nach Aufnahmezeit zusammen und liest nur so weit, wie sie Ereignisse
+zurückgibt.
+"""
+from __future__ import annotations
+import heapq
+import time
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from persistent import Persistent
+from BTrees.OOBTree import OOBTree
+from ZODB.TimeStamp import TimeStamp
+
+CREATED = "created"
+DELETED = "deleted"
+
+# Längste erwartete Zeit zwischen Aufnahme eines Ereignisses und Commit (inkl. Wiederholungen
+# und Uhrenabweichung zwischen Worker und ZEO-Server)
+SCAN_WINDOW_SECONDS = 60.0
+# Teilbereiche des Protokolls: ohne sie landet jedes neue Ereignis im selben letzten Bucket,
+# und gleichzeitige Schreiber kollidieren dort bei jedem Bucket-Split
+FEED_SHARDS = 16
+
+
+class ChangeTokenExpired(Exception):
+    """Token älter als das aufbewahrte Protokoll: der Client muss die ganze Liste neu laden."""
+
+
+def parse_change_token(token: str) -> bytes:
+    """Token (16 Hex-Zeichen) → ZODB-Transaktionskennung; ValueError bei ungültigem Format."""
+    serial = bytes.fromhex(token)
+    if len(serial) != 8:
+        raise ValueError("change token must be 16 hex characters")
+    return serial
+
+
+def transaction_time(serial: bytes) -> float:
+    return TimeStamp(serial).timeTime()
+
+
+def _shard(identifier: str) -> int:
+    return zlib.crc32(identifier.encode("utf-8")) % FEED_SHARDS
+
+
+class RouteChange(Persistent):
+    """Ein Ereignis; `_p_serial` = Transaktion, in der es geschrieben wurde."""
+
+    def __init__(self, kind: str, identifier: str, recorded_at: float) -> None:
+        self.kind = kind
+        self.identifier = identifier
+        self.recorded_at = recorded_at
+
+    @property
+    def serial(self) -> bytes:
+        # Ghosts kennen ihren Serial erst nach dem Laden
+        self._p_activate()
+        return self._p_serial
+
+
+class RouteChangeFeed(Persistent):
+    """
+    `events`: (Teilbereich, recorded_at, Kennung, Art) → RouteChange. Neue Schlüssel
+    verteilen sich auf die Enden der `FEED_SHARDS` Teilbereiche, gleichzeitige Schreiber
+    ändern verschiedene Buckets und werden von der Konfliktauflösung der BTrees
+    zusammengeführt. Vor `created_at` gab es kein Protokoll, vor `trimmed_before`
+    aufgenommene Ereignisse sind entfernt.
+    """
+
+    shards: Optional[int] = None
+
+    def __init__(self, now: Optional[float] = None) -> None:
+        self.events = OOBTree()
+        self.created_at = time.time() if now is None else now
+        self.trimmed_before: Optional[float] = None
+        self.shards = FEED_SHARDS
+
+    def record(self, kind: str, identifier: str, now: Optional[float] = None) -> None:
+        recorded_at = time.time() if now is None else now
+        self.events[(_shard(identifier), recorded_at, identifier, kind)] = RouteChange(kind, identifier, recorded_at)
+
+    def _window(self, shard: int, start: Optional[float] = None, end: Optional[float] = None):
+        # Schlüssel eines Teilbereichs mit recorded_at in [start, end)
+        return self.events.items(
+            min=(shard,) if start is None else (shard, start),
+            max=(shard + 1,) if end is None else (shard, end),
+            excludemax=True,
+        )
+
+    def changes_since(self, since: bytes, limit: int) -> Tuple[List[RouteChange], Optional[bytes], bool]:
+        """
+        Ereignisse aus Transaktionen nach `since` in Commit-Reihenfolge, höchstens `limit`
+        (die Ereignisse der letzten Transaktion werden nie getrennt). Liefert
+        (Ereignisse, Kennung der letzten gelieferten Transaktion, weitere vorhanden).
+        """
+        since_time = transaction_time(since)
+        if since_time < self.created_at or (
+            self.trimmed_before is not None and since_time < self.trimmed_before + SCAN_WINDOW_SECONDS
+        ):
+            raise ChangeTokenExpired()
+        changes: List[RouteChange] = []
+        last_serial: Optional[bytes] = None
+        for serial, change in self._in_commit_order(since, since_time):
+            if len(changes) >= limit and serial != last_serial:
+                return changes, last_serial, True
+            changes.append(change)
+            last_serial = serial
+        return changes, last_serial, False
+
+    def _in_commit_order(self, since: bytes, since_time: float) -> Iterator[Tuple[bytes, RouteChange]]:
+        # Die Teilbereiche sind nach Aufnahmezeit sortiert, nicht nach Transaktion: zusammenführen
+        # und Ereignisse zurückhalten, bis der Strom mehr als SCAN_WINDOW_SECONDS nach ihrer
+        # Transaktion angekommen ist – später aufgenommene Ereignisse gehören zu späteren
+        # Transaktionen. Innerhalb einer Transaktion nach Aufnahmezeit.
+        stream = heapq.merge(
+            *(self._window(shard, since_time - SCAN_WINDOW_SECONDS) for shard in range(FEED_SHARDS)),
+            key=lambda item: item[0][1],
+        )
+        # (Serial, recorded_at, Schlüssel, Transaktionszeit, Ereignis); Schlüssel sind eindeutig
+        pending: List[Tuple[bytes, float, tuple, float, RouteChange]] = []
+        for key, change in stream:
+            recorded_at = key[1]
+            while pending and pending[0][3] + SCAN_WINDOW_SECONDS < recorded_at:
+                serial, _, _, _, ready = heapq.heappop(pending)
+                yield serial, ready
+            serial = change.serial
+            if serial > since:
+                heapq.heappush(pending, (serial, recorded_at, key, transaction_time(serial), change))
+        while pending:
+            serial, _, _, _, ready = heapq.heappop(pending)
+            yield serial, ready
+
+    def trim(self, retention_seconds: float, now: Optional[float] = None) -> int:
+        """Entfernt Ereignisse älter als `retention_seconds` (Commit durch Aufrufer)."""
+        cutoff = (time.time() if now is None else now) - retention_seconds
+        expired = [key for shard in range(FEED_SHARDS) for key, _ in self._window(shard, end=cutoff)]
+        for key in expired:
+            del self.events[key]
+        if expired:
+            self.trimmed_before = max(cutoff, self.trimmed_before or cutoff)
+        return len(expired)
+
+
+def get_route_change_feed(root) -> RouteChangeFeed:
+    """Liefert das Protokoll; wird beim ersten Zugriff angelegt (Commit durch Aufrufer)."""
+    if "route_changes" not in root:
+        root["route_changes"] = RouteChangeFeed()
+    feed = root["route_changes"]
+    if feed.shards != FEED_SHARDS:
+        # Protokoll aus einer älteren Version ohne bzw. mit anderer Aufteilung: dieselben
+        # Ereignisse (mit ihrem Serial) unter neuen Schlüsseln
+        events = OOBTree()
+        for change in feed.events.values():
+            events[(_shard(change.identifier), change.recorded_at, change.identifier, change.kind)] = change
+        feed.events = events
+        feed.shards = FEED_SHARDS
+    return feed
@@ -18,6 +18,21 @@ class Settings(BaseModel):
         else ["http://127.0.0.1:5500", "http://localhost:5500"]
     )
 
+    # ZODB-Verbindungspool und Objekt-Cache pro Verbindung
+    database_pool_size: int = int(os.getenv("DATABASE_POOL_SIZE", "7"))
+    database_cache_size: int = int(os.getenv("DATABASE_CACHE_SIZE", "10000"))
+
+    # Geometrien ab dieser Grösse (Bytes) als ZODB-Blob speichern; 0 = nie
+    geometry_blob_threshold_bytes: int = int(os.getenv("ROUTE_GEOMETRY_BLOB_THRESHOLD_BYTES", "0"))
+    database_blob_dir: str = os.getenv(
+        "DATABASE_BLOB_DIR", os.path.splitext(database_file)[0] + "-blobs"
+    )
+    # Zoomstufen, für die beim Speichern vereinfachte Geometrien (Douglas-Peucker, ≤ 1 Pixel
+    # Abweichung) vorberechnet werden; GET /api/routes/{identifier}/geometry?zoom= wählt die Stufe
+    geometry_level_zooms: list[int] = [
+        int(zoom) for zoom in os.getenv("ROUTE_GEOMETRY_LEVEL_ZOOMS", "5,8,11,14").split(",") if zoom.strip()
+    ]
+
 @lru_cache
 def get_settings() -> Settings:
     return Settings()
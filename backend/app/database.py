@@ -1,12 +1,16 @@
 from __future__ import annotations
 import os
-from typing import Optional, Dict, Any
+from contextlib import closing, contextmanager
+from itertools import islice
+from typing import Optional, Dict, Any, Iterator
 from ZODB import DB
+from ZODB.Connection import Connection
 from ZODB.FileStorage import FileStorage
 import transaction
 from BTrees.OOBTree import OOBTree
 import persistent
 from .config import get_settings
+from .geometry_storage import GeometryData, decode_coordinates, encode_coordinates
 
 class RootContainer(persistent.Persistent):
     """
@@ -20,27 +24,46 @@ class DatabaseManager:
     """
     Verwaltet den ZODB-Storage und stellt Methoden zur Verfügung,
     um das Root-Objekt und Collections sicher bereitzustellen.
+    Jeder Zugriff erhält eine eigene Verbindung aus dem Pool (statt einer
+    gemeinsamen Verbindung für alle Threads).
     """
-    def __init__(self, database_path: str) -> None:
+    def __init__(
+        self,
+        database_path: str,
+        pool_size: int = 7,
+        cache_size: int = 10000,
+        blob_dir: Optional[str] = None,
+    ) -> None:
         os.makedirs(os.path.dirname(database_path), exist_ok=True)
-        self._storage = FileStorage(database_path)
-        self._db = DB(self._storage)
-        self._connection = None
-        self._root: Optional[RootContainer] = None
-
-    def connect(self) -> RootContainer:
-        if self._connection is None:
-            self._connection = self._db.open()
-            if not hasattr(self._connection.root(), "app"):
-                self._connection.root().app = RootContainer()
-                transaction.commit()
-            self._root = self._connection.root().app
-        return self._root  # type: ignore[return-value]
+        self._storage = FileStorage(database_path, blob_dir=blob_dir)
+        self._db = DB(self._storage, pool_size=pool_size, cache_size=cache_size)
+        self._ensure_root_container()
+
+    def _ensure_root_container(self) -> None:
+        with self.open() as connection:
+            if not hasattr(connection.root(), "app"):
+                connection.root().app = RootContainer()
+                connection.transaction_manager.commit()
+
+    @contextmanager
+    def open(self) -> Iterator[Connection]:
+        """
+        Öffnet eine Verbindung mit eigenem TransactionManager (thread-unabhängig).
+        Nicht committete Änderungen werden beim Verlassen verworfen.
+        """
+        connection = self._db.open(transaction_manager=transaction.TransactionManager())
+        try:
+            yield connection
+        finally:
+            connection.transaction_manager.abort()
+            connection.close()
+
+    @contextmanager
+    def container(self) -> Iterator[RootContainer]:
+        with self.open() as connection:
+            yield connection.root().app
 
     def close(self) -> None:
-        if self._connection is not None:
-            self._connection.close()
-            self._connection = None
         if self._db is not None:
             self._db.close()
         if self._storage is not None:
@@ -49,35 +72,103 @@ class DatabaseManager:
 # Singleton-artige Instanz für FastAPI-Lebenszyklus
 _database_manager: Optional[DatabaseManager] = None
 
-def get_database_root() -> RootContainer:
+def get_database_manager() -> DatabaseManager:
     global _database_manager
     settings = get_settings()
     if _database_manager is None:
-        _database_manager = DatabaseManager(settings.database_file)
-    return _database_manager.connect()
+        _database_manager = DatabaseManager(
+            settings.database_file,
+            pool_size=settings.database_pool_size,
+            cache_size=settings.database_cache_size,
+            # Blob-Verzeichnis nur, wenn grosse Geometrien in Blobs landen sollen
+            blob_dir=settings.database_blob_dir if settings.geometry_blob_threshold_bytes else None,
+        )
+    return _database_manager
+
+def _commit(container: RootContainer) -> None:
+    container._p_jar.transaction_manager.commit()
+
+def _pack_geometry(geometry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # Koordinatenliste → kompakter Puffer (array('d')) in einem eigenen Datensatz; haben alle
+    # Punkte eine Höhe (ORS mit elevation=true), wird sie mitgespeichert
+    if not geometry or not isinstance(geometry.get("coordinates"), list):
+        return geometry
+    coordinates = geometry["coordinates"]
+    dimensions = 3 if coordinates and all(len(point) >= 3 for point in coordinates) else 2
+    packed = dict(geometry)
+    packed["coordinates"] = GeometryData(
+        encode_coordinates(coordinates, dimensions),
+        get_settings().geometry_blob_threshold_bytes,
+    )
+    if dimensions != 2:
+        packed["coordinate_dimensions"] = dimensions
+    return packed
+
+def _unpack_geometry(geometry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # Ältere Datensätze enthalten noch die Liste → unverändert zurückgeben
+    if not geometry or not isinstance(geometry.get("coordinates"), GeometryData):
+        return geometry
+    unpacked = dict(geometry)
+    dimensions = unpacked.pop("coordinate_dimensions", 2)
+    unpacked["coordinates"] = decode_coordinates(geometry["coordinates"].read(), dimensions)
+    return unpacked
 
 def add_personal_route(route_identifier: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    root = get_database_root()
-    root.personal_routes[route_identifier] = payload
-    transaction.commit()
+    with get_database_manager().container() as root:
+        root.personal_routes[route_identifier] = dict(payload, geometry=_pack_geometry(payload.get("geometry")))
+        _commit(root)
     return payload
 
-def list_personal_routes() -> list[Dict[str, Any]]:
-    root = get_database_root()
-    return [
-        dict({"route_identifier": key}, **value)  # keine Abkürzung 'id'
-        for key, value in root.personal_routes.items()
-    ]
+def iterate_personal_routes(
+    after: Optional[str] = None, include_geometry: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Liefert Routen nacheinander in Schlüsselreihenfolge, ab dem Cursor `after` (exklusiv).
+    Ohne `include_geometry` bleibt die Geometrie ungeladen (`geometry` ist dann None).
+    """
+    with get_database_manager().container() as root:
+        if after is None:
+            items = root.personal_routes.items()
+        else:
+            items = root.personal_routes.items(min=after, excludemin=True)
+        for key, value in items:
+            geometry = _unpack_geometry(value.get("geometry")) if include_geometry else None
+            yield dict({"route_identifier": key}, **dict(value, geometry=geometry))  # keine Abkürzung 'id'
+
+def list_personal_routes(
+    limit: Optional[int] = None, after: Optional[str] = None, include_geometry: bool = False
+) -> list[Dict[str, Any]]:
+    with closing(iterate_personal_routes(after, include_geometry)) as routes:
+        return list(islice(routes, limit))
 
 def get_personal_route(route_identifier: string) -> Optional[Dict[str, Any]]:  # type: ignore[name-defined]
     # Note: type: ignore, weil 'string' absichtlich ausgeschrieben ist (keine Kurzform)
-    root = get_database_root()
-    return root.personal_routes.get(route_identifier)
+    with get_database_manager().container() as root:
+        stored = root.personal_routes.get(route_identifier)
+        if stored is None:
+            return None
+        # Geometrie erst hier dekodieren (nur für die einzelne Route)
+        return dict(stored, geometry=_unpack_geometry(stored.get("geometry")))
 
 def delete_personal_route(route_identifier: string) -> bool:  # type: ignore[name-defined]
-    root = get_database_root()
-    if route_identifier in root.personal_routes:
-        del root.personal_routes[route_identifier]
-        transaction.commit()
-        return True
-    return False
+    with get_database_manager().container() as root:
+        if route_identifier in root.personal_routes:
+            del root.personal_routes[route_identifier]
+            _commit(root)
+            return True
+        return False
+
+def migrate_personal_route_geometries(batch_size: int = 1000) -> Dict[str, int]:
+    """Wandelt gespeicherte Koordinatenlisten in kompakte Puffer um (python -m app.manage migrate-geometry)."""
+    migrated = 0
+    with get_database_manager().container() as root:
+        for route_identifier, stored in root.personal_routes.items():
+            geometry = stored.get("geometry")
+            if not geometry or not isinstance(geometry.get("coordinates"), list):
+                continue
+            root.personal_routes[route_identifier] = dict(stored, geometry=_pack_geometry(geometry))
+            migrated += 1
+            if migrated % batch_size == 0:
+                _commit(root)
+        _commit(root)
+        return {"migrated": migrated, "routes": len(root.personal_routes)}
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import threading
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from persistent import Persistent
+from BTrees.OOBTree import OOBTree, OOTreeSet
+from BTrees.Length import Length
+
+from .caching import normalize_query
+
+CacheKey = Tuple[str, int]
+
+
+class GeocodeCacheEntry(Persistent):
+    """Ein gecachtes ORS-Geocoding-Ergebnis (eigener Datensatz, wird nur bei Bedarf geladen)."""
+    def __init__(self, response: Dict[str, Any], stored_at: float) -> None:
+        self.response = response
+        self.stored_at = stored_at
+
+
+class GeocodeCacheStore(Persistent):
+    """
+    Persistenter Teil des Geocode-Caches im ZODB-Root (neben `routes`).
+    `entries` bildet (normalisierter Text, size) auf Einträge ab, `by_age` hält
+    (stored_at, Schlüssel) sortiert, damit die ältesten Einträge billig verdrängt werden.
+    """
+    def __init__(self) -> None:
+        self.entries = OOBTree()
+        self.by_age = OOTreeSet()
+        self.length = Length()
+
+
+def get_geocode_cache_store(root) -> GeocodeCacheStore:
+    """Liefert den Cache-Container; wird beim ersten Zugriff angelegt (Commit durch Aufrufer)."""
+    if "geocode_cache" not in root:
+        root["geocode_cache"] = GeocodeCacheStore()
+    return root["geocode_cache"]
+
+
+class GeocodeCache:
+    """
+    Zugriffsschicht auf den persistenten Geocode-Cache mit Ablaufzeit und
+    fester Obergrenze. Die Treffer-/Fehlschlag-Zähler leben nur im Prozess.
+    """
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, size: int) -> CacheKey:
+        return (normalize_query(text), size)
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, store: Optional[GeocodeCacheStore], text: str, size: int) -> Optional[Dict[str, Any]]:
+        entry = store.entries.get(self.make_key(text, size)) if store is not None else None
+        if entry is None or entry.stored_at + self.ttl_seconds <= self._clock():
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        return entry.response
+
+    def lookup_stale(
+        self, store: Optional[GeocodeCacheStore], text: str, size: int, stale_seconds: float
+    ) -> Optional[Dict[str, Any]]:
+        """Abgelaufenes Ergebnis, höchstens `stale_seconds` über der Ablaufzeit (zählt nicht mit)."""
+        entry = store.entries.get(self.make_key(text, size)) if store is not None else None
+        if entry is None:
+            return None
+        expires_at = entry.stored_at + self.ttl_seconds
+        if expires_at > self._clock() or expires_at + stale_seconds <= self._clock():
+            return None
+        return entry.response
+
+    def store(self, store: GeocodeCacheStore, text: str, size: int, response: Dict[str, Any]) -> None:
+        """Legt ein Ergebnis ab und verdrängt bei Überlauf die ältesten Einträge."""
+        key = self.make_key(text, size)
+        now = self._clock()
+        existing = store.entries.get(key)
+        if existing is not None:
+            store.by_age.remove((existing.stored_at, key))
+            existing.response = response
+            existing.stored_at = now
+        else:
+            store.entries[key] = GeocodeCacheEntry(response, now)
+            store.length.change(1)
+        store.by_age.add((now, key))
+
+        while store.length() > self.max_entries:
+            oldest = store.by_age.minKey()
+            store.by_age.remove(oldest)
+            del store.entries[oldest[1]]
+            store.length.change(-1)
+
+    def clear(self, store: GeocodeCacheStore) -> int:
+        removed = store.length()
+        store.entries.clear()
+        store.by_age.clear()
+        store.length.set(0)
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+        return removed
+
+    def inspect(self, store: GeocodeCacheStore, limit: int = 50) -> Dict[str, Any]:
+        """Statistik plus die `limit` ältesten Einträge (die nächsten Verdrängungskandidaten)."""
+        now = self._clock()
+        oldest: List[Dict[str, Any]] = [
+            {
+                "text": key[0],
+                "size": key[1],
+                "stored_at": stored_at,
+                "expired": stored_at + self.ttl_seconds <= now,
+            }
+            for stored_at, key in islice(store.by_age.keys(), max(0, limit))
+        ]
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "entries": store.length(),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "oldest": oldest,
+        }
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import math
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+BoundingBox = Tuple[float, float, float, float]  # (min_longitude, min_latitude, max_longitude, max_latitude)
+
+
+def _decode_polyline_values(encoded: str) -> List[int]:
+    # Alle Varints in einem Durchlauf über die Bytes; Breite/Länge wechseln sich ab
+    values: List[int] = []
+    append = values.append
+    result = shift = 0
+    for byte in encoded.encode("ascii"):
+        byte -= 63
+        result |= (byte & 0x1F) << shift
+        if byte < 0x20:
+            append(~(result >> 1) if result & 1 else result >> 1)
+            result = shift = 0
+        else:
+            shift += 5
+    return values
+
+
+def decode_polyline_arrays(encoded: str, precision: int = 5) -> Tuple[array, array]:
+    """
+    Dekodiert eine ORS/Google-Polyline spaltenweise in zwei array('d'):
+    (Breitengrade, Längengrade). Die Deltas werden mit `accumulate` aufsummiert
+    statt Punkt für Punkt.
+    """
+    values = _decode_polyline_values(encoded)
+    factor = 10 ** precision
+    latitudes = array("d", [value / factor for value in accumulate(values[0::2])])
+    longitudes = array("d", [value / factor for value in accumulate(values[1::2])])
+    return latitudes, longitudes
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    """
+    Dekodiert eine ORS/Google-Polyline in eine Liste von (Breitengrad, Längengrad),
+    analog zu `decodePolyline` im Frontend.
+    """
+    latitudes, longitudes = decode_polyline_arrays(encoded, precision)
+    return list(zip(latitudes, longitudes))
+
+
+def encode_polyline(points: Iterable[Tuple[float, float]], precision: int = 5) -> str:
+    """Kodiert (Breitengrad, Längengrad)-Punkte als Polyline; Umkehrung von `decode_polyline`."""
+    factor = 10 ** precision
+    parts: List[str] = []
+    previous_latitude = previous_longitude = 0
+    for latitude, longitude in points:
+        scaled_latitude = int(round(latitude * factor))
+        scaled_longitude = int(round(longitude * factor))
+        for delta in (scaled_latitude - previous_latitude, scaled_longitude - previous_longitude):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                parts.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            parts.append(chr(value + 63))
+        previous_latitude, previous_longitude = scaled_latitude, scaled_longitude
+    return "".join(parts)
+
+
+def bounding_box(points: Iterable[Tuple[float, float]]) -> Optional[BoundingBox]:
+    """Begrenzungsrechteck für (Längengrad, Breitengrad)-Punkte; None bei leerer Eingabe."""
+    longitudes: List[float] = []
+    latitudes: List[float] = []
+    for longitude, latitude in points:
+        longitudes.append(longitude)
+        latitudes.append(latitude)
+    if not longitudes:
+        return None
+    return (min(longitudes), min(latitudes), max(longitudes), max(latitudes))
+
+
+def simplify_indices(xs: Sequence[float], ys: Sequence[float], tolerance: float) -> List[int]:
+    """
+    Douglas-Peucker: Indizes der Punkte, die bei einer maximalen Abweichung von
+    `tolerance` (in Einheiten von xs/ys) erhalten bleiben. Iterativ mit eigenem
+    Stapel, damit lange Routen nicht an die Rekursionsgrenze stossen.
+    """
+    count = len(xs)
+    if count <= 2:
+        return list(range(count))
+    keep = bytearray(count)
+    keep[0] = keep[count - 1] = 1
+    tolerance_squared = tolerance * tolerance
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start_x, start_y = xs[first], ys[first]
+        delta_x, delta_y = xs[last] - start_x, ys[last] - start_y
+        length_squared = delta_x * delta_x + delta_y * delta_y
+        farthest_index, farthest_distance = first, -1.0
+        for index in range(first + 1, last):
+            offset_x, offset_y = xs[index] - start_x, ys[index] - start_y
+            if length_squared:
+                # Abstand zur Strecke (nicht zur Geraden): Projektion auf [0, 1] begrenzen
+                fraction = min(1.0, max(0.0, (offset_x * delta_x + offset_y * delta_y) / length_squared))
+                offset_x -= fraction * delta_x
+                offset_y -= fraction * delta_y
+            distance = offset_x * offset_x + offset_y * offset_y
+            if distance > farthest_distance:
+                farthest_index, farthest_distance = index, distance
+        if farthest_distance > tolerance_squared:
+            keep[farthest_index] = 1
+            stack.append((first, farthest_index))
+            stack.append((farthest_index, last))
+    return [index for index in range(count) if keep[index]]
+
+
+def zoom_tolerance_degrees(zoom: int, tolerance_pixels: float = 1.0) -> float:
+    """Breite von `tolerance_pixels` Kartenpixeln (256er-Kacheln, Web Mercator) in Längengraden."""
+    return tolerance_pixels * 360.0 / (256 * 2 ** zoom)
+
+
+def simplify_polyline_levels(
+    encoded: str, zooms: Iterable[int], tolerance_pixels: float = 1.0
+) -> Dict[int, str]:
+    """
+    Vereinfachte Polylines pro Zoomstufe: auf Stufe z weicht die vereinfachte Linie um
+    höchstens `tolerance_pixels` Bildschirmpixel vom Original ab. Stufen, die keine
+    Punkte gegenüber der nächstfeineren einsparen, werden weggelassen.
+    """
+    latitudes, longitudes = decode_polyline_arrays(encoded)
+    if len(latitudes) <= 2:
+        return {}
+    # Längengrade mit cos(mittlere Breite) skalieren → in der Fläche etwa gleich lange Einheiten
+    # wie die Breitengrade, ein Pixel misst dann überall zoom_tolerance_degrees(...) * cos(Breite)
+    scale = math.cos(math.radians(sum(latitudes) / len(latitudes)))
+    xs = array("d", [longitude * scale for longitude in longitudes])
+    levels: Dict[int, str] = {}
+    finer_count = len(latitudes)
+    for zoom in sorted(set(zooms), reverse=True):
+        indices = simplify_indices(xs, latitudes, zoom_tolerance_degrees(zoom, tolerance_pixels) * scale)
+        if len(indices) >= finer_count:
+            continue
+        levels[zoom] = encode_polyline((latitudes[index], longitudes[index]) for index in indices)
+        finer_count = len(indices)
+    return levels
+
+
+def select_level_zoom(level_zooms: Iterable[int], zoom: Optional[int]) -> Optional[int]:
+    """Gröbste vorberechnete Stufe, die für `zoom` noch genau genug ist (None = volle Geometrie)."""
+    if zoom is None:
+        return None
+    candidates = [level_zoom for level_zoom in level_zooms if level_zoom >= zoom]
+    return min(candidates) if candidates else None
@@ -0,0 +1,64 @@
+"""
+Kompakte Ablage von Routengeometrien in der ZODB.
+
+Eine Geometrie wird als Bytes in einem eigenen persistenten Objekt gespeichert:
+- eigener Datensatz → das Laden einer Route (z. B. für Listen) lädt die Geometrie nicht mit
+- Koordinaten als array('d') statt als Liste von Listen aus einzelnen gepickelten floats
+- ab einer konfigurierbaren Grösse in einem ZODB-Blob (ausserhalb der Storage-Datei)
+"""
+from __future__ import annotations
+import sys
+from array import array
+from typing import Iterable, List, Sequence
+
+from persistent import Persistent
+from ZODB.blob import Blob
+
+
+class GeometryData(Persistent):
+    """Binärdaten einer Geometrie; ab `blob_threshold_bytes` (0 = nie) in einem Blob."""
+
+    def __init__(self, data: bytes, blob_threshold_bytes: int = 0):
+        self.size_bytes = len(data)
+        if blob_threshold_bytes and len(data) >= blob_threshold_bytes:
+            self._blob = Blob(data)
+            self._data = None
+        else:
+            self._blob = None
+            self._data = data
+
+    @property
+    def in_blob(self) -> bool:
+        return self._blob is not None
+
+    def read(self) -> bytes:
+        if self._blob is None:
+            return self._data
+        with self._blob.open("r") as blob_file:
+            return blob_file.read()
+
+
+def encode_coordinates(coordinates: Iterable[Sequence[float]], dimensions: int = 2) -> bytes:
+    """
+    [[lon, lat], ...] → float64-Werte (little-endian) hintereinander: lon, lat, lon, lat, …
+    Mit `dimensions=3` auch die Höhe ([lon, lat, höhe], ORS mit elevation=true); weitere
+    Werte eines Punkts werden nicht gespeichert.
+    """
+    values = array("d")
+    for point in coordinates:
+        if len(point) < dimensions:
+            raise ValueError(f"coordinate {point!r} has fewer than {dimensions} values")
+        values.extend(point[:dimensions])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def decode_coordinates(data: bytes, dimensions: int = 2) -> List[List[float]]:
+    """Umkehrung von `encode_coordinates`."""
+    values = array("d")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    flat = values.tolist()
+    return [flat[index:index + dimensions] for index in range(0, len(flat), dimensions)]
@@ -0,0 +1,179 @@
+"""
+Group Commit: gleichzeitige Schreibzugriffe teilen sich eine ZODB-Transaktion.
+
+Jeder Commit einer FileStorage endet mit einem fsync; bei vielen kleinen Schreibzugriffen
+begrenzt die Sync-Latenz der Platte den Durchsatz, nicht die CPU. Der GroupCommitter
+sammelt Operationen (Funktionen `work(connection)`) für ein kurzes Zeitfenster bzw. bis
+zu einer Höchstzahl und führt sie in einem eigenen Thread in einer einzigen Transaktion
+aus. Jeder Aufrufer wartet, bis dieser gemeinsame Commit durch ist, und erhält dann sein
+eigenes Ergebnis bzw. seine eigene Exception.
+
+- wirft eine Operation (z. B. 404), wird sie aus der Gruppe genommen und die übrigen
+  werden in einer neuen Transaktion erneut ausgeführt – ihre Änderungen fliessen nicht ein
+- scheitert der gemeinsame Commit (Konflikte trotz Wiederholung, Storage-Fehler), wird
+  jede Operation einzeln committet, damit eine fehlerhafte nicht alle anderen mitreisst
+"""
+from __future__ import annotations
+import threading
+import time
+from contextlib import AbstractContextManager
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from ZODB.Connection import Connection
+from ZODB.POSException import ConflictError
+
+T = TypeVar("T")
+_PENDING = object()
+
+
+class _Operation:
+    __slots__ = ("work", "result", "error", "done")
+
+    def __init__(self, work: Callable[[Connection], Any]) -> None:
+        self.work = work
+        self.result: Any = _PENDING
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class _OperationFailed(Exception):
+    """Eine einzelne Operation hat geworfen; die Transaktion wird ohne sie wiederholt."""
+
+
+class GroupCommitter:
+    """
+    `open_connection`: Kontextmanager für eine Verbindung aus dem Pool;
+    `write_transaction(connection, work)`: führt work() aus und committet (inkl. Wiederholung
+    bei Konflikten). `window_seconds`: so lange wird nach der ersten wartenden Operation
+    gesammelt (0 = nur, was während des vorherigen Commits aufgelaufen ist);
+    `max_operations`: Höchstzahl Operationen pro Transaktion.
+    """
+
+    def __init__(
+        self,
+        open_connection: Callable[[], AbstractContextManager],
+        write_transaction: Callable[[Connection, Callable[[], Any]], Any],
+        window_seconds: float,
+        max_operations: int,
+    ) -> None:
+        self._open_connection = open_connection
+        self._write_transaction = write_transaction
+        self.window_seconds = window_seconds
+        self.max_operations = max(1, max_operations)
+        self._condition = threading.Condition()
+        self._pending: List[_Operation] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.groups = 0
+        self.operations = 0
+        self.largest_group = 0
+        self.fallbacks = 0
+
+    def submit(self, work: Callable[[Connection], T]) -> T:
+        """Blockiert, bis die Operation mit ihrer Gruppe committet ist; wirft deren Exception."""
+        operation = _Operation(work)
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+            self._pending.append(operation)
+            # der Schreib-Thread wartet nur auf die erste Operation bzw. eine volle Gruppe
+            if len(self._pending) == 1 or len(self._pending) >= self.max_operations:
+                self._condition.notify()
+        operation.done.wait()
+        if operation.error is not None:
+            raise operation.error
+        return operation.result
+
+    def close(self) -> None:
+        """Wartende Operationen noch committen und den Schreib-Thread beenden (startet bei Bedarf neu)."""
+        with self._condition:
+            thread = self._thread
+            self._stopping = True
+            self._condition.notify()
+        if thread is not None:
+            thread.join()
+        with self._condition:
+            self._stopping = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "groups": self.groups,
+                "operations": self.operations,
+                "largest_group": self.largest_group,
+                "fallbacks": self.fallbacks,
+                "pending": len(self._pending),
+                "window_seconds": self.window_seconds,
+                "max_operations": self.max_operations,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    self._thread = None
+                    return
+                deadline = time.monotonic() + self.window_seconds
+                while len(self._pending) < self.max_operations and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                group = self._pending[:self.max_operations]
+                del self._pending[:self.max_operations]
+            try:
+                self._commit(group)
+            except BaseException as error:
+                # darf den Schreib-Thread nicht beenden, solange Aufrufer warten
+                for operation in group:
+                    if operation.error is None and operation.result is _PENDING:
+                        operation.error = error
+            finally:
+                for operation in group:
+                    operation.done.set()
+
+    def _commit(self, group: List[_Operation]) -> None:
+        with self._condition:
+            self.groups += 1
+            self.operations += len(group)
+            self.largest_group = max(self.largest_group, len(group))
+        with self._open_connection() as connection:
+            remaining = group
+            while remaining:
+                try:
+                    results = self._write_transaction(connection, lambda: self._apply(connection, remaining))
+                except _OperationFailed:
+                    remaining = [operation for operation in remaining if operation.error is None]
+                    continue
+                except Exception:
+                    with self._condition:
+                        self.fallbacks += 1
+                    self._commit_each(connection, remaining)
+                    return
+                for operation, result in zip(remaining, results):
+                    operation.result = result
+                return
+
+    @staticmethod
+    def _apply(connection: Connection, operations: List[_Operation]) -> List[Any]:
+        # wird bei Konflikten wiederholt → jede Operation liest ihre Objekte selbst neu
+        results = []
+        for operation in operations:
+            try:
+                results.append(operation.work(connection))
+            except ConflictError:
+                raise
+            except Exception as error:
+                operation.error = error
+                raise _OperationFailed() from error
+        return results
+
+    def _commit_each(self, connection: Connection, operations: List[_Operation]) -> None:
+        for operation in operations:
+            try:
+                operation.result = self._write_transaction(connection, lambda: operation.work(connection))
+            except Exception as error:
+                operation.error = error
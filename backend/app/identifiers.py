@@ -0,0 +1,17 @@
+"""
+Kollisionsfreie, über den BTree verteilte Kennungen für gespeicherte Routen.
+"""
+from __future__ import annotations
+import uuid
+
+
+def new_route_identifier() -> str:
+    """
+    Zufällige Kennung (uuid4, 32 Hex-Zeichen), eindeutig auch über mehrere Worker-Prozesse (ZEO).
+
+    Bewusst nicht zeitlich sortiert: fortlaufende Schlüssel landen alle im letzten Bucket
+    des Routen-BTrees, gleichzeitige Schreiber kollidieren dort bei jedem Bucket-Split und
+    diese Konflikte lassen sich nicht auflösen. Zufällige Schlüssel verteilen die Einfügungen
+    über den ganzen Baum. Neueste zuerst liefert der Sekundärindex (`order=newest`).
+    """
+    return uuid.uuid4().hex
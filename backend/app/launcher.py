@@ -0,0 +1,149 @@
+"""
+Startet einen ZEO-Server und N uvicorn-Worker, die sich mit ihm verbinden.
+
+    cd backend
+    python -m app.launcher --workers 4 --port 8000
+
+Mit FileStorage kann nur ein Prozess die Datenbankdatei öffnen; über ZEO teilen
+sich beliebig viele Worker-Prozesse dieselbe Datenbank. Das regelmässige Packen
+(DATABASE_PACK_INTERVAL_SECONDS) übernimmt der Launcher einmal für alle Worker.
+"""
+from __future__ import annotations
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from .packing import PackScheduler
+from .storage import parse_zeo_address
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def _wait_for_port(host: str, port: int, timeout_seconds: float) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"ZEO server did not start on {host}:{port}")
+
+
+def _zeo_server_command(zeo_address: str, database_file: str, blob_dir: str) -> list[str]:
+    # runzeo kennt kein Blob-Verzeichnis auf der Kommandozeile → Konfigurationsdatei schreiben
+    if not blob_dir:
+        return [sys.executable, "-m", "ZEO.runzeo", "-a", zeo_address, "-f", database_file]
+    configuration = tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False)
+    with configuration:
+        configuration.write(
+            f"<zeo>\n  address {zeo_address}\n</zeo>\n"
+            f"<filestorage>\n  path {database_file}\n  blob-dir {blob_dir}\n</filestorage>\n"
+        )
+    return [sys.executable, "-m", "ZEO.runzeo", "-C", configuration.name]
+
+
+def _pack_periodically(scheduler: PackScheduler, stop: threading.Event) -> None:
+    # Wie PackScheduler.run in den Workern, aber nur in diesem einen Prozess
+    while not stop.wait(scheduler.interval_seconds):
+        try:
+            scheduler.pack_now()
+        except Exception as ex:
+            print(f"pack failed: {ex}", file=sys.stderr)
+
+
+def main() -> None:
+    load_dotenv(BASE_DIR / ".env")
+    parser = argparse.ArgumentParser(prog="python -m app.launcher")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--zeo-address", default=os.getenv("ZEO_ADDRESS", "127.0.0.1:8100"))
+    parser.add_argument(
+        "--database-file",
+        default=os.getenv("DATABASE_FILE", str(BASE_DIR / "data" / "appdata.fs")),
+    )
+    parser.add_argument(
+        "--blob-dir",
+        default=None,
+        help="Blob-Verzeichnis des ZEO-Servers (Standard: DATABASE_BLOB_DIR, wenn "
+        "ROUTE_GEOMETRY_BLOB_THRESHOLD_BYTES gesetzt ist)",
+    )
+    arguments = parser.parse_args()
+    if arguments.blob_dir is None and int(os.getenv("ROUTE_GEOMETRY_BLOB_THRESHOLD_BYTES", "0")):
+        arguments.blob_dir = os.getenv(
+            "DATABASE_BLOB_DIR", os.path.splitext(arguments.database_file)[0] + "-blobs"
+        )
+
+    address = parse_zeo_address(arguments.zeo_address)
+    if not isinstance(address, tuple):
+        parser.error("--zeo-address must be host:port")
+    arguments.database_file = os.path.abspath(arguments.database_file)
+    if arguments.blob_dir:
+        arguments.blob_dir = os.path.abspath(arguments.blob_dir)
+    os.makedirs(os.path.dirname(arguments.database_file), exist_ok=True)
+
+    # cwd=backend: der Server importiert zur Konfliktauflösung die Klassen gespeicherter
+    # Objekte (app.models.Route bzw. app.main.Route älterer Datensätze)
+    zeo_server = subprocess.Popen(
+        _zeo_server_command(arguments.zeo_address, arguments.database_file, arguments.blob_dir),
+        cwd=BASE_DIR,
+    )
+    workers = None
+    pack_database = None
+    stop_packing = threading.Event()
+    try:
+        _wait_for_port(address[0], address[1], timeout_seconds=30)
+        pack_interval_seconds = float(os.getenv("DATABASE_PACK_INTERVAL_SECONDS", str(24 * 3600)))
+        if pack_interval_seconds > 0:
+            import ZEO
+
+            # legt in einer frischen Datenbank auch das Root-Objekt an, bevor die Worker starten
+            pack_database = ZEO.DB(address)
+            scheduler = PackScheduler(
+                pack_database,
+                storage_file=arguments.database_file,
+                interval_seconds=pack_interval_seconds,
+                retention_seconds=float(os.getenv("DATABASE_PACK_RETENTION_SECONDS", str(24 * 3600))),
+            )
+            threading.Thread(
+                target=_pack_periodically, args=(scheduler, stop_packing), name="pack", daemon=True
+            ).start()
+        environment = dict(os.environ, STORAGE_MODE="zeo", ZEO_ADDRESS=arguments.zeo_address)
+        workers = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--host", arguments.host,
+                "--port", str(arguments.port),
+                "--workers", str(arguments.workers),
+            ],
+            cwd=BASE_DIR,
+            env=environment,
+        )
+        workers.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_packing.set()
+        if pack_database is not None:
+            pack_database.close()
+        # Zuerst die Worker (sie committen noch), dann den ZEO-Server beenden
+        for process in (workers, zeo_server):
+            if process is not None and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,61 @@
+import asyncio
 import os
+import threading
 import transaction
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager, contextmanager
+from itertools import islice
+from typing import Annotated, Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Response
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from datetime import datetime
-import requests
 from dotenv import load_dotenv
 
-from ZODB import FileStorage, DB
-from persistent import Persistent
+from ZODB import DB
+from ZODB.Connection import Connection
+from ZODB.POSException import ConflictError
 from BTrees.OOBTree import OOBTree
 
+from .caching import AutocompleteCache, SingleFlight, TtlLruCache, normalize_query, quantize_coordinates
+from .change_feed import (
+    CREATED,
+    DELETED,
+    ChangeTokenExpired,
+    get_route_change_feed,
+    parse_change_token,
+)
+from .geometry import decode_polyline_arrays
+from .metrics import (
+    CallbackMetric,
+    Counter,
+    Histogram,
+    MetricsMiddleware,
+    MetricsRegistry,
+    TransferCountMonitor,
+)
+from .geocode_cache import GeocodeCache, get_geocode_cache_store
+from .group_commit import GroupCommitter
+from .identifiers import new_route_identifier
+# Route bleibt unter app.main.Route erreichbar: ältere Datensätze verweisen auf diesen Namen
+from .models import Route, simplified_geometry_levels
+from .ors_client import UPSTREAM_ERRORS, UPSTREAM_LATENCY, OrsClient
+from .ors_scheduler import SCHEDULER_REQUESTS, SCHEDULER_WAIT, UpstreamScheduler
+from .packing import PackAlreadyRunning, PackScheduler
+from .profiling import ProfiledRoute, ProfilingMiddleware, SlowestRequests, add_span, sample_stacks, span
+from .resilience import HEDGED_REQUESTS, REVALIDATIONS, STALE_RESPONSES, CircuitBreaker, Revalidator
+from .route_indexes import get_route_indexes
+from .spatial_index import get_spatial_index
+from .storage import open_storage
+from .text_index import get_route_text_index
+from .top_searches import TopSearches
+from .transactions import TransactionStatistics, run_in_transaction
+
 # ==========================================================
 # Konfiguration
 # ==========================================================
@@ -21,64 +63,318 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 
 DATABASE_FILE = os.getenv("DATABASE_FILE", str(BASE_DIR / "data" / "appdata.fs"))
+# filestorage (Standard, ein Prozess) oder zeo (ZEO-Server, mehrere uvicorn-Worker)
+STORAGE_MODE = os.getenv("STORAGE_MODE", "filestorage")
+ZEO_ADDRESS = os.getenv("ZEO_ADDRESS", "127.0.0.1:8100")
+ZEO_CLIENT_CACHE_DIR = os.getenv("ZEO_CLIENT_CACHE_DIR", str(BASE_DIR / "data" / "zeo-cache"))
+ZEO_CLIENT_CACHE_SIZE_MB = int(os.getenv("ZEO_CLIENT_CACHE_SIZE_MB", "100"))
 ORS_API_KEY = os.getenv("ORS_API_KEY")
 CORS_ALLOW_ORIGINS = os.getenv(
     "CORS_ALLOW_ORIGINS", "http://127.0.0.1:5500,http://localhost:5500"
 ).split(",")
 
-if not ORS_API_KEY:
-    raise RuntimeError("ORS_API_KEY not configured. Set it in backend/.env")
+AUTOCOMPLETE_CACHE_SIZE = int(os.getenv("AUTOCOMPLETE_CACHE_SIZE", "1024"))
+AUTOCOMPLETE_CACHE_TTL_SECONDS = float(os.getenv("AUTOCOMPLETE_CACHE_TTL_SECONDS", "300"))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", "10000"))
+GEOCODE_CACHE_TTL_SECONDS = float(os.getenv("GEOCODE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+DIRECTIONS_CACHE_SIZE = int(os.getenv("DIRECTIONS_CACHE_SIZE", "512"))
+DIRECTIONS_CACHE_TTL_SECONDS = float(os.getenv("DIRECTIONS_CACHE_TTL_SECONDS", "600"))
+# Nachkommastellen für den Cache-Schlüssel: 5 ≈ 1 m, 8.537087 und 8.537088 teilen sich einen Eintrag
+DIRECTIONS_CACHE_PRECISION = int(os.getenv("DIRECTIONS_CACHE_PRECISION", "5"))
+# Batch-Routing: gleichzeitige ORS-Aufrufe pro Request und maximale Anzahl Paare
+DIRECTIONS_BATCH_CONCURRENCY = int(os.getenv("DIRECTIONS_BATCH_CONCURRENCY", "8"))
+DIRECTIONS_BATCH_MAX_PAIRS = int(os.getenv("DIRECTIONS_BATCH_MAX_PAIRS", "500"))
+# ORS-Matrix: maximale Zellen (Quellen × Ziele) pro ORS-Aufruf; grössere Matrizen werden zeilenweise aufgeteilt
+MATRIX_MAX_ELEMENTS = int(os.getenv("MATRIX_MAX_ELEMENTS", "3500"))
+MATRIX_MAX_LOCATIONS = int(os.getenv("MATRIX_MAX_LOCATIONS", "1000"))
+# Gemeinsamer HTTP-Client für ORS: Poolgrösse und Timeouts (bisher ohne Timeout)
+ORS_POOL_SIZE = int(os.getenv("ORS_POOL_SIZE", "20"))
+ORS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("ORS_CONNECT_TIMEOUT_SECONDS", "5"))
+ORS_READ_TIMEOUT_SECONDS = float(os.getenv("ORS_READ_TIMEOUT_SECONDS", "20"))
+# Kontingent des ORS_API_KEY (Anfragen pro Minute, 0 = unbegrenzt) und angesparte Tokens für Spitzen;
+# wartende Anfragen (höchstens ORS_QUEUE_MAX) geben nach der Wartezeit ihrer Priorität auf
+ORS_RATE_LIMIT_PER_MINUTE = float(os.getenv("ORS_RATE_LIMIT_PER_MINUTE", "100"))
+ORS_RATE_LIMIT_BURST = int(os.getenv("ORS_RATE_LIMIT_BURST", "10"))
+ORS_QUEUE_MAX = int(os.getenv("ORS_QUEUE_MAX", "100"))
+ORS_QUEUE_MAX_WAIT_DIRECTIONS_SECONDS = float(os.getenv("ORS_QUEUE_MAX_WAIT_DIRECTIONS_SECONDS", "10"))
+ORS_QUEUE_MAX_WAIT_GEOCODE_SECONDS = float(os.getenv("ORS_QUEUE_MAX_WAIT_GEOCODE_SECONDS", "3"))
+ORS_QUEUE_MAX_WAIT_AUTOCOMPLETE_SECONDS = float(os.getenv("ORS_QUEUE_MAX_WAIT_AUTOCOMPLETE_SECONDS", "1"))
+# Gesamtzeit pro ORS-Aufruf (inkl. Warten auf das Kontingent), danach 504
+ORS_DEADLINE_AUTOCOMPLETE_SECONDS = float(os.getenv("ORS_DEADLINE_AUTOCOMPLETE_SECONDS", "2"))
+ORS_DEADLINE_GEOCODE_SECONDS = float(os.getenv("ORS_DEADLINE_GEOCODE_SECONDS", "5"))
+ORS_DEADLINE_DIRECTIONS_SECONDS = float(os.getenv("ORS_DEADLINE_DIRECTIONS_SECONDS", "15"))
+ORS_DEADLINE_MATRIX_SECONDS = float(os.getenv("ORS_DEADLINE_MATRIX_SECONDS", "30"))
+# Zweitanfrage für Geocoding/Autocomplete, wenn nach p95 der letzten Antwortzeiten keine Antwort da ist
+ORS_HEDGE_REQUESTS = os.getenv("ORS_HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes")
+ORS_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("ORS_HEDGE_MIN_DELAY_SECONDS", "0.1"))
+# Circuit Breaker pro ORS-Dienst: nach so vielen Fehlern in Folge so lange sofort 503
+ORS_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("ORS_CIRCUIT_FAILURE_THRESHOLD", "5"))
+ORS_CIRCUIT_OPEN_SECONDS = float(os.getenv("ORS_CIRCUIT_OPEN_SECONDS", "30"))
+# Abgelaufene Cache-Einträge so lange noch sofort ausliefern und im Hintergrund neu laden
+ORS_STALE_SECONDS = float(os.getenv("ORS_STALE_SECONDS", "3600"))
+
+# ZODB-Verbindungspool (Verbindungen) und Objekt-Cache pro Verbindung (Anzahl Objekte)
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "7"))
+DATABASE_CACHE_SIZE = int(os.getenv("DATABASE_CACHE_SIZE", "10000"))
+# Schreibtransaktionen: Versuche bei ConflictError, Basis-Wartezeit (verdoppelt sich je Versuch)
+# und deren Obergrenze; erst wenn alle Versuche scheitern, antwortet das Backend mit 503
+DATABASE_WRITE_ATTEMPTS = int(os.getenv("DATABASE_WRITE_ATTEMPTS", "10"))
+DATABASE_WRITE_BACKOFF_SECONDS = float(os.getenv("DATABASE_WRITE_BACKOFF_SECONDS", "0.01"))
+DATABASE_WRITE_MAX_BACKOFF_SECONDS = float(os.getenv("DATABASE_WRITE_MAX_BACKOFF_SECONDS", "0.5"))
+# Group Commit: gleichzeitige POST/DELETE /api/routes in einer Transaktion (einem fsync) committen;
+# gesammelt wird höchstens so lange bzw. bis zu so vielen Operationen
+DATABASE_GROUP_COMMIT = os.getenv("DATABASE_GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+DATABASE_GROUP_COMMIT_WINDOW_SECONDS = float(os.getenv("DATABASE_GROUP_COMMIT_WINDOW_SECONDS", "0.002"))
+DATABASE_GROUP_COMMIT_MAX_OPERATIONS = int(os.getenv("DATABASE_GROUP_COMMIT_MAX_OPERATIONS", "64"))
+# Geometrien ab dieser Grösse (Bytes der kodierten Polyline) als ZODB-Blob speichern; 0 = nie
+ROUTE_GEOMETRY_BLOB_THRESHOLD_BYTES = int(os.getenv("ROUTE_GEOMETRY_BLOB_THRESHOLD_BYTES", "0"))
+# Zoomstufen der vorberechneten vereinfachten Geometrien: ROUTE_GEOMETRY_LEVEL_ZOOMS (→ app.config)
+DATABASE_BLOB_DIR = os.getenv("DATABASE_BLOB_DIR", os.path.splitext(DATABASE_FILE)[0] + "-blobs")
+# Hintergrund-Packen der ZODB: Intervall (0 = aus) und wie lange alte Versionen erhalten bleiben
+DATABASE_PACK_INTERVAL_SECONDS = float(os.getenv("DATABASE_PACK_INTERVAL_SECONDS", str(24 * 3600)))
+DATABASE_PACK_RETENTION_SECONDS = float(os.getenv("DATABASE_PACK_RETENTION_SECONDS", str(24 * 3600)))
+# Batch-Import: maximale Anzahl Routen pro Request und Routen pro Commit (0 = ein einziger Commit)
+ROUTES_BATCH_MAX_ROUTES = int(os.getenv("ROUTES_BATCH_MAX_ROUTES", "10000"))
+ROUTES_BATCH_CHUNK_SIZE = int(os.getenv("ROUTES_BATCH_CHUNK_SIZE", "0"))
+# Antworten ab dieser Grösse gzip-komprimieren, wenn der Client es unterstützt (0 = nie)
+GZIP_MINIMUM_SIZE_BYTES = int(os.getenv("GZIP_MINIMUM_SIZE_BYTES", "1024"))
+# Globale Top-Suchanfragen: gezählte Begriffe (feste Obergrenze), Schreibintervall in die ZODB
+# und wie viele der häufigsten Suchen beim Start vorgeladen werden (0 = aus)
+TOP_SEARCHES_CAPACITY = int(os.getenv("TOP_SEARCHES_CAPACITY", "1000"))
+TOP_SEARCHES_FLUSH_INTERVAL_SECONDS = float(os.getenv("TOP_SEARCHES_FLUSH_INTERVAL_SECONDS", "60"))
+TOP_SEARCHES_PREWARM_LIMIT = int(os.getenv("TOP_SEARCHES_PREWARM_LIMIT", "0"))
+# Änderungsprotokoll der Routen (GET /api/routes/changes): Aufbewahrung der Ereignisse, Intervall
+# des Aufräumens (0 = nie) und wie oft offene Event-Streams auf neue Transaktionen prüfen
+ROUTE_CHANGES_RETENTION_SECONDS = float(os.getenv("ROUTE_CHANGES_RETENTION_SECONDS", str(7 * 24 * 3600)))
+ROUTE_CHANGES_TRIM_INTERVAL_SECONDS = float(os.getenv("ROUTE_CHANGES_TRIM_INTERVAL_SECONDS", "3600"))
+ROUTE_CHANGES_POLL_SECONDS = float(os.getenv("ROUTE_CHANGES_POLL_SECONDS", "1"))
+# Zeitmessung pro Request (Server-Timing-Header, langsamste Requests, Stack-Sampler); aus = keine Kosten
+REQUEST_PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+REQUEST_PROFILING_SLOWEST = int(os.getenv("REQUEST_PROFILING_SLOWEST", "20"))
+REQUEST_PROFILING_MAX_WINDOW_SECONDS = float(os.getenv("REQUEST_PROFILING_MAX_WINDOW_SECONDS", "30"))
+
+
+def check_configuration() -> None:
+    # beim Start der App statt beim Import: der ZEO-Server importiert app.main ohne ORS-Konfiguration
+    if not ORS_API_KEY:
+        raise RuntimeError("ORS_API_KEY not configured. Set it in backend/.env")
+
 
 # ==========================================================
 # Datenbank-Hilfen
 # ==========================================================
-_storage = FileStorage.FileStorage(DATABASE_FILE)
-_database = DB(_storage)
+# Aus dem Storage geladene bzw. geschriebene Objekte (Zählung beim Schliessen der Verbindung)
+_object_loads = Counter("zodb_object_loads_total", "Aus dem Storage geladene Objekte (Objekt-Cache-Fehltreffer)")
+_object_stores = Counter("zodb_object_stores_total", "In den Storage geschriebene Objekte")
+_commit_latency = Histogram("zodb_commit_duration_seconds", "Dauer erfolgreicher Schreib-Commits")
 
+# Storage und DB werden erst beim ersten Zugriff geöffnet, nicht beim Import: der ZEO-Server
+# importiert app.main, um Konflikte in BTrees mit älteren Routen (app.main.Route) aufzulösen,
+# und hält die Datenbankdatei dabei selbst gesperrt
+_database: Optional[DB] = None
+_pack_scheduler: Optional[PackScheduler] = None
+_database_lock = threading.Lock()
 
-def get_root_connection():
-    connection = _database.open()
-    root = connection.root()
-    return connection, root
 
+def get_database() -> DB:
+    global _database, _pack_scheduler
+    if _database is not None:
+        return _database
+    with _database_lock:
+        if _database is None:
+            storage = open_storage(
+                mode=STORAGE_MODE,
+                database_file=DATABASE_FILE,
+                zeo_address=ZEO_ADDRESS,
+                client_cache_dir=ZEO_CLIENT_CACHE_DIR,
+                client_cache_size_mb=ZEO_CLIENT_CACHE_SIZE_MB,
+                # Blob-Verzeichnis nur, wenn Blobs auch genutzt werden
+                blob_dir=DATABASE_BLOB_DIR if ROUTE_GEOMETRY_BLOB_THRESHOLD_BYTES else None,
+            )
+            # DB() legt in einer leeren Datenbank das Root-Objekt an; starten mehrere Worker auf
+            # einer frischen ZEO-Datenbank, scheitern alle bis auf einen → Root neu laden
+            for attempt_number in range(DATABASE_WRITE_ATTEMPTS):
+                try:
+                    database = DB(storage, pool_size=DATABASE_POOL_SIZE, cache_size=DATABASE_CACHE_SIZE)
+                    break
+                except ConflictError:
+                    if attempt_number + 1 == DATABASE_WRITE_ATTEMPTS:
+                        raise
+            database.setActivityMonitor(TransferCountMonitor(_object_loads, _object_stores))
+            _pack_scheduler = PackScheduler(
+                database,
+                storage_file=DATABASE_FILE if STORAGE_MODE == "filestorage" else None,
+                interval_seconds=DATABASE_PACK_INTERVAL_SECONDS,
+                retention_seconds=DATABASE_PACK_RETENTION_SECONDS,
+            )
+            _database = database
+    return _database
 
-def get_routes_store(existing_connection=None) -> OOBTree:
-    if existing_connection:
-        root = existing_connection.root()
-    else:
-        connection, root = get_root_connection()
+
+def get_pack_scheduler() -> PackScheduler:
+    get_database()
+    return _pack_scheduler
+
+
+@contextmanager
+def open_connection() -> Iterator[Connection]:
+    # Jede Verbindung bekommt einen eigenen TransactionManager: FastAPI führt
+    # Dependency und Handler evtl. in verschiedenen Threadpool-Threads aus,
+    # der thread-lokale Standard-Manager wäre dann der falsche.
+    connection = get_database().open(transaction_manager=transaction.TransactionManager())
+    try:
+        yield connection
+    finally:
+        # Nicht committete Änderungen (z. B. nach einem Fehler) verwerfen,
+        # danach geht die Verbindung zurück in den Pool.
+        connection.transaction_manager.abort()
+        connection.close()
+
+
+def get_connection() -> Iterator[Connection]:
+    # FastAPI-Dependency: eine Verbindung pro Request
+    with open_connection() as connection:
+        yield connection
+
+
+def get_routes_store(existing_connection: Connection) -> OOBTree:
+    # Legt den Store bei Bedarf an; committen muss der Aufrufer (in Lesepfaden wird der leere
+    # Store mit der Verbindung verworfen)
+    root = existing_connection.root()
     if "routes" not in root:
         root["routes"] = OOBTree()
-        transaction.commit()
     return root["routes"]
 
 
+_write_statistics = TransactionStatistics()
+# Schreibtransaktionen eines Prozesses laufen nacheinander. Jedes Einfügen meldet die
+# BTree-Knoten über dem geänderten Bucket per readCurrent an; teilt ein anderer Schreiber
+# gleichzeitig irgendeinen Bucket darunter, scheitert der Commit mit ReadConflictError –
+# bei den vielen Indizes einer Route fast bei jedem zweiten gleichzeitigen Schreibzugriff.
+# Die FileStorage committet ohnehin seriell, parallel liefe nur work() unter dem GIL.
+# Konflikte bleiben damit zwischen Prozessen (ZEO) und werden dort wiederholt.
+_write_lock = threading.RLock()
+T = TypeVar("T")
+
+
+def _observe_commit(seconds: float) -> None:
+    _commit_latency.observe((), seconds)
+    add_span("commit", seconds)
+
+
+def write_transaction(connection: Connection, work: Callable[[], T]) -> T:
+    # work() ausführen und committen; bei Konflikten mit Backoff wiederholen.
+    # Bleibt der Konflikt bestehen → 503, der Client kann es später erneut versuchen.
+    # Der Schreib-Lock gilt pro Versuch: während des Backoffs schreiben die anderen weiter
+    try:
+        return run_in_transaction(
+            connection.transaction_manager,
+            work,
+            attempts=DATABASE_WRITE_ATTEMPTS,
+            backoff_seconds=DATABASE_WRITE_BACKOFF_SECONDS,
+            max_backoff_seconds=DATABASE_WRITE_MAX_BACKOFF_SECONDS,
+            statistics=_write_statistics,
+            observe_commit=_observe_commit,
+            lock=_write_lock,
+        )
+    except ConflictError:
+        raise HTTPException(status_code=503, detail="database write conflict, please retry")
+
+
+_group_commit: Optional[GroupCommitter] = (
+    GroupCommitter(
+        open_connection,
+        write_transaction,
+        window_seconds=DATABASE_GROUP_COMMIT_WINDOW_SECONDS,
+        max_operations=DATABASE_GROUP_COMMIT_MAX_OPERATIONS,
+    )
+    if DATABASE_GROUP_COMMIT
+    else None
+)
+
+
+def group_write(connection: Connection, work: Callable[[Connection], T]) -> T:
+    # Wie write_transaction; mit Group Commit läuft work im Schreib-Thread auf dessen Verbindung
+    # und kann mit anderen Schreibzugriffen zusammen committet werden
+    if _group_commit is None:
+        return write_transaction(connection, lambda: work(connection))
+    with span("commit"):
+        return _group_commit.submit(work)
+
+
+def database_pool_statistics() -> Dict[str, int]:
+    database = get_database()
+    open_connections = len(database.pool.all)
+    idle_connections = len(database.pool.available)
+    return {
+        "pool_size": database.getPoolSize(),
+        "open_connections": open_connections,
+        "idle_connections": idle_connections,
+        "connections_in_use": open_connections - idle_connections,
+        "cache_size": database.getCacheSize(),
+        "cached_objects": database.cacheSize(),
+    }
+
+
+def ensure_route_indexes() -> None:
+    # Ältere Datenbanken haben noch keine Indizes → einmalig beim Start aufbauen. Läuft in
+    # jedem Worker: auf einer frischen ZEO-Datenbank legen mehrere gleichzeitig Einträge im
+    # Root-Objekt an → bei Konflikten wie jeder Schreibzugriff wiederholen.
+    def build() -> None:
+        root = connection.root()
+        routes_store = get_routes_store(existing_connection=connection)
+        get_spatial_index(root, routes_store)
+        get_route_indexes(root, routes_store)
+        get_route_text_index(root, routes_store)
+        get_route_change_feed(root)
+
+    with open_connection() as connection:
+        write_transaction(connection, build)
+
+
+def rebuild_route_indexes() -> Dict[str, int]:
+    # Alle Indizes aus den gespeicherten Routen neu aufbauen (python -m app.manage rebuild-indexes)
+    with open_connection() as connection:
+        root = connection.root()
+        routes_store = get_routes_store(existing_connection=connection)
+        counts = {
+            "spatial": get_spatial_index(root, routes_store).rebuild(routes_store.items()),
+            "secondary": get_route_indexes(root, routes_store).rebuild(routes_store.items()),
+            "text": get_route_text_index(root, routes_store).rebuild(routes_store.items()),
+        }
+        connection.transaction_manager.commit()
+        return counts
+
+
+GEOMETRY_MIGRATION_BATCH_ROUTES = 1000
+
+
+def migrate_route_geometries() -> Dict[str, int]:
+    # Ältere Routen: geometry_encoded aus dem Routen-Datensatz in ein eigenes
+    # GeometryData-Objekt verschieben und die Detailstufen pro Zoom nachberechnen
+    # (python -m app.manage migrate-geometry)
+    migrated = 0
+    with open_connection() as connection:
+        routes_store = get_routes_store(existing_connection=connection)
+        for route in routes_store.values():
+            if route.has_legacy_geometry:
+                route.geometry_encoded = route.__dict__["geometry_encoded"]
+            elif route.geometry_levels is None:
+                route.geometry_levels = simplified_geometry_levels(route.geometry_encoded)
+            else:
+                continue
+            route._p_changed = True
+            migrated += 1
+            if migrated % GEOMETRY_MIGRATION_BATCH_ROUTES == 0:
+                connection.transaction_manager.commit()
+                connection.cacheGC()
+        connection.transaction_manager.commit()
+        return {"migrated": migrated, "routes": len(routes_store)}
+
+
 # ==========================================================
 # Datenmodell
 # ==========================================================
-class Route(Persistent):
-    def __init__(
-        self,
-        start_text: str,
-        end_text: str,
-        start_coordinates: Dict[str, float],
-        end_coordinates: Dict[str, float],
-        distance_meters: Optional[float],
-        duration_seconds: Optional[float],
-        geometry_encoded: Optional[str],
-        profile: str,
-    ):
-        self.start_text = start_text
-        self.end_text = end_text
-        self.start_coordinates = start_coordinates
-        self.end_coordinates = end_coordinates
-        self.distance_meters = distance_meters
-        self.duration_seconds = duration_seconds
-        self.geometry_encoded = geometry_encoded
-        self.profile = profile
-        self.created_at = datetime.utcnow()
-
-
 class RouteIn(BaseModel):
     start_text: str
     end_text: str
@@ -106,7 +402,80 @@ class RouteOut(BaseModel):
 # ==========================================================
 # FastAPI Setup
 # ==========================================================
-app = FastAPI()
+_ors_client: Optional[OrsClient] = None
+# Ein Kontingent für alle ORS-Aufrufe; Geocoding und Autocomplete lassen einen Teil der
+# Tokens für Routenberechnungen übrig
+_ors_scheduler: Optional[UpstreamScheduler] = (
+    UpstreamScheduler(
+        requests_per_minute=ORS_RATE_LIMIT_PER_MINUTE,
+        burst=ORS_RATE_LIMIT_BURST,
+        max_queue=ORS_QUEUE_MAX,
+        max_wait_seconds={
+            "directions": ORS_QUEUE_MAX_WAIT_DIRECTIONS_SECONDS,
+            "geocode": ORS_QUEUE_MAX_WAIT_GEOCODE_SECONDS,
+            "autocomplete": ORS_QUEUE_MAX_WAIT_AUTOCOMPLETE_SECONDS,
+        },
+        reserve_tokens={"geocode": ORS_RATE_LIMIT_BURST * 0.1, "autocomplete": ORS_RATE_LIMIT_BURST * 0.3},
+    )
+    if ORS_RATE_LIMIT_PER_MINUTE > 0
+    else None
+)
+# Zustand bleibt über den Lebenszyklus des Clients hinaus erhalten (→ /health)
+_ors_breakers = {
+    upstream: CircuitBreaker(upstream, ORS_CIRCUIT_FAILURE_THRESHOLD, ORS_CIRCUIT_OPEN_SECONDS)
+    for upstream in ("autocomplete", "geocode", "directions", "matrix")
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Ein gepoolter Keep-Alive-Client für alle ORS-Aufrufe, pro App-Lebenszyklus
+    global _ors_client
+    check_configuration()
+    ensure_route_indexes()
+    _load_top_searches()
+    _ors_client = OrsClient(
+        pool_size=ORS_POOL_SIZE,
+        connect_timeout_seconds=ORS_CONNECT_TIMEOUT_SECONDS,
+        read_timeout_seconds=ORS_READ_TIMEOUT_SECONDS,
+        scheduler=_ors_scheduler,
+        deadlines={
+            "autocomplete": ORS_DEADLINE_AUTOCOMPLETE_SECONDS,
+            "geocode": ORS_DEADLINE_GEOCODE_SECONDS,
+            "directions": ORS_DEADLINE_DIRECTIONS_SECONDS,
+            "matrix": ORS_DEADLINE_MATRIX_SECONDS,
+        },
+        breakers=_ors_breakers,
+        hedge_upstreams=("autocomplete", "geocode") if ORS_HEDGE_REQUESTS else (),
+        hedge_min_delay_seconds=ORS_HEDGE_MIN_DELAY_SECONDS,
+    )
+    background_tasks = []
+    # Mit ZEO packt der Launcher einmal für alle Worker (sonst N-mal pro Intervall)
+    if DATABASE_PACK_INTERVAL_SECONDS > 0 and STORAGE_MODE == "filestorage":
+        background_tasks.append(asyncio.create_task(get_pack_scheduler().run()))
+    if TOP_SEARCHES_FLUSH_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(_flush_top_searches_periodically()))
+    if TOP_SEARCHES_PREWARM_LIMIT > 0:
+        background_tasks.append(asyncio.create_task(prewarm_top_searches(TOP_SEARCHES_PREWARM_LIMIT)))
+    if ROUTE_CHANGES_TRIM_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(_trim_route_changes_periodically()))
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        # noch nicht geschriebene Zählungen nicht verlieren
+        await run_in_threadpool(flush_top_searches)
+        if _group_commit is not None:
+            await run_in_threadpool(_group_commit.close)
+        await _ors_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+if REQUEST_PROFILING_ENABLED:
+    # muss vor dem Deklarieren der Endpunkte gesetzt sein
+    app.router.route_class = ProfiledRoute
+_slowest_requests = SlowestRequests(REQUEST_PROFILING_SLOWEST)
 
 app.add_middleware(
     CORSMiddleware,
@@ -117,6 +486,112 @@ app.add_middleware(
 )
 
 
+# ==========================================================
+# Metriken (Prometheus-Textformat)
+# ==========================================================
+_request_latency = Histogram(
+    "http_request_duration_seconds",
+    "Dauer der HTTP-Requests nach Methode, Routen-Vorlage und Status",
+    ("method", "route", "status"),
+)
+if GZIP_MINIMUM_SIZE_BYTES > 0:
+    # kleinere Stufe als der Standard (9): kaum grössere Antworten, deutlich weniger CPU
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE_BYTES, compresslevel=5)
+if REQUEST_PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, slowest=_slowest_requests)
+# Als letzte Middleware hinzugefügt → äusserste Schicht, misst auch CORS
+app.add_middleware(MetricsMiddleware, histogram=_request_latency)
+
+
+def _route_count() -> Iterator[Tuple[Tuple[str, ...], float]]:
+    with open_connection() as connection:
+        root = connection.root()
+        if "routes_indexes" in root:
+            yield (), len(get_route_indexes(root, root["routes"]))
+
+
+def _cache_counts() -> Iterator[Tuple[Tuple[str, ...], float]]:
+    for cache_name, stats in (
+        ("autocomplete", _autocomplete_cache.stats()),
+        ("directions", _directions_cache.stats()),
+    ):
+        yield (cache_name, "hit"), stats["hits"]
+        yield (cache_name, "miss"), stats["misses"]
+
+
+_metrics = MetricsRegistry()
+_metrics.register(_request_latency)
+_metrics.register(UPSTREAM_LATENCY)
+_metrics.register(UPSTREAM_ERRORS)
+_metrics.register(SCHEDULER_REQUESTS)
+_metrics.register(HEDGED_REQUESTS)
+_metrics.register(STALE_RESPONSES)
+_metrics.register(REVALIDATIONS)
+_metrics.register(CallbackMetric(
+    "ors_circuit_open", "Circuit Breaker pro ORS-Dienst (0 = geschlossen, 0.5 = Probe, 1 = offen)", "gauge",
+    ("upstream",),
+    lambda: [
+        ((upstream,), {"closed": 0, "half_open": 0.5, "open": 1}[breaker.state])
+        for upstream, breaker in _ors_breakers.items()
+    ],
+))
+_metrics.register(SCHEDULER_WAIT)
+_metrics.register(CallbackMetric(
+    "ors_scheduler_queue_depth", "Auf ein ORS-Token wartende Anfragen nach Priorität", "gauge", ("priority",),
+    lambda: [((priority,), depth) for priority, depth in _ors_scheduler.queue_depths().items()]
+    if _ors_scheduler is not None
+    else [],
+))
+_metrics.register(_commit_latency)
+_metrics.register(CallbackMetric(
+    "route_change_streams", "Offene Event-Streams des Routen-Änderungsprotokolls", "gauge", (),
+    lambda: [((), _route_change_streams)],
+))
+_metrics.register(CallbackMetric(
+    "zodb_write_transactions_total", "Schreibtransaktionen nach Ergebnis", "counter", ("outcome",),
+    lambda: [((outcome,), value) for outcome, value in _write_statistics.stats().items()],
+))
+_metrics.register(CallbackMetric(
+    "zodb_group_commits_total", "Group Commit: gemeinsame Transaktionen, Operationen darin, Rückfälle auf Einzel-Commits",
+    "counter", ("kind",),
+    lambda: [((kind,), _group_commit.stats()[kind]) for kind in ("groups", "operations", "fallbacks")]
+    if _group_commit is not None
+    else [],
+))
+_metrics.register(CallbackMetric(
+    "zodb_connection_pool", "ZODB-Verbindungspool (Grösse, offen, frei, belegt)", "gauge", ("state",),
+    lambda: [
+        ((state,), database_pool_statistics()[key])
+        for state, key in (
+            ("size", "pool_size"),
+            ("open", "open_connections"),
+            ("idle", "idle_connections"),
+            ("in_use", "connections_in_use"),
+        )
+    ],
+))
+_metrics.register(CallbackMetric(
+    "zodb_cached_objects", "Objekte in den Objekt-Caches aller Verbindungen", "gauge", (),
+    lambda: [((), get_database().cacheSize())],
+))
+_metrics.register(_object_loads)
+_metrics.register(_object_stores)
+_metrics.register(CallbackMetric(
+    "proxy_cache_lookups_total", "Treffer/Fehltreffer der ORS-Proxy-Caches", "counter", ("cache", "result"),
+    _cache_counts,
+))
+_metrics.register(CallbackMetric("routes_stored", "Gespeicherte Routen", "gauge", (), _route_count))
+_metrics.register(CallbackMetric(
+    "zodb_storage_file_bytes", "Grösse der FileStorage-Datei", "gauge", (),
+    lambda: [((), get_pack_scheduler().stats()["file_size_bytes"])],
+))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ==========================================================
 # Health Endpoint
 # ==========================================================
@@ -132,9 +607,10 @@ def health() -> Dict[str, Any]:
     except Exception:
         pass
 
-    # Prüfen: Datenbank erreichbar?
+    # Prüfen: Datenbank erreichbar? (Verbindung geht danach zurück in den Pool)
     try:
-        _ = get_routes_store()
+        with open_connection() as connection:
+            get_routes_store(existing_connection=connection)
         database_open = True
     except Exception as ex:
         database_open = False
@@ -151,6 +627,12 @@ def health() -> Dict[str, Any]:
         response["database_open"] = database_open
     if now_utc is not None:
         response["now_utc"] = now_utc
+    response["database_pool"] = database_pool_statistics()
+    response["database_writes"] = _write_statistics.stats()
+    if _group_commit is not None:
+        response["group_commit"] = _group_commit.stats()
+    # Offener Breaker: ORS-Dienst gilt als gestört, Anfragen werden sofort abgewiesen
+    response["ors_circuits"] = {upstream: breaker.stats() for upstream, breaker in _ors_breakers.items()}
 
     return response
 
@@ -158,125 +640,979 @@ def health() -> Dict[str, Any]:
 # ==========================================================
 # ORS-Proxy (Backend ruft ORS auf, nicht das Frontend)
 # ==========================================================
-ORS_BASE = "https://api.openrouteservice.org"
+ORS_BASE = os.getenv("ORS_BASE_URL", "https://api.openrouteservice.org")
+
+# Tippen von "Zür", "Züri", "Zürich" soll nicht drei ORS-Anfragen auslösen
+_autocomplete_cache = AutocompleteCache(
+    max_entries=AUTOCOMPLETE_CACHE_SIZE,
+    ttl_seconds=AUTOCOMPLETE_CACHE_TTL_SECONDS,
+    stale_seconds=ORS_STALE_SECONDS,
+)
+# Stale-while-revalidate: abgelaufene Antwort sofort liefern, im Hintergrund neu laden –
+# auch wenn ORS gerade langsam oder ausgefallen ist
+_revalidator = Revalidator()
 
 
 @app.get("/api/ors/autocomplete")
-def ors_autocomplete(text: str, size: int = 5):
+async def ors_autocomplete(text: str, size: int = 5):
     if not ORS_API_KEY:
         raise HTTPException(status_code=500, detail="ORS_API_KEY not configured")
-    url = f"{ORS_BASE}/geocode/autocomplete"
-    r = requests.get(url, params={"api_key": ORS_API_KEY, "text": text, "size": size})
-    if not r.ok:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    return r.json()
+    cached = _autocomplete_cache.lookup(text, size)
+    if cached is not None:
+        return cached
+
+    async def fetch_autocomplete() -> Dict[str, Any]:
+        url = f"{ORS_BASE}/geocode/autocomplete"
+        data = await _ors_client.get_json(
+            url, params={"api_key": ORS_API_KEY, "text": text, "size": size}, upstream="autocomplete"
+        )
+        _autocomplete_cache.store(text, size, data)
+        return data
+
+    stale = _autocomplete_cache.lookup_stale(text, size)
+    if stale is not None:
+        _revalidator.serve_stale("autocomplete", ("autocomplete", normalize_query(text), size), fetch_autocomplete)
+        return stale
+    return await fetch_autocomplete()
+
+
+# Geocoding-Ergebnisse ändern sich selten → persistent in der ZODB, überlebt Neustarts
+_geocode_cache = GeocodeCache(
+    max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+    ttl_seconds=GEOCODE_CACHE_TTL_SECONDS,
+)
+
+
+def _lookup_geocode_cache(text: str, size: int) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    # (frisches Ergebnis, sonst abgelaufenes innerhalb von ORS_STALE_SECONDS)
+    with open_connection() as connection:
+        store = connection.root().get("geocode_cache")
+        cached = _geocode_cache.lookup(store, text, size)
+        if cached is not None:
+            return cached, None
+        return None, _geocode_cache.lookup_stale(store, text, size, ORS_STALE_SECONDS)
+
+
+def _store_geocode_cache(text: str, size: int, data: Dict[str, Any]) -> None:
+    with open_connection() as connection:
+        _geocode_cache.store(get_geocode_cache_store(connection.root()), text, size, data)
+        try:
+            connection.transaction_manager.commit()
+        except ConflictError:
+            # Cache-Schreiben ist "best effort": parallele Anfrage war schneller
+            pass
 
 
 @app.get("/api/ors/geocode")
-def ors_geocode(text: str, size: int = 1):
+async def ors_geocode(text: str, size: int = 1):
     if not ORS_API_KEY:
         raise HTTPException(status_code=500, detail="ORS_API_KEY not configured")
-    url = f"{ORS_BASE}/geocode/search"
-    r = requests.get(url, params={"api_key": ORS_API_KEY, "text": text, "size": size})
-    if not r.ok:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    return r.json()
+    # ZODB-Zugriffe blockieren → im Threadpool, der Event-Loop bleibt frei
+    cached, stale = await run_in_threadpool(_lookup_geocode_cache, text, size)
+    if cached is not None:
+        return cached
+
+    async def fetch_geocode() -> Dict[str, Any]:
+        url = f"{ORS_BASE}/geocode/search"
+        data = await _ors_client.get_json(
+            url, params={"api_key": ORS_API_KEY, "text": text, "size": size}, upstream="geocode"
+        )
+        await run_in_threadpool(_store_geocode_cache, text, size, data)
+        return data
+
+    if stale is not None:
+        _revalidator.serve_stale("geocode", ("geocode",) + GeocodeCache.make_key(text, size), fetch_geocode)
+        return stale
+    return await fetch_geocode()
+
+
+Coordinate = Annotated[List[float], Field(min_length=2, max_length=2)]
 
 
 class DirectionsIn(BaseModel):
-    start: List[float]
-    end: List[float]
+    start: Coordinate
+    end: Coordinate
     profile: str = "driving-car"
 
 
+_directions_cache = TtlLruCache(
+    max_entries=DIRECTIONS_CACHE_SIZE,
+    ttl_seconds=DIRECTIONS_CACHE_TTL_SECONDS,
+    stale_seconds=ORS_STALE_SECONDS,
+)
+# Gleichzeitige identische Anfragen (z. B. zwei Browser-Tabs) lösen nur einen ORS-Aufruf aus
+_directions_flights = SingleFlight()
+
+
+async def _directions(profile: str, start: List[float], end: List[float]) -> Dict[str, Any]:
+    # Gemeinsamer Pfad für Einzel- und Batch-Routing: Cache, dann gebündelter ORS-Aufruf
+    cache_key = (
+        profile,
+        quantize_coordinates(start, DIRECTIONS_CACHE_PRECISION),
+        quantize_coordinates(end, DIRECTIONS_CACHE_PRECISION),
+    )
+    cached = _directions_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    async def fetch_directions():
+        url = f"{ORS_BASE}/v2/directions/{profile}"
+        data = await _ors_client.post_json(
+            url,
+            headers={"Authorization": ORS_API_KEY, "Content-Type": "application/json"},
+            json={"coordinates": [start, end]},
+            upstream="directions",
+        )
+        _directions_cache.set(cache_key, data)
+        return data
+
+    stale = _directions_cache.get_stale(cache_key)
+    if stale is not None:
+        _revalidator.serve_stale(
+            "directions", ("directions",) + cache_key, lambda: _directions_flights.do(cache_key, fetch_directions)
+        )
+        return stale
+    return await _directions_flights.do(cache_key, fetch_directions)
+
+
 @app.post("/api/ors/directions")
-def ors_directions(payload: DirectionsIn):
+async def ors_directions(payload: DirectionsIn):
+    if not ORS_API_KEY:
+        raise HTTPException(status_code=500, detail="ORS_API_KEY not configured")
+    return await _directions(payload.profile, payload.start, payload.end)
+
+
+async def _gather_bounded(
+    calls: List[Callable[[], Awaitable[Any]]], concurrency: int
+) -> List[Any]:
+    # Alle Aufrufe parallel, aber höchstens `concurrency` gleichzeitig; Fehler werden
+    # als Exception-Objekt im Ergebnis zurückgegeben statt den ganzen Batch abzubrechen
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(call: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*(bounded(call) for call in calls), return_exceptions=True)
+
+
+def _error_item(error: BaseException) -> Dict[str, Any]:
+    if isinstance(error, HTTPException):
+        return {"status": error.status_code, "error": error.detail}
+    return {"status": 500, "error": str(error)}
+
+
+class DirectionsPairIn(BaseModel):
+    start: Coordinate
+    end: Coordinate
+
+
+class DirectionsBatchIn(BaseModel):
+    pairs: List[DirectionsPairIn] = Field(..., min_length=1, max_length=DIRECTIONS_BATCH_MAX_PAIRS)
+    profile: str = "driving-car"
+    include_geometry: bool = False
+
+
+@app.post("/api/ors/directions/batch")
+async def ors_directions_batch(payload: DirectionsBatchIn) -> Dict[str, Any]:
+    # Viele Start/Ziel-Paare in einem Request: paralleles Fan-out an ORS (begrenzt durch
+    # DIRECTIONS_BATCH_CONCURRENCY), Cache und Bündelung wie bei /api/ors/directions.
+    # Fehler einzelner Paare stehen im jeweiligen Eintrag, der Rest wird trotzdem geliefert.
     if not ORS_API_KEY:
         raise HTTPException(status_code=500, detail="ORS_API_KEY not configured")
-    url = f"{ORS_BASE}/v2/directions/{payload.profile}"
-    r = requests.post(
+    outcomes = await _gather_bounded(
+        [
+            (lambda pair=pair: _directions(payload.profile, pair.start, pair.end))
+            for pair in payload.pairs
+        ],
+        DIRECTIONS_BATCH_CONCURRENCY,
+    )
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            results.append({"index": index, **_error_item(outcome)})
+            continue
+        try:
+            route = outcome["routes"][0]
+            item = {
+                "index": index,
+                "status": 200,
+                "distance_meters": route["summary"].get("distance"),
+                "duration_seconds": route["summary"].get("duration"),
+            }
+            if payload.include_geometry:
+                item["geometry_encoded"] = route.get("geometry")
+        except (KeyError, IndexError, TypeError, AttributeError) as error:
+            # ORS-Antwort ohne verwertbare Route: nur dieses Paar scheitert
+            item = {"index": index, "status": 502, "error": f"Unexpected OpenRouteService response: {error!r}"}
+        results.append(item)
+    return {
+        "profile": payload.profile,
+        "results": results,
+        "failed": sum(1 for item in results if item["status"] != 200),
+    }
+
+
+class MatrixIn(BaseModel):
+    origins: List[Coordinate] = Field(..., min_length=1, max_length=MATRIX_MAX_LOCATIONS)
+    destinations: List[Coordinate] = Field(..., min_length=1, max_length=MATRIX_MAX_LOCATIONS)
+    profile: str = "driving-car"
+
+
+async def _matrix_block(profile: str, origins: List[List[float]], destinations: List[List[float]]) -> Dict[str, Any]:
+    url = f"{ORS_BASE}/v2/matrix/{profile}"
+    return await _ors_client.post_json(
         url,
         headers={"Authorization": ORS_API_KEY, "Content-Type": "application/json"},
-        json={"coordinates": [payload.start, payload.end]},
+        json={
+            "locations": origins + destinations,
+            "sources": list(range(len(origins))),
+            "destinations": list(range(len(origins), len(origins) + len(destinations))),
+            "metrics": ["distance", "duration"],
+        },
+        upstream="matrix",
     )
-    if not r.ok:
-        raise HTTPException(status_code=r.status_code, detail=r.text)
-    return r.json()
+
+
+@app.post("/api/ors/matrix")
+async def ors_matrix(payload: MatrixIn) -> Dict[str, Any]:
+    # Distanzen/Fahrzeiten Quellen × Ziele über die ORS-Matrix-API (ein Aufruf statt
+    # eines Routings pro Paar). Überschreitet die Matrix MATRIX_MAX_ELEMENTS, wird sie
+    # in Zeilenblöcke geteilt, die parallel abgefragt werden; schlägt ein Block fehl,
+    # bleiben seine Zeilen null und der Fehler steht in "errors".
+    if not ORS_API_KEY:
+        raise HTTPException(status_code=500, detail="ORS_API_KEY not configured")
+    rows_per_block = max(1, MATRIX_MAX_ELEMENTS // len(payload.destinations))
+    blocks = [
+        payload.origins[start:start + rows_per_block]
+        for start in range(0, len(payload.origins), rows_per_block)
+    ]
+    outcomes = await _gather_bounded(
+        [
+            (lambda block=block: _matrix_block(payload.profile, block, payload.destinations))
+            for block in blocks
+        ],
+        DIRECTIONS_BATCH_CONCURRENCY,
+    )
+    distances: List[Optional[List[Optional[float]]]] = []
+    durations: List[Optional[List[Optional[float]]]] = []
+    errors = []
+    for block_index, (block, outcome) in enumerate(zip(blocks, outcomes)):
+        first_origin = block_index * rows_per_block
+        if isinstance(outcome, BaseException):
+            errors.append({
+                "origins": [first_origin, first_origin + len(block) - 1],
+                **_error_item(outcome),
+            })
+            distances.extend([None] * len(block))
+            durations.extend([None] * len(block))
+            continue
+        distances.extend(outcome.get("distances") or [None] * len(block))
+        durations.extend(outcome.get("durations") or [None] * len(block))
+    return {
+        "profile": payload.profile,
+        "distances_meters": distances,
+        "durations_seconds": durations,
+        "errors": errors,
+        "ors_requests": len(blocks),
+    }
 
 
 # ==========================================================
-# CRUD-Endpunkte für gespeicherte Routen
+# Top-Suchanfragen (global, alle Nutzer)
 # ==========================================================
-@app.get("/api/routes", response_model=List[RouteOut])
-def list_routes():
-    connection, root = get_root_connection()
+# Schlüssel: normalisierte (Start, Ziel)-Texte; Anzeige: zuletzt gesuchte Schreibweise
+_top_searches = TopSearches(TOP_SEARCHES_CAPACITY)
+
+
+def _load_top_searches() -> None:
+    with open_connection() as connection:
+        store = connection.root().get("top_searches")
+        _top_searches.replace_summary(store.entries if store is not None else {}, flushed=False)
+
+
+def flush_top_searches() -> bool:
+    # Ausstehende Zählungen zum Stand in der ZODB addieren (bei Konflikt wird neu gelesen
+    # und wiederholt); schlägt das Schreiben fehl, bleiben sie für den nächsten Versuch stehen
+    pending = _top_searches.take_pending()
+    if not pending:
+        return False
     try:
-        routes_store: OOBTree = get_routes_store(existing_connection=connection)
-        result: List[RouteOut] = []
-        for identifier, route in routes_store.items():  # type: ignore
-            result.append(
-                RouteOut(
-                    identifier=identifier,
-                    start_text=route.start_text,
-                    end_text=route.end_text,
-                    start_coordinates=route.start_coordinates,
-                    end_coordinates=route.end_coordinates,
-                    distance_meters=route.distance_meters,
-                    duration_seconds=route.duration_seconds,
-                    geometry_encoded=route.geometry_encoded,
-                    profile=route.profile,
-                    created_at=route.created_at,
-                )
+        with open_connection() as connection:
+            entries = write_transaction(
+                connection, lambda: dict(_top_searches.write(connection.root(), pending))
             )
-        return result
-    finally:
-        connection.close()
+    except Exception:
+        _top_searches.restore_pending(pending)
+        raise
+    _top_searches.replace_summary(entries)
+    return True
 
 
-@app.post("/api/routes", response_model=RouteOut, status_code=201)
-def create_route(route_in: RouteIn):
-    connection, root = get_root_connection()
-    try:
-        routes_store: OOBTree = get_routes_store(existing_connection=connection)
-        identifier = str(int(datetime.utcnow().timestamp() * 1000))
-        new_route = Route(
-            start_text=route_in.start_text,
-            end_text=route_in.end_text,
-            start_coordinates=route_in.start_coordinates,
-            end_coordinates=route_in.end_coordinates,
-            distance_meters=route_in.distance_meters,
-            duration_seconds=route_in.duration_seconds,
-            geometry_encoded=route_in.geometry_encoded,
-            profile=route_in.profile,
+async def _flush_top_searches_periodically() -> None:
+    while True:
+        await asyncio.sleep(TOP_SEARCHES_FLUSH_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(flush_top_searches)
+        except Exception:
+            # Zählungen bleiben ausstehend; nächster Versuch nach dem Intervall
+            pass
+
+
+class SearchIn(BaseModel):
+    start_text: str = Field(..., min_length=1, max_length=200)
+    end_text: str = Field(..., min_length=1, max_length=200)
+
+
+@app.post("/api/searches", status_code=204, response_model=None)
+def record_search(search: SearchIn) -> Response:
+    # Nur im Speicher zählen; in die ZODB geht es gesammelt alle TOP_SEARCHES_FLUSH_INTERVAL_SECONDS
+    key = (normalize_query(search.start_text), normalize_query(search.end_text))
+    _top_searches.record(key, f"{search.start_text.strip()} → {search.end_text.strip()}")
+    return Response(status_code=204)
+
+
+@app.get("/api/searches/top")
+def top_searches(limit: int = Query(10, ge=1, le=100)) -> List[Dict[str, Any]]:
+    # count ist eine Obergrenze; error gibt an, um wie viel sie höchstens zu hoch sein kann
+    return [
+        {
+            "label": item["label"],
+            "start_text": item["key"][0],
+            "end_text": item["key"][1],
+            "count": item["count"],
+            "error": item["error"],
+        }
+        for item in _top_searches.top(limit)
+    ]
+
+
+async def prewarm_top_searches(limit: int) -> Dict[str, int]:
+    # Autocomplete- und Geocode-Cache für die Orte der häufigsten Suchen füllen
+    # (gleiche Parameter wie das Frontend: Vorschläge size=5, Geocoding size=1)
+    texts = list(dict.fromkeys(text for item in _top_searches.top(limit) for text in item["key"]))
+    outcomes = await _gather_bounded(
+        [
+            call
+            for text in texts
+            for call in (
+                lambda text=text: ors_autocomplete(text, size=5),
+                lambda text=text: ors_geocode(text, size=1),
+            )
+        ],
+        DIRECTIONS_BATCH_CONCURRENCY,
+    )
+    failed = sum(1 for outcome in outcomes if isinstance(outcome, BaseException))
+    return {"texts": len(texts), "requests": len(outcomes), "failed": failed}
+
+
+# ==========================================================
+# CRUD-Endpunkte für gespeicherte Routen
+# ==========================================================
+def _route_out(identifier: str, route: Route, include_geometry: bool = True) -> RouteOut:
+    # include_geometry=False: der Geometrie-Datensatz wird gar nicht erst geladen
+    return RouteOut(
+        identifier=identifier,
+        start_text=route.start_text,
+        end_text=route.end_text,
+        start_coordinates=route.start_coordinates,
+        end_coordinates=route.end_coordinates,
+        distance_meters=route.distance_meters,
+        duration_seconds=route.duration_seconds,
+        geometry_encoded=route.geometry_encoded if include_geometry else None,
+        profile=route.profile,
+        created_at=route.created_at,
+    )
+
+
+def _route_dict(identifier: str, route: Route, include_geometry: bool = True) -> Dict[str, Any]:
+    # Schneller Pfad für Listen: direkt aus den Attributen der persistenten Route, ohne
+    # RouteOut-Modell und ohne erneute Validierung; gleiche Felder wie RouteOut
+    return {
+        "identifier": identifier,
+        "start_text": route.start_text,
+        "end_text": route.end_text,
+        "start_coordinates": route.start_coordinates,
+        "end_coordinates": route.end_coordinates,
+        "distance_meters": route.distance_meters,
+        "duration_seconds": route.duration_seconds,
+        "geometry_encoded": route.geometry_encoded if include_geometry else None,
+        "profile": route.profile,
+        "created_at": route.created_at,
+    }
+
+
+def _last_transaction(connection: Connection) -> bytes:
+    # Kennung der letzten ZODB-Transaktion: ändert sich mit jedem Commit. Erst die Kennung
+    # lesen, dann die Verbindung auf den neuesten Stand bringen → der gelesene Inhalt ist
+    # mindestens so neu wie die Kennung (schlimmstenfalls wird einmal unnötig neu geladen).
+    last_transaction = get_database().lastTransaction()
+    connection.transaction_manager.abort()
+    return last_transaction
+
+
+def _collection_etag(connection: Connection) -> str:
+    # Schwach (W/), weil die gzip-komprimierte Antwort andere Bytes hat
+    return f'W/"{_last_transaction(connection).hex()}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+
+def _iterate_routes(routes_store: OOBTree, after: Optional[str]) -> Iterator[Tuple[str, Route]]:
+    # Schlüsselbereich ab dem Cursor – der BTree springt direkt hin, kein Vollscan
+    if after is None:
+        return iter(routes_store.items())
+    return iter(routes_store.items(min=after, excludemin=True))
+
+
+def _select_routes(
+    root, routes_store: OOBTree, after: Optional[str], filters: Optional[Dict[str, Any]]
+) -> Iterator[Tuple[str, Route]]:
+    # Ohne Filter: Schlüsselreihenfolge; mit Filtern: Sekundärindizes, neueste zuerst
+    if filters is None:
+        return _iterate_routes(routes_store, after)
+    identifiers = get_route_indexes(root, routes_store).query(after=after, **filters)
+    return ((identifier, routes_store[identifier]) for identifier in identifiers)
+
+
+NDJSON_CHUNK_ROUTES = 100
+NDJSON_CACHE_GC_ROUTES = 1000
+
+
+def _stream_routes_ndjson(
+    after: Optional[str],
+    limit: Optional[int],
+    filters: Optional[Dict[str, Any]],
+    include_geometry: bool = True,
+) -> Iterator[bytes]:
+    # Eigene Verbindung: der Generator läuft erst nach dem Handler,
+    # StreamingResponse ruft ihn aus wechselnden Threadpool-Threads auf.
+    with open_connection() as connection:
+        root = connection.root()
+        routes_store = root.get("routes")
+        if routes_store is None:
+            return
+        chunk: List[bytes] = []
+        for count, (identifier, route) in enumerate(
+            islice(_select_routes(root, routes_store, after, filters), limit), start=1
+        ):
+            chunk.append(orjson.dumps(_route_dict(identifier, route, include_geometry)))
+            if len(chunk) >= NDJSON_CHUNK_ROUTES:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+            if count % NDJSON_CACHE_GC_ROUTES == 0:
+                # bereits gesendete Routen wieder zu Ghosts machen → Speicher bleibt konstant
+                connection.cacheGC()
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+
+@app.get("/api/routes", response_model=List[RouteOut])
+def list_routes(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after: Optional[str] = None,
+    output_format: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+    profile: Optional[str] = None,
+    min_distance_meters: Optional[float] = Query(None, ge=0),
+    max_distance_meters: Optional[float] = Query(None, ge=0),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    order: str = Query("identifier", pattern="^(identifier|newest)$"),
+    include_geometry: bool = True,
+    connection: Connection = Depends(get_connection),
+):
+    # Ohne Parameter: alle Routen als Liste (wie bisher).
+    # limit/after: Cursor-Paginierung über den Schlüsselbereich; gibt es weitere
+    # Routen, steht der nächste Cursor im Header X-Next-Cursor.
+    # format=ndjson: Routen werden beim Lesen gestreamt (eine JSON-Zeile pro Route).
+    # profile, min/max_distance_meters, created_from/to bzw. order=newest: Abfrage über
+    # die Sekundärindizes in O(log n + k), Ergebnis neueste zuerst.
+    # include_geometry=false: ohne geometry_encoded, die Geometrien werden nicht geladen
+    # (einzelne Route dann über GET /api/routes/{identifier}).
+    # Die Antwort wird direkt aus den Routen mit orjson serialisiert; ETag = letzte
+    # ZODB-Transaktion, bei passendem If-None-Match kommt 304 ohne Inhalt.
+    filters: Optional[Dict[str, Any]] = {
+        "profile": profile,
+        "min_distance_meters": min_distance_meters,
+        "max_distance_meters": max_distance_meters,
+        "created_from": created_from,
+        "created_to": created_to,
+    }
+    if order == "identifier" and all(value is None for value in filters.values()):
+        filters = None
+
+    etag = _collection_etag(connection)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    root = connection.root()
+    routes_store: OOBTree = get_routes_store(existing_connection=connection)
+    if filters is not None and after is not None and after not in routes_store:
+        raise HTTPException(status_code=400, detail="unknown cursor")
+    if output_format == "ndjson":
+        return StreamingResponse(
+            _stream_routes_ndjson(after, limit, filters, include_geometry),
+            media_type="application/x-ndjson",
+            headers=headers,
         )
-        routes_store[identifier] = new_route  # type: ignore
-        transaction.commit()
-        return RouteOut(
-            identifier=identifier,
-            start_text=new_route.start_text,
-            end_text=new_route.end_text,
-            start_coordinates=new_route.start_coordinates,
-            end_coordinates=new_route.end_coordinates,
-            distance_meters=new_route.distance_meters,
-            duration_seconds=new_route.duration_seconds,
-            geometry_encoded=new_route.geometry_encoded,
-            profile=new_route.profile,
-            created_at=new_route.created_at,
+
+    with span("load"):
+        routes = _select_routes(root, routes_store, after, filters)
+        if limit is None:
+            page = [_route_dict(identifier, route, include_geometry) for identifier, route in routes]
+        else:
+            # eine Route mehr lesen, um zu wissen, ob es eine nächste Seite gibt
+            page = [
+                _route_dict(identifier, route, include_geometry)
+                for identifier, route in islice(routes, limit + 1)
+            ]
+            if len(page) > limit:
+                page = page[:limit]
+                headers["X-Next-Cursor"] = page[-1]["identifier"]
+    with span("serialize"):
+        body = orjson.dumps(page)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+class NearbyRouteOut(RouteOut):
+    start_distance_meters: float
+
+
+@app.get("/api/routes/in-bounds", response_model=List[RouteOut])
+def list_routes_in_bounds(
+    min_longitude: float = Query(..., ge=-180, le=180),
+    min_latitude: float = Query(..., ge=-90, le=90),
+    max_longitude: float = Query(..., ge=-180, le=180),
+    max_latitude: float = Query(..., ge=-90, le=90),
+    limit: int = Query(500, ge=1, le=5000),
+    connection: Connection = Depends(get_connection),
+):
+    # Routen, deren Begrenzungsrechteck den Kartenausschnitt schneidet
+    if min_longitude > max_longitude or min_latitude > max_latitude:
+        raise HTTPException(status_code=422, detail="min must not exceed max")
+    root = connection.root()
+    routes_store: OOBTree = get_routes_store(existing_connection=connection)
+    spatial_index = get_spatial_index(root, routes_store)
+    identifiers = spatial_index.intersecting(
+        (min_longitude, min_latitude, max_longitude, max_latitude), limit=limit
+    )
+    return [_route_out(identifier, routes_store[identifier]) for identifier in identifiers]
+
+
+@app.get("/api/routes/nearby", response_model=List[NearbyRouteOut])
+def list_routes_nearby(
+    longitude: float = Query(..., ge=-180, le=180),
+    latitude: float = Query(..., ge=-90, le=90),
+    radius_meters: float = Query(..., gt=0, le=100_000),
+    limit: int = Query(100, ge=1, le=5000),
+    connection: Connection = Depends(get_connection),
+):
+    # Routen, deren Start im Umkreis liegt, die nächsten zuerst
+    root = connection.root()
+    routes_store: OOBTree = get_routes_store(existing_connection=connection)
+    spatial_index = get_spatial_index(root, routes_store)
+    return [
+        NearbyRouteOut(
+            **_route_out(identifier, routes_store[identifier]).model_dump(),
+            start_distance_meters=distance,
+        )
+        for identifier, distance in spatial_index.starting_near(
+            longitude, latitude, radius_meters, limit=limit
         )
+    ]
+
+
+@app.get("/api/routes/search")
+def search_routes(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=200),
+    min_similarity: float = Query(0.5, gt=0, le=1),
+    include_geometry: bool = False,
+    connection: Connection = Depends(get_connection),
+) -> Response:
+    # Textsuche in Start-/Zieltext über den Trigramm-Index: "zurich" findet "Zürich",
+    # "bahnh" findet "Bahnhof". Beste Treffer zuerst, score = Anteil gefundener Trigramme.
+    root = connection.root()
+    routes_store: OOBTree = get_routes_store(existing_connection=connection)
+    results = [
+        {**_route_dict(identifier, routes_store[identifier], include_geometry), "score": score}
+        for identifier, score in get_route_text_index(root, routes_store).search(q, limit, min_similarity)
+    ]
+    return Response(orjson.dumps(results), media_type="application/json")
+
+
+def _store_route(root, routes_store: OOBTree, route_in: RouteIn) -> Tuple[str, Route]:
+    # Gemeinsamer Pfad für Einzel- und Batch-Import: Route anlegen und alle Indizes pflegen.
+    # Committen muss der Aufrufer.
+    identifier = new_route_identifier()
+    new_route = Route(
+        start_text=route_in.start_text,
+        end_text=route_in.end_text,
+        start_coordinates=route_in.start_coordinates,
+        end_coordinates=route_in.end_coordinates,
+        distance_meters=route_in.distance_meters,
+        duration_seconds=route_in.duration_seconds,
+        geometry_encoded=route_in.geometry_encoded,
+        profile=route_in.profile,
+    )
+    routes_store[identifier] = new_route  # type: ignore
+    get_spatial_index(root, routes_store).add(identifier, new_route)
+    get_route_indexes(root, routes_store).add(identifier, new_route)
+    get_route_text_index(root, routes_store).add(identifier, new_route)
+    get_route_change_feed(root).record(CREATED, identifier)
+    return identifier, new_route
+
+
+def _store_routes(connection: Connection, routes_in: List[RouteIn]) -> List[Tuple[str, Route]]:
+    # Bei einem Konflikt wird die ganze Arbeit wiederholt → Store und Root jedes Mal neu lesen
+    root = connection.root()
+    routes_store: OOBTree = get_routes_store(existing_connection=connection)
+    return [_store_route(root, routes_store, route_in) for route_in in routes_in]
+
+
+@app.post("/api/routes", response_model=RouteOut, status_code=201)
+def create_route(route_in: RouteIn, connection: Connection = Depends(get_connection)):
+    # Antwort noch auf der schreibenden Verbindung bauen (mit Group Commit die des Schreib-Threads)
+    def store(writer: Connection) -> RouteOut:
+        [(identifier, new_route)] = _store_routes(writer, [route_in])
+        return _route_out(identifier, new_route)
+
+    return group_write(connection, store)
+
+
+class RouteBatchIn(BaseModel):
+    routes: List[RouteIn] = Field(..., min_length=1, max_length=ROUTES_BATCH_MAX_ROUTES)
+
+
+class RouteBatchOut(BaseModel):
+    created: int
+    commits: int
+    identifiers: List[str]
+
+
+@app.post("/api/routes/batch", response_model=RouteBatchOut, status_code=201)
+def create_routes_batch(
+    batch: RouteBatchIn,
+    chunk_size: int = Query(ROUTES_BATCH_CHUNK_SIZE, ge=0),
+    connection: Connection = Depends(get_connection),
+):
+    # Viele Routen mit einem Commit (chunk_size=0) bzw. einem Commit pro chunk_size Routen
+    # statt einer Transaktion (und einem fsync) pro Route. Die Validierung der ganzen
+    # Liste erfolgt vorher durch pydantic – eine ungültige Route speichert nichts.
+    step = chunk_size or len(batch.routes)
+    identifiers: List[str] = []
+    commits = 0
+    for start in range(0, len(batch.routes), step):
+        chunk = batch.routes[start:start + step]
+        stored = write_transaction(connection, lambda: _store_routes(connection, chunk))
+        identifiers.extend(identifier for identifier, _ in stored)
+        commits += 1
+        # bereits gespeicherte Routen aus dem Objekt-Cache entlassen
+        connection.cacheGC()
+    return RouteBatchOut(created=len(identifiers), commits=commits, identifiers=identifiers)
+
+
+@app.get("/api/routes/export")
+def export_routes() -> StreamingResponse:
+    # Alle Routen als NDJSON-Download, gestreamt wie GET /api/routes?format=ndjson
+    return StreamingResponse(
+        _stream_routes_ndjson(after=None, limit=None, filters=None),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="routes.ndjson"'},
+    )
+
+
+ROUTE_CHANGES_STREAM_BATCH = 1000
+ROUTE_CHANGES_KEEPALIVE_SECONDS = 15.0
+
+
+def _parse_change_token(token: Optional[str]) -> Optional[bytes]:
+    if token is None:
+        return None
+    try:
+        return parse_change_token(token)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid change token")
+
+
+def _read_route_changes(connection: Connection, since: Optional[bytes], limit: int) -> Dict[str, Any]:
+    # Ohne since nur das aktuelle Token (Einstieg vor dem ersten vollständigen Laden).
+    # Angelegte Routen kommen ohne Geometrie mit, wie in der Liste mit include_geometry=false.
+    current = _last_transaction(connection)
+    if since is None:
+        return {"token": current.hex(), "changes": [], "more": False}
+    root = connection.root()
+    routes_store: OOBTree = get_routes_store(existing_connection=connection)
+    try:
+        changes, last_serial, more = get_route_change_feed(root).changes_since(since, limit)
+    except ChangeTokenExpired:
+        raise HTTPException(status_code=410, detail="change token expired, reload all routes")
+    items: List[Dict[str, Any]] = []
+    for change in changes:
+        item: Dict[str, Any] = {"kind": change.kind, "identifier": change.identifier}
+        if change.kind == CREATED:
+            route = routes_store.get(change.identifier)
+            # inzwischen wieder gelöscht: route ist None, das Löschereignis folgt
+            item["route"] = _route_dict(change.identifier, route, include_geometry=False) if route is not None else None
+        items.append(item)
+    # Bei more=True ist alles bis zur letzten vollständig gelieferten Transaktion geliefert.
+    # Sonst alles bis zur gelesenen Transaktion – und bis zur letzten gelieferten: die
+    # Verbindung wurde erst nach dem Lesen von `current` aktualisiert und kann Ereignisse
+    # späterer Commits enthalten, die beim nächsten Abgleich nicht nochmals kommen dürfen.
+    if more:
+        token = last_serial
+    else:
+        token = max(since, current, last_serial or since)
+    return {"token": token.hex(), "changes": items, "more": more}
+
+
+@app.get("/api/routes/changes")
+def list_route_changes(
+    since: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    connection: Connection = Depends(get_connection),
+) -> Response:
+    # Inkrementeller Abgleich: Ereignisse (created/deleted) nach dem Token `since`, Aufwand
+    # proportional zur Anzahl Änderungen statt zur Grösse der Sammlung. Das Token ist eine
+    # ZODB-Transaktionskennung; ist es älter als das aufbewahrte Protokoll → 410, der Client
+    # lädt die ganze Liste neu. Bei more=true mit dem neuen Token sofort weiterfragen.
+    result = _read_route_changes(connection, _parse_change_token(since), limit)
+    return Response(orjson.dumps(result), media_type="application/json")
+
+
+def _read_route_changes_once(since: Optional[bytes], limit: int) -> Dict[str, Any]:
+    with open_connection() as connection:
+        return _read_route_changes(connection, since, limit)
+
+
+_route_change_streams = 0
+
+
+async def _route_change_events(since: Optional[bytes]) -> AsyncIterator[bytes]:
+    # Pro offenem Stream nur ein Vergleich der letzten Transaktionskennung pro Intervall;
+    # gelesen wird erst, wenn seit dem Token etwas committet wurde
+    global _route_change_streams
+    _route_change_streams += 1
+    try:
+        yield b"retry: 3000\n\n"
+        if since is None:
+            since = parse_change_token((await run_in_threadpool(_read_route_changes_once, None, 1))["token"])
+        idle_seconds = 0.0
+        while True:
+            if get_database().lastTransaction() > since:
+                try:
+                    result = await run_in_threadpool(_read_route_changes_once, since, ROUTE_CHANGES_STREAM_BATCH)
+                except HTTPException:
+                    # Token abgelaufen: Client lädt die ganze Liste neu und verbindet sich erneut
+                    yield b"event: resync\ndata: {}\n\n"
+                    return
+                since = parse_change_token(result["token"])
+                if result["changes"]:
+                    yield b"id: %s\nevent: changes\ndata: %s\n\n" % (result["token"].encode(), orjson.dumps(result))
+                    idle_seconds = 0.0
+                    if result["more"]:
+                        continue
+            if idle_seconds >= ROUTE_CHANGES_KEEPALIVE_SECONDS:
+                # Kommentarzeile hält Proxys und Load Balancer von einem Timeout ab
+                yield b": keepalive\n\n"
+                idle_seconds = 0.0
+            await asyncio.sleep(ROUTE_CHANGES_POLL_SECONDS)
+            idle_seconds += ROUTE_CHANGES_POLL_SECONDS
     finally:
-        connection.close()
+        _route_change_streams -= 1
+
+
+@app.get("/api/routes/changes/stream")
+async def stream_route_changes(request: Request, since: Optional[str] = None) -> StreamingResponse:
+    # Server-Sent Events: schiebt neue Ereignisse wie GET /api/routes/changes. Beim automatischen
+    # Wiederverbinden setzt der Browser Last-Event-ID = zuletzt empfangenes Token.
+    # Content-Encoding gesetzt, damit GZipMiddleware den Stream nicht puffert.
+    token = _parse_change_token(request.headers.get("last-event-id") or since)
+    return StreamingResponse(
+        _route_change_events(token),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
+
+
+def trim_route_changes() -> int:
+    # Ereignisse älter als ROUTE_CHANGES_RETENTION_SECONDS entfernen
+    with open_connection() as connection:
+        return write_transaction(
+            connection, lambda: get_route_change_feed(connection.root()).trim(ROUTE_CHANGES_RETENTION_SECONDS)
+        )
+
+
+async def _trim_route_changes_periodically() -> None:
+    while True:
+        await asyncio.sleep(ROUTE_CHANGES_TRIM_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(trim_route_changes)
+        except Exception:
+            # nächster Versuch nach dem Intervall
+            pass
+
+
+@app.get("/api/routes/{identifier}", response_model=RouteOut)
+def get_route(identifier: str, connection: Connection = Depends(get_connection)):
+    # Einzelne Route inkl. Geometrie (erst hier wird der Geometrie-Datensatz geladen).
+    # Muss nach den festen Pfaden (/in-bounds, /nearby, /search, /export, /changes) registriert sein.
+    routes_store: OOBTree = get_routes_store(existing_connection=connection)
+    route = routes_store.get(identifier)
+    if route is None:
+        raise HTTPException(status_code=404, detail="route not found")
+    return _route_out(identifier, route)
+
+
+@app.get("/api/routes/{identifier}/geometry")
+def get_route_geometry(
+    identifier: str,
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+    output_format: str = Query("encoded", alias="format", pattern="^(encoded|coordinates)$"),
+    connection: Connection = Depends(get_connection),
+) -> Dict[str, Any]:
+    # Geometrie im Detailgrad der Kartenzoomstufe: bei kleinem Zoom die vorberechnete
+    # vereinfachte Polyline, ohne zoom die volle Geometrie.
+    # format=coordinates: serverseitig dekodiert als [[lat, lon], ...]
+    routes_store: OOBTree = get_routes_store(existing_connection=connection)
+    route = routes_store.get(identifier)
+    if route is None:
+        raise HTTPException(status_code=404, detail="route not found")
+    level_zoom, encoded = route.geometry_for_zoom(zoom)
+    result: Dict[str, Any] = {"identifier": identifier, "zoom": zoom, "level_zoom": level_zoom}
+    if output_format == "coordinates":
+        latitudes, longitudes = decode_polyline_arrays(encoded or "")
+        result["coordinates"] = [[latitude, longitude] for latitude, longitude in zip(latitudes, longitudes)]
+    else:
+        result["geometry_encoded"] = encoded
+    return result
 
 
 @app.delete("/api/routes/{identifier}", status_code=204, response_model=None)
-def delete_route(identifier: str) -> Response:
-    connection, root = get_root_connection()
-    try:
-        routes_store: OOBTree = get_routes_store(existing_connection=connection)
-        if identifier in routes_store:  # type: ignore
-            del routes_store[identifier]  # type: ignore
-            transaction.commit()
-            return Response(status_code=204)
-        else:
+def delete_route(identifier: str, connection: Connection = Depends(get_connection)) -> Response:
+    def remove(writer: Connection) -> None:
+        root = writer.root()
+        routes_store: OOBTree = get_routes_store(existing_connection=writer)
+        if identifier not in routes_store:  # type: ignore
             raise HTTPException(status_code=404, detail="route not found")
+        del routes_store[identifier]  # type: ignore
+        get_spatial_index(root, routes_store).remove(identifier)
+        get_route_indexes(root, routes_store).remove(identifier)
+        get_route_text_index(root, routes_store).remove(identifier)
+        get_route_change_feed(root).record(DELETED, identifier)
+
+    group_write(connection, remove)
+    return Response(status_code=204)
+
+
+# ==========================================================
+# Admin-Endpunkte (Cache- und Storage-Statistiken)
+# ==========================================================
+@app.get("/api/admin/caches")
+def cache_statistics() -> Dict[str, Any]:
+    return {
+        "autocomplete": _autocomplete_cache.stats(),
+        "directions": {**_directions_cache.stats(), **_directions_flights.stats()},
+        "revalidations_running": _revalidator.running(),
+    }
+
+
+@app.get("/api/admin/ors-scheduler")
+def ors_scheduler_statistics() -> Dict[str, Any]:
+    # Kontingent, Warteschlangen und Abweisungen; ohne Kontingent (ORS_RATE_LIMIT_PER_MINUTE=0) leer
+    return _ors_scheduler.stats() if _ors_scheduler is not None else {"enabled": False}
+
+
+@app.get("/api/admin/top-searches")
+def top_searches_statistics() -> Dict[str, Any]:
+    return _top_searches.stats()
+
+
+@app.post("/api/admin/top-searches/flush")
+def flush_top_searches_now() -> Dict[str, Any]:
+    return {"flushed": flush_top_searches(), **_top_searches.stats()}
+
+
+@app.post("/api/admin/top-searches/prewarm")
+async def prewarm_top_searches_now(limit: int = Query(20, ge=1, le=100)) -> Dict[str, int]:
+    if not ORS_API_KEY:
+        raise HTTPException(status_code=500, detail="ORS_API_KEY not configured")
+    return await prewarm_top_searches(limit)
+
+
+@app.get("/api/admin/geocode-cache")
+def geocode_cache_statistics(
+    limit: int = 50, connection: Connection = Depends(get_connection)
+) -> Dict[str, Any]:
+    return _geocode_cache.inspect(get_geocode_cache_store(connection.root()), limit=limit)
+
+
+@app.delete("/api/admin/geocode-cache")
+def clear_geocode_cache(connection: Connection = Depends(get_connection)) -> Dict[str, int]:
+    # Gleichzeitiges Speichern eines Geocode-Ergebnisses → Konflikt, wird wiederholt (sonst 503)
+    removed = write_transaction(
+        connection, lambda: _geocode_cache.clear(get_geocode_cache_store(connection.root()))
+    )
+    return {"removed": removed}
+
+
+@app.get("/api/admin/storage")
+def storage_statistics() -> Dict[str, Any]:
+    # Dateigrösse, Anzahl Datensätze und letzter Pack-Vorgang
+    return get_pack_scheduler().stats()
+
+
+@app.post("/api/admin/storage/pack")
+def pack_storage() -> Dict[str, Any]:
+    # Manuell packen; läuft im Threadpool, andere Requests werden nicht blockiert
+    try:
+        return get_pack_scheduler().pack_now()
+    except PackAlreadyRunning:
+        raise HTTPException(status_code=409, detail="pack already running")
+
+
+# Stack-Sampler: immer nur einer gleichzeitig, er belegt für die Dauer einen Threadpool-Thread
+_profile_sampling = threading.Lock()
+
+
+def _require_profiling() -> None:
+    if not REQUEST_PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="request profiling disabled")
+
+
+@app.get("/api/admin/profiling/slowest")
+def slowest_requests() -> Dict[str, Any]:
+    # Die langsamsten Requests seit Start bzw. letztem Zurücksetzen, mit Abschnitten in ms
+    _require_profiling()
+    return {"recorded": _slowest_requests.recorded, "slowest": _slowest_requests.slowest()}
+
+
+@app.delete("/api/admin/profiling/slowest", status_code=204, response_model=None)
+def clear_slowest_requests() -> Response:
+    _require_profiling()
+    _slowest_requests.clear()
+    return Response(status_code=204)
+
+
+@app.post("/api/admin/profiling/sample")
+def sample_profile(
+    seconds: float = Query(5.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    limit: int = Query(30, ge=1, le=200),
+) -> Dict[str, Any]:
+    # Statistisches Profil aller Threads über ein begrenztes Zeitfenster (Event-Loop und Threadpool)
+    _require_profiling()
+    if not _profile_sampling.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="profile sampling already running")
+    try:
+        return sample_stacks(min(seconds, REQUEST_PROFILING_MAX_WINDOW_SECONDS), interval_ms / 1000, limit)
     finally:
-        connection.close()
+        _profile_sampling.release()
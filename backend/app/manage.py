@@ -0,0 +1,49 @@
+"""
+Wartungsbefehle für die ZODB des Backends.
+
+    cd backend
+    python -m app.manage rebuild-indexes
+    python -m app.manage migrate-geometry [--personal-routes]
+
+Der Backend-Server muss dafür gestoppt sein (FileStorage sperrt die Datei exklusiv).
+"""
+from __future__ import annotations
+import argparse
+import json
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        "rebuild-indexes",
+        help="Räumlichen Index, Sekundärindizes und Textindex aus den gespeicherten Routen neu aufbauen",
+    )
+    migrate_geometry = commands.add_parser(
+        "migrate-geometry",
+        help="Geometrien bestehender Routen in die kompakte Ablage (eigener Datensatz/Blob) verschieben",
+    )
+    migrate_geometry.add_argument(
+        "--personal-routes",
+        action="store_true",
+        help="die persönlichen Routen aus app.database statt der Routen aus app.main migrieren",
+    )
+    arguments = parser.parse_args()
+
+    if arguments.command == "migrate-geometry" and arguments.personal_routes:
+        from .database import migrate_personal_route_geometries
+
+        print(json.dumps(migrate_personal_route_geometries()))
+        return
+
+    # Import erst hier: app.main lädt die ganze FastAPI-App
+    from . import main as application
+
+    if arguments.command == "rebuild-indexes":
+        print(json.dumps(application.rebuild_route_indexes()))
+    elif arguments.command == "migrate-geometry":
+        print(json.dumps(application.migrate_route_geometries()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Schlanke Metriken im Prometheus-Textformat (ohne zusätzliche Abhängigkeit).
+
+Zähler und Histogramme werden beim Messen nur hochgezählt (feste Buckets, ein
+Lock pro Label-Kombination); Werte wie Poolauslastung oder Anzahl Routen werden
+erst beim Abruf von /metrics über Callbacks gelesen.
+"""
+from __future__ import annotations
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Sekunden; deckt schnelle Cache-Treffer bis langsame ORS-Routenberechnungen ab
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, label_values: LabelValues = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, label_values: LabelValues = ()) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            samples = sorted(self._values.items())
+        for label_values, value in samples:
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class _HistogramSeries:
+    __slots__ = ("lock", "bucket_counts", "total", "count")
+
+    def __init__(self, bucket_count: int):
+        self.lock = threading.Lock()
+        self.bucket_counts = [0] * bucket_count
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._lock = threading.Lock()
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, label_values: LabelValues, value: float) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(label_values, _HistogramSeries(len(self.buckets)))
+        index = bisect_left(self.buckets, value)
+        with series.lock:
+            series.bucket_counts[index] += 1
+            series.total += value
+            series.count += 1
+
+    def count(self, label_values: LabelValues = ()) -> int:
+        series = self._series.get(label_values)
+        return series.count if series is not None else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            all_series = sorted(self._series.items())
+        for label_values, series in all_series:
+            with series.lock:
+                bucket_counts = list(series.bucket_counts)
+                total, count = series.total, series.count
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, label_values, f'le="{_format_value(upper_bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """Werte, die erst beim Abruf gelesen werden (gauge oder counter)."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        label_names: Sequence[str],
+        callback: Callable[[], Iterable[Tuple[LabelValues, float]]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.label_names = tuple(label_names)
+        self._callback = callback
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for label_values, value in self._callback():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Reine ASGI-Middleware (kein BaseHTTPMiddleware): misst die Dauer jedes HTTP-Requests
+    und ordnet sie der Routen-Vorlage (z. B. /api/routes/{identifier}) und dem Status zu.
+    """
+
+    def __init__(self, app: Any, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # der Router trägt die gefundene Route in den Scope ein; sonst feste Kennung
+            # statt des Pfads, damit die Anzahl Label-Kombinationen begrenzt bleibt
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            self.histogram.observe(
+                (scope["method"], template, str(status_code)), time.perf_counter() - started
+            )
+
+
+class TransferCountMonitor:
+    """
+    ZODB-Aktivitätsmonitor: zählt beim Schliessen jeder Verbindung die aus dem Storage
+    geladenen (= nicht im Objekt-Cache gefundenen) und geschriebenen Objekte.
+    """
+
+    def __init__(self, loads: Counter, stores: Counter):
+        self._loads = loads
+        self._stores = stores
+
+    def closedConnection(self, connection: Any) -> None:
+        loads, stores = connection.getTransferCounts(True)
+        if loads:
+            self._loads.inc(amount=loads)
+        if stores:
+            self._stores.inc(amount=stores)
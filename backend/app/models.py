@@ -1,7 +1,20 @@
+"""
+Datenmodelle: Pydantic-Schemas der persönlichen Routen und die persistente Route der App.
+
+Keine Nebenwirkungen beim Import (Datenbank, Pflicht-Konfiguration): der ZEO-Server importiert
+die Klassen gespeicherter Objekte, um Konflikte in BTrees aufzulösen. Ältere Datensätze
+verweisen auf app.main.Route, das diese Klasse weiterhin exportiert.
+"""
 from __future__ import annotations
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import Optional, Dict, Any, Tuple
+from persistent import Persistent
 from pydantic import BaseModel, Field
 
+from .config import get_settings
+from .geometry import select_level_zoom, simplify_polyline_levels
+from .geometry_storage import GeometryData
+
 class Coordinates(BaseModel):
     longitude: float = Field(..., description="Längengrad (lon)")
     latitude: float = Field(..., description="Breitengrad (lat)")
@@ -23,3 +36,77 @@ class PersonalRoute(BaseModel):
     duration_seconds: float
     geometry: Optional[OpenRouteServiceGeometry] = None
     created_at_iso: Optional[str] = None  # ISO-String für Klarheit (statt datetime-Objekt)
+
+
+def simplified_geometry_levels(encoded: Optional[str]) -> Dict[int, GeometryData]:
+    if not encoded:
+        return {}
+    return {
+        zoom: GeometryData(level.encode("ascii"))
+        for zoom, level in simplify_polyline_levels(encoded, get_settings().geometry_level_zooms).items()
+    }
+
+
+class Route(Persistent):
+    def __init__(
+        self,
+        start_text: str,
+        end_text: str,
+        start_coordinates: Dict[str, float],
+        end_coordinates: Dict[str, float],
+        distance_meters: Optional[float],
+        duration_seconds: Optional[float],
+        geometry_encoded: Optional[str],
+        profile: str,
+    ):
+        self.start_text = start_text
+        self.end_text = end_text
+        self.start_coordinates = start_coordinates
+        self.end_coordinates = end_coordinates
+        self.distance_meters = distance_meters
+        self.duration_seconds = duration_seconds
+        self.geometry_encoded = geometry_encoded
+        self.profile = profile
+        self.created_at = datetime.utcnow()
+
+    # Die kodierte Polyline liegt in einem eigenen Datensatz (GeometryData): Listen ohne
+    # Geometrie laden sie nicht mit. Ältere Datensätze haben noch das Attribut
+    # geometry_encoded direkt in __dict__ (→ python -m app.manage migrate-geometry).
+    geometry: Optional[GeometryData] = None
+    # Vereinfachte Polylines pro Zoomstufe ({zoom: GeometryData}); None bei Routen, die vor
+    # den Detailstufen gespeichert wurden (→ migrate-geometry bzw. Berechnung beim Abruf)
+    geometry_levels: Optional[Dict[int, GeometryData]] = None
+
+    @property
+    def geometry_encoded(self) -> Optional[str]:
+        if self.geometry is not None:
+            return self.geometry.read().decode("ascii")
+        return self.__dict__.get("geometry_encoded")
+
+    @geometry_encoded.setter
+    def geometry_encoded(self, value: Optional[str]) -> None:
+        self._p_activate()
+        self.__dict__.pop("geometry_encoded", None)
+        self.geometry = (
+            GeometryData(value.encode("ascii"), get_settings().geometry_blob_threshold_bytes) if value else None
+        )
+        self.geometry_levels = simplified_geometry_levels(value)
+
+    @property
+    def has_legacy_geometry(self) -> bool:
+        self._p_activate()
+        return "geometry_encoded" in self.__dict__
+
+    def geometry_for_zoom(self, zoom: Optional[int]) -> Tuple[Optional[int], Optional[str]]:
+        # (gewählte Stufe, Polyline); Stufe None = volle Geometrie
+        levels = self.geometry_levels
+        if levels is None:
+            # ältere Route ohne gespeicherte Stufen: nur für diese Antwort berechnen
+            encoded = self.geometry_encoded
+            computed = simplify_polyline_levels(encoded, get_settings().geometry_level_zooms) if encoded else {}
+            level_zoom = select_level_zoom(computed, zoom)
+            return level_zoom, computed[level_zoom] if level_zoom is not None else encoded
+        level_zoom = select_level_zoom(levels, zoom)
+        if level_zoom is None:
+            return None, self.geometry_encoded
+        return level_zoom, levels[level_zoom].read().decode("ascii")
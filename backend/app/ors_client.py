@@ -0,0 +1,151 @@
+from __future__ import annotations
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Collection, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from .metrics import Counter, Histogram
+from .ors_scheduler import UpstreamRejected, UpstreamScheduler, retry_after_header
+from .profiling import add_span, span
+from .resilience import CircuitBreaker, CircuitOpen, LatencyTracker, hedged
+
+# Dauer und Fehler pro ORS-Aufruf (autocomplete/geocode/directions), unter /metrics registriert
+UPSTREAM_LATENCY = Histogram(
+    "ors_upstream_request_duration_seconds", "Dauer der Aufrufe an OpenRouteService", ("upstream",)
+)
+UPSTREAM_ERRORS = Counter(
+    "ors_upstream_errors_total",
+    "Fehlgeschlagene Aufrufe an OpenRouteService nach Upstream-Status (timeout/unreachable ohne Antwort)",
+    ("upstream", "status"),
+)
+
+
+class OrsClient:
+    """
+    Gemeinsamer, gepoolter HTTP-Client für OpenRouteService.
+    Verbindungen bleiben offen (Keep-Alive), statt pro Anfrage neu TCP+TLS aufzubauen;
+    ein Handler belegt während des Wartens keinen Threadpool-Worker.
+    Mit `scheduler` wartet jede Anfrage vorher auf ein Token aus dem ORS-Kontingent.
+
+    Pro Upstream (autocomplete/geocode/directions/matrix) optional:
+    - `deadlines`: Gesamtzeit inkl. Warten auf das Kontingent und Zweitanfrage → sonst 504
+    - `breakers`: nach wiederholten Fehlern (5xx, Timeout, nicht erreichbar) sofort 503
+    - `hedge_upstreams`: ohne Antwort nach p95 der letzten Aufrufe (mindestens
+      `hedge_min_delay_seconds`) eine zweite, identische Anfrage senden
+    """
+    def __init__(
+        self,
+        pool_size: int,
+        connect_timeout_seconds: float,
+        read_timeout_seconds: float,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        scheduler: Optional[UpstreamScheduler] = None,
+        deadlines: Optional[Dict[str, float]] = None,
+        breakers: Optional[Dict[str, CircuitBreaker]] = None,
+        hedge_upstreams: Collection[str] = (),
+        hedge_min_delay_seconds: float = 0.1,
+    ) -> None:
+        self._scheduler = scheduler
+        self._deadlines = deadlines or {}
+        self._breakers = breakers or {}
+        self._hedge_upstreams = frozenset(hedge_upstreams)
+        self._hedge_min_delay_seconds = hedge_min_delay_seconds
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout_seconds, connect=connect_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+            transport=transport,
+        )
+
+    async def request_json(self, method: str, url: str, upstream: str = "other", **kwargs: Any) -> Any:
+        """Führt die Anfrage aus und liefert das JSON; Fehler werden zu HTTPException."""
+        breaker = self._breakers.get(upstream)
+        if breaker is not None:
+            try:
+                breaker.before_call()
+            except CircuitOpen as circuit_open:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"OpenRouteService unavailable ({circuit_open})",
+                    headers={"Retry-After": str(max(1, math.ceil(circuit_open.retry_after_seconds)))},
+                )
+
+        def attempt() -> Awaitable[Any]:
+            return self._request_json_once(method, url, upstream, **kwargs)
+
+        if upstream in self._hedge_upstreams:
+            delay = self._latencies.setdefault(upstream, LatencyTracker()).percentile(0.95)
+            call = hedged(attempt, max(self._hedge_min_delay_seconds, delay or 0), upstream)
+        else:
+            call = attempt()
+        deadline = self._deadlines.get(upstream)
+        try:
+            result = await (asyncio.wait_for(call, deadline) if deadline else call)
+        except asyncio.TimeoutError:
+            UPSTREAM_ERRORS.inc((upstream, "deadline"))
+            if breaker is not None:
+                breaker.record_failure()
+            raise HTTPException(status_code=504, detail="OpenRouteService deadline exceeded")
+        except HTTPException as error:
+            if breaker is not None:
+                # 5xx/Timeout: Upstream krank; 429 (Kontingent): keine Aussage; übrige 4xx: Upstream antwortet
+                if error.status_code >= 500:
+                    breaker.record_failure()
+                elif error.status_code == 429:
+                    breaker.release_probe()
+                else:
+                    breaker.record_success()
+            raise
+        except BaseException:
+            if breaker is not None:
+                breaker.release_probe()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+    async def _request_json_once(self, method: str, url: str, upstream: str, **kwargs: Any) -> Any:
+        if self._scheduler is not None:
+            try:
+                with span("ors_queue"):
+                    await self._scheduler.acquire(upstream)
+            except UpstreamRejected as rejected:
+                raise HTTPException(status_code=429, detail=str(rejected), headers=retry_after_header(rejected))
+        started = time.perf_counter()
+        try:
+            r = await self._client.request(method, url, **kwargs)
+        except httpx.TimeoutException:
+            UPSTREAM_ERRORS.inc((upstream, "timeout"))
+            raise HTTPException(status_code=504, detail="OpenRouteService timeout")
+        except httpx.TransportError as ex:
+            UPSTREAM_ERRORS.inc((upstream, "unreachable"))
+            raise HTTPException(status_code=502, detail=f"OpenRouteService unreachable: {ex}")
+        finally:
+            elapsed = time.perf_counter() - started
+            UPSTREAM_LATENCY.observe((upstream,), elapsed)
+            add_span("ors", elapsed)
+        if not r.is_success:
+            UPSTREAM_ERRORS.inc((upstream, str(r.status_code)))
+            if r.status_code == 429 and self._scheduler is not None:
+                self._scheduler.throttle()
+            raise HTTPException(status_code=r.status_code, detail=r.text)
+        if upstream in self._hedge_upstreams:
+            self._latencies.setdefault(upstream, LatencyTracker()).observe(time.perf_counter() - started)
+        return r.json()
+
+    async def get_json(self, url: str, params: Dict[str, Any], upstream: str = "other") -> Any:
+        return await self.request_json("GET", url, upstream=upstream, params=params)
+
+    async def post_json(
+        self, url: str, json: Any, headers: Dict[str, str], upstream: str = "other"
+    ) -> Any:
+        return await self.request_json("POST", url, upstream=upstream, json=json, headers=headers)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,215 @@
+"""
+Kontingent-Steuerung für alle Aufrufe an OpenRouteService.
+
+Alle Anfragen teilen sich einen ORS_API_KEY mit festem Minutenkontingent. Ein
+Token-Bucket begrenzt die Rate; ist er leer, warten Anfragen in einer begrenzten
+Warteschlange nach Priorität (Routenberechnung vor Geocoding vor Autocomplete).
+Niedrige Prioritäten dürfen die letzten Tokens nicht verbrauchen und geben nach
+kurzer Wartezeit auf – ein veralteter Autocomplete-Vorschlag nützt niemandem.
+"""
+from __future__ import annotations
+import asyncio
+import heapq
+import math
+import time
+from itertools import count as sequence
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .metrics import Counter, Histogram
+
+# Rangfolge: kleinere Position = wichtiger
+PRIORITY_CLASSES = ("directions", "geocode", "autocomplete")
+UPSTREAM_PRIORITIES = {
+    "directions": "directions",
+    "matrix": "directions",
+    "geocode": "geocode",
+    "autocomplete": "autocomplete",
+}
+
+# Unter /metrics registriert
+SCHEDULER_REQUESTS = Counter(
+    "ors_scheduler_requests_total",
+    "ORS-Anfragen im Scheduler nach Priorität und Ergebnis (admitted/queue_full/evicted/stale)",
+    ("priority", "outcome"),
+)
+SCHEDULER_WAIT = Histogram(
+    "ors_scheduler_wait_seconds", "Wartezeit auf ein ORS-Token nach Priorität", ("priority",)
+)
+
+
+class UpstreamRejected(Exception):
+    """Anfrage abgewiesen: Warteschlange voll, verdrängt oder zu lange gewartet."""
+
+    def __init__(self, priority: str, reason: str, retry_after_seconds: float):
+        super().__init__(f"ORS quota exhausted ({priority}: {reason})")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+class _Waiter:
+    __slots__ = ("priority", "future")
+
+    def __init__(self, priority: str, future: "asyncio.Future[None]"):
+        self.priority = priority
+        self.future = future
+
+
+class UpstreamScheduler:
+    """
+    Token-Bucket mit `requests_per_minute` und höchstens `burst` angesparten Tokens.
+
+    `reserve_tokens[priority]`: so viele Tokens müssen nach der Entnahme noch übrig
+    bleiben – sie sind für wichtigere Anfragen reserviert. `max_wait_seconds[priority]`:
+    wer länger wartet, wird abgewiesen. Ist die Warteschlange (`max_queue`) voll, verdrängt
+    eine wichtigere Anfrage die zuletzt eingereihte der niedrigsten Priorität.
+    Alle Methoden laufen im Event-Loop (nicht thread-sicher).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        burst: int,
+        max_queue: int,
+        max_wait_seconds: Dict[str, float],
+        reserve_tokens: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate_per_second = requests_per_minute / 60
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.reserve_tokens = reserve_tokens or {}
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated_at = clock()
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = sequence()
+        self._waiting: Dict[str, int] = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    def _needed(self, priority: str) -> float:
+        return 1 + self.reserve_tokens.get(priority, 0)
+
+    def _seconds_until(self, tokens: float) -> float:
+        return max(0.0, (tokens - self._tokens) / self.rate_per_second)
+
+    def _waiting_at_or_above(self, rank: int) -> bool:
+        return any(self._waiting[priority] for priority in PRIORITY_CLASSES[:rank + 1])
+
+    async def acquire(self, upstream: str) -> None:
+        """Wartet auf ein Token für `upstream`; wirft UpstreamRejected, wenn keins kommt."""
+        priority = UPSTREAM_PRIORITIES.get(upstream, "geocode")
+        rank = PRIORITY_CLASSES.index(priority)
+        self._refill()
+        # Sofort durchlassen, wenn genug Tokens da sind und niemand Gleich- oder Höherrangiges wartet
+        if not self._waiting_at_or_above(rank) and self._tokens >= self._needed(priority):
+            self._tokens -= 1
+            SCHEDULER_REQUESTS.inc((priority, "admitted"))
+            SCHEDULER_WAIT.observe((priority,), 0.0)
+            return
+
+        if self._queued() >= self.max_queue:
+            victim = self._lowest_priority_waiter(below_rank=rank)
+            if victim is None:
+                SCHEDULER_REQUESTS.inc((priority, "queue_full"))
+                raise UpstreamRejected(priority, "queue_full", self._retry_after(priority))
+            victim.future.set_exception(
+                UpstreamRejected(victim.priority, "evicted", self._retry_after(victim.priority))
+            )
+
+        waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (rank, next(self._sequence), waiter))
+        self._waiting[priority] += 1
+        started = self._clock()
+        self._schedule()
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.max_wait_seconds.get(priority))
+        except asyncio.TimeoutError:
+            SCHEDULER_REQUESTS.inc((priority, "stale"))
+            raise UpstreamRejected(priority, "stale", self._retry_after(priority)) from None
+        except UpstreamRejected as rejected:
+            SCHEDULER_REQUESTS.inc((priority, rejected.reason))
+            raise
+        finally:
+            self._waiting[priority] -= 1
+        SCHEDULER_REQUESTS.inc((priority, "admitted"))
+        SCHEDULER_WAIT.observe((priority,), self._clock() - started)
+
+    def _queued(self) -> int:
+        # verdrängte Wartende stehen noch bis zu ihrem Aufwachen im Heap
+        return sum(1 for _, _, waiter in self._queue if not waiter.future.done())
+
+    def _lowest_priority_waiter(self, below_rank: int) -> Optional[_Waiter]:
+        candidates = [
+            (rank, position, waiter)
+            for rank, position, waiter in self._queue
+            if rank > below_rank and not waiter.future.done()
+        ]
+        return max(candidates, key=lambda item: item[:2])[2] if candidates else None
+
+    def _retry_after(self, priority: str) -> float:
+        return self._seconds_until(self._needed(priority)) or 1 / self.rate_per_second
+
+    def _schedule(self) -> None:
+        # Weckzeit für den vordersten Wartenden neu setzen (er kann sich durch Einreihen ändern)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue and self._queue[0][2].future.done():
+            heapq.heappop(self._queue)
+        if not self._queue:
+            return
+        self._refill()
+        delay = self._seconds_until(self._needed(self._queue[0][2].priority))
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self) -> None:
+        self._timer = None
+        self._refill()
+        while self._queue:
+            waiter = self._queue[0][2]
+            if waiter.future.done():
+                # abgelaufen, verdrängt oder vom Client abgebrochen
+                heapq.heappop(self._queue)
+                continue
+            if self._tokens < self._needed(waiter.priority):
+                break
+            heapq.heappop(self._queue)
+            self._tokens -= 1
+            waiter.future.set_result(None)
+        self._schedule()
+
+    def throttle(self) -> None:
+        """ORS hat mit 429 geantwortet: angesparte Tokens verwerfen."""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0)
+
+    def queue_depths(self) -> Dict[str, int]:
+        return dict(self._waiting)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "requests_per_minute": round(self.rate_per_second * 60, 3),
+            "burst": self.burst,
+            "tokens": round(self._tokens, 3),
+            "max_queue": self.max_queue,
+            "queue_depth": self.queue_depths(),
+            "requests": {
+                priority: {
+                    outcome: SCHEDULER_REQUESTS.value((priority, outcome))
+                    for outcome in ("admitted", "queue_full", "evicted", "stale")
+                }
+                for priority in PRIORITY_CLASSES
+            },
+        }
+
+
+def retry_after_header(rejected: UpstreamRejected) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(rejected.retry_after_seconds)))}
@@ -0,0 +1,101 @@
+"""
+Regelmässiges Packen der ZODB im Hintergrund und Kennzahlen zum Speicherwachstum.
+
+Jedes Anlegen/Löschen hängt eine Transaktion an die FileStorage-Datei an; erst
+`DB.pack()` entfernt alte Objektversionen. Gepackt wird in einem Worker-Thread,
+FileStorage nimmt währenddessen weiter Commits an.
+"""
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+from ZODB import DB
+
+
+class PackAlreadyRunning(RuntimeError):
+    pass
+
+
+class PackScheduler:
+    """Packt `database` alle `interval_seconds` und behält die Historie der letzten `retention_seconds`."""
+
+    def __init__(
+        self,
+        database: DB,
+        storage_file: Optional[str],
+        interval_seconds: float,
+        retention_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._database = database
+        # nur bei FileStorage bekannt; bei ZEO liegt die Datei auf dem Server
+        self._storage_file = storage_file
+        self.interval_seconds = interval_seconds
+        self.retention_seconds = retention_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.packs = 0
+        self.failures = 0
+        self.last_pack_at: Optional[float] = None
+        self.last_pack_duration_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def pack_now(self) -> Dict[str, Any]:
+        """Packt sofort (blockierend); läuft bereits ein Pack-Vorgang → PackAlreadyRunning."""
+        if not self._lock.acquire(blocking=False):
+            raise PackAlreadyRunning("pack already running")
+        try:
+            started = time.perf_counter()
+            try:
+                self._database.pack(t=self._clock() - self.retention_seconds)
+            except Exception as ex:
+                self.failures += 1
+                self.last_error = str(ex)
+                raise
+            self.last_pack_duration_seconds = round(time.perf_counter() - started, 3)
+            self.last_pack_at = self._clock()
+            self.last_error = None
+            self.packs += 1
+        finally:
+            self._lock.release()
+        return self.stats()
+
+    async def run(self) -> None:
+        # Endlosschleife für den Lebenszyklus der App (wird beim Herunterfahren abgebrochen)
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await anyio.to_thread.run_sync(self.pack_now)
+            except Exception:
+                # Fehler stehen in den Kennzahlen; der nächste Versuch folgt nach dem Intervall
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        file_size_bytes = None
+        if self._storage_file and os.path.exists(self._storage_file):
+            file_size_bytes = os.path.getsize(self._storage_file)
+        return {
+            "file_size_bytes": file_size_bytes,
+            "records": len(self._database.storage),
+            "interval_seconds": self.interval_seconds,
+            "retention_seconds": self.retention_seconds,
+            "running": self.running,
+            "packs": self.packs,
+            "failures": self.failures,
+            "last_pack_at": (
+                datetime.fromtimestamp(self.last_pack_at, timezone.utc).isoformat()
+                if self.last_pack_at is not None
+                else None
+            ),
+            "last_pack_duration_seconds": self.last_pack_duration_seconds,
+            "last_error": self.last_error,
+        }
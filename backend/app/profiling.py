@@ -0,0 +1,248 @@
+"""
+Zuschaltbare Zeitmessung pro Request (REQUEST_PROFILING_ENABLED).
+
+- `span(name)` misst einen Abschnitt (Validierung, BTree-Lesen, Commit, ORS) und addiert
+  die Dauer zum laufenden Request. Ohne aktive Messung ist es ein ContextVar-Zugriff.
+- ProfilingMiddleware schreibt die Abschnitte als `Server-Timing`-Header in die Antwort
+  und merkt sich die langsamsten Requests mit ihrer Aufteilung (SlowestRequests).
+- `sample_stacks` tastet für ein begrenztes Zeitfenster die Stacks aller Threads ab
+  (statistischer Profiler; cProfile sähe nur den eigenen Thread).
+"""
+from __future__ import annotations
+import asyncio
+import contextvars
+import functools
+import heapq
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from itertools import count as sequence
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+_current_trace: contextvars.ContextVar[Optional["RequestTrace"]] = contextvars.ContextVar(
+    "request_trace", default=None
+)
+_NO_SPAN = nullcontext()
+
+
+class RequestTrace:
+    """Summierte Dauer pro Abschnitt eines Requests (derselbe Abschnitt kann mehrfach vorkommen)."""
+
+    __slots__ = ("spans",)
+
+    def __init__(self) -> None:
+        self.spans: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: RequestTrace, name: str) -> None:
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.trace.add(self.name, time.perf_counter() - self.started)
+
+
+def span(name: str):
+    """Kontextmanager für einen Abschnitt; ohne aktive Messung ein geteiltes nullcontext."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+def add_span(name: str, seconds: float) -> None:
+    """Bereits gemessene Dauer (z. B. aus einem Callback) zum laufenden Request addieren."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route-Klasse, die `route` (ganze FastAPI-Verarbeitung inkl. Validierung, Dependencies
+    und Serialisierung) und `endpoint` (nur die Handler-Funktion) misst.
+    """
+
+    def get_route_handler(self) -> Callable[..., Any]:
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+                with span("endpoint"):
+                    return await endpoint(*args, **kwargs)
+        else:
+            @functools.wraps(endpoint)
+            def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+                # läuft im Threadpool; der Kontext (und damit die Messung) wird mitkopiert
+                with span("endpoint"):
+                    return endpoint(*args, **kwargs)
+        self.dependant.call = timed_endpoint
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Any) -> Any:
+            with span("route"):
+                return await handler(request)
+
+        return timed_handler
+
+
+def server_timing(spans: Dict[str, float]) -> str:
+    """Header-Wert, Dauer in Millisekunden; `framework` = route ohne endpoint."""
+    entries = dict(spans)
+    if "route" in entries and "endpoint" in entries:
+        entries["framework"] = max(0.0, entries["route"] - entries["endpoint"])
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in entries.items())
+
+
+class SlowestRequests:
+    """Die `capacity` langsamsten Requests mit Aufteilung nach Abschnitten (Min-Heap)."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._sequence = sequence()
+        self.recorded = 0
+
+    def record(self, seconds: float, sample: Dict[str, Any]) -> None:
+        with self._lock:
+            self.recorded += 1
+            if len(self._heap) >= self.capacity and seconds <= self._heap[0][0]:
+                return
+            entry = (seconds, next(self._sequence), sample)
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, entry)
+            else:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [sample for _, _, sample in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self.recorded = 0
+
+
+class ProfilingMiddleware:
+    """
+    Reine ASGI-Middleware wie MetricsMiddleware: startet pro HTTP-Request eine Messung,
+    setzt beim Antwortbeginn `Server-Timing` und meldet die Gesamtdauer an `slowest`.
+    Wird nur bei aktivierter Messung eingebunden.
+    """
+
+    def __init__(self, app: Any, slowest: SlowestRequests) -> None:
+        self.app = app
+        self.slowest = slowest
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                spans = {**trace.spans, "total": time.perf_counter() - started}
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", server_timing(spans).encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            seconds = time.perf_counter() - started
+            route = scope.get("route")
+            self.slowest.record(seconds, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None) or "unmatched",
+                "status": status_code,
+                "milliseconds": round(seconds * 1000, 3),
+                "spans": {name: round(value * 1000, 3) for name, value in trace.spans.items()},
+                "finished_at": time.time(),
+            })
+
+
+# Blätter, an denen ein Thread nur wartet (Event-Loop im select, freie Threadpool-Worker)
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("_worker.py", "run"),
+}
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval_seconds: float = 0.005, limit: int = 30) -> Dict[str, Any]:
+    """
+    Tastet `seconds` lang alle `interval_seconds` die Stacks aller anderen Threads ab.
+    `self`: Stichproben, in denen die Funktion zuoberst lief; `total`: in denen sie
+    irgendwo im Stack stand. Wartende Threads werden nur als `idle_samples` gezählt.
+    Blockiert den aufrufenden Thread für die ganze Dauer.
+    """
+    own_thread = threading.get_ident()
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    stacks: Counter = Counter()
+    samples = idle_samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_identifier, frame in sys._current_frames().items():
+            if thread_identifier == own_thread:
+                continue
+            if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_LEAVES:
+                idle_samples += 1
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            samples += 1
+            self_counts[labels[0]] += 1
+            total_counts.update(set(labels))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval_seconds)
+    return {
+        "seconds": seconds,
+        "interval_seconds": interval_seconds,
+        "samples": samples,
+        "idle_samples": idle_samples,
+        "functions": [
+            {
+                "function": function,
+                "self": self_count,
+                "total": total_counts[function],
+                "self_percent": round(100 * self_count / samples, 1),
+            }
+            for function, self_count in self_counts.most_common(limit)
+        ],
+        "stacks": [{"stack": stack, "samples": samples_count} for stack, samples_count in stacks.most_common(limit)],
+    }
@@ -31,8 +31,8 @@ def create_route(payload: PersonalRoute) -> Dict[str, Any]:
     )
     return {"route_identifier": route_identifier, **stored}
 
-def list_routes() -> List[Dict[str, Any]]:
-    return _list()
+def list_routes(limit: Optional[int] = None, after: Optional[str] = None) -> List[Dict[str, Any]]:
+    return _list(limit=limit, after=after)
 
 def get_route(route_identifier: str) -> Optional[Dict[str, Any]]:
     return _get(route_identifier)
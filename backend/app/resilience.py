@@ -0,0 +1,203 @@
+"""
+Bausteine, damit ein langsamer oder ausgefallener ORS-Dienst nicht das ganze Backend mitreisst.
+
+- CircuitBreaker: nach mehreren Fehlern in Folge sofort abweisen statt warten
+- LatencyTracker und `hedged`: idempotente Anfragen nach der üblichen Antwortzeit (p95)
+  ein zweites Mal senden, die schnellere Antwort gewinnt
+- Revalidator: veraltete Antwort sofort liefern und im Hintergrund neu laden
+"""
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, TypeVar
+
+from .metrics import Counter
+
+T = TypeVar("T")
+
+# Unter /metrics registriert
+HEDGED_REQUESTS = Counter(
+    "ors_hedged_requests_total",
+    "Zweitanfragen an ORS nach Upstream (sent = gesendet, won = schneller als die erste)",
+    ("upstream", "outcome"),
+)
+STALE_RESPONSES = Counter(
+    "ors_stale_responses_total",
+    "Veraltete Antworten aus dem Cache, während im Hintergrund neu geladen wird",
+    ("upstream",),
+)
+REVALIDATIONS = Counter(
+    "ors_revalidations_total", "Neuladen veralteter Cache-Einträge nach Ergebnis", ("upstream", "outcome"),
+)
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_after_seconds: float):
+        super().__init__(f"{name} circuit open")
+        self.name = name
+        self.retry_after_seconds = retry_after_seconds
+
+
+class CircuitBreaker:
+    """
+    closed: alles geht durch; nach `failure_threshold` Fehlern in Folge → open.
+    open: sofort CircuitOpen, bis `open_seconds` vergangen sind → half_open.
+    half_open: genau ein Probeaufruf; Erfolg → closed, Fehler → wieder open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        open_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_running = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_running = False
+        return self._state
+
+    def before_call(self) -> None:
+        """Wirft CircuitOpen, wenn der Aufruf gar nicht erst versucht werden soll."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probe_running:
+                self._probe_running = True
+                return
+            self.rejected += 1
+            retry_after = max(0.0, self._opened_at + self.open_seconds - self._clock())
+            raise CircuitOpen(self.name, retry_after or self.open_seconds)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._probe_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probe_running = False
+
+    def release_probe(self) -> None:
+        # Probeaufruf ohne Aussage über den Upstream beendet (z. B. abgebrochen)
+        with self._lock:
+            self._probe_running = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._consecutive_failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class LatencyTracker:
+    """Antwortzeiten der letzten `window` erfolgreichen Aufrufe für ein gleitendes Perzentil."""
+
+    def __init__(self, window: int = 200, minimum_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.minimum_samples = minimum_samples
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if len(self._samples) < self.minimum_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay_seconds: float, upstream: str) -> T:
+    """
+    Startet `call`; ist nach `delay_seconds` keine Antwort da, läuft ein zweiter Aufruf
+    parallel. Die erste erfolgreiche Antwort gewinnt, der andere Aufruf wird abgebrochen.
+    Nur für idempotente Anfragen.
+    """
+    first = asyncio.ensure_future(call())
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay_seconds)
+        if done:
+            return first.result()
+        second = asyncio.ensure_future(call())
+        tasks.add(second)
+        HEDGED_REQUESTS.inc((upstream, "sent"))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        HEDGED_REQUESTS.inc((upstream, "won"))
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class Revalidator:
+    """
+    Stale-while-revalidate: `serve_stale()` lädt einen Schlüssel im Hintergrund neu, pro
+    Schlüssel höchstens einmal gleichzeitig. Fehler werden nur gezählt – bis zum nächsten
+    Versuch bleibt die veraltete Antwort im Cache.
+    """
+
+    def __init__(self) -> None:
+        self._running: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    def serve_stale(self, upstream: str, key: Hashable, refresh: Callable[[], Awaitable[Any]]) -> None:
+        STALE_RESPONSES.inc((upstream,))
+        if key in self._running:
+            return
+        task = asyncio.ensure_future(refresh())
+        self._running[key] = task
+
+        def finished(task: "asyncio.Task[Any]") -> None:
+            self._running.pop(key, None)
+            if task.cancelled():
+                return
+            REVALIDATIONS.inc((upstream, "failed" if task.exception() is not None else "refreshed"))
+
+        task.add_done_callback(finished)
+
+    def running(self) -> int:
+        return len(self._running)
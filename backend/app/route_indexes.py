@@ -0,0 +1,196 @@
+from __future__ import annotations
+import heapq
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+from persistent import Persistent
+from BTrees.IOBTree import IOBTree
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree, OOTreeSet
+
+DISTANCE_BUCKET_METERS = 1000
+# Jede Menge ist in Teilbereiche aufgeteilt (Hash der Kennung vorne im Schlüssel): neue
+# Routen landen sonst alle im selben vordersten Bucket, und gleichzeitige Schreiber
+# kollidieren dort bei jedem Bucket-Split
+INDEX_SHARDS = 16
+
+# Sortierschlüssel (-created_at als Zeitstempel, Kennung): aufsteigend = neueste zuerst
+SortKey = Tuple[float, str]
+# gespeicherter Schlüssel: (Teilbereich, -created_at, Kennung)
+StoredKey = Tuple[int, float, str]
+
+
+def utc_timestamp(moment: datetime) -> float:
+    """Zeitstempel in Sekunden; naive Zeitpunkte gelten als UTC (wie `Route.created_at`)."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _distance_bucket(distance_meters: float) -> int:
+    return int(distance_meters // DISTANCE_BUCKET_METERS)
+
+
+def _stored_key(sort_key: SortKey) -> StoredKey:
+    return (zlib.crc32(sort_key[1].encode("utf-8")) % INDEX_SHARDS, *sort_key)
+
+
+class RouteIndexes(Persistent):
+    """
+    Sekundärindizes über gespeicherte Routen (created_at, profile, distance_meters),
+    gepflegt in derselben Transaktion wie `create_route`/`delete_route`.
+
+    Alle Indizes enthalten denselben Sortierschlüssel (-created_at, Kennung), davor den
+    Teilbereich (INDEX_SHARDS). Abfragen mischen die Teilbereiche wieder zusammen, daher
+    liefert jede die neuesten Routen zuerst und lässt sich per Cursor fortsetzen.
+    """
+    count: Optional[Length] = None
+    shards: Optional[int] = None
+
+    def __init__(self) -> None:
+        self.by_created = OOTreeSet()
+        self.by_profile = OOBTree()     # profile → OOTreeSet(SortKey)
+        self.by_distance = IOBTree()    # Distanz-Bucket (km) → OOTreeSet(SortKey)
+        self.entries = OOBTree()        # Kennung → (SortKey, profile, distance_meters)
+        self.count = Length()           # Anzahl Routen ohne Durchlaufen von entries
+        self.shards = INDEX_SHARDS
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def add(self, identifier: str, route: Any) -> None:
+        self.remove(identifier)
+        sort_key = (-utc_timestamp(route.created_at), identifier)
+        stored_key = _stored_key(sort_key)
+        self.by_created.add(stored_key)
+
+        members = self.by_profile.get(route.profile)
+        if members is None:
+            members = self.by_profile[route.profile] = OOTreeSet()
+        members.add(stored_key)
+
+        if route.distance_meters is not None:
+            bucket = _distance_bucket(route.distance_meters)
+            members = self.by_distance.get(bucket)
+            if members is None:
+                members = self.by_distance[bucket] = OOTreeSet()
+            members.add(stored_key)
+
+        self.entries[identifier] = (sort_key, route.profile, route.distance_meters)
+        self.count.change(1)
+
+    def remove(self, identifier: str) -> None:
+        entry = self.entries.get(identifier)
+        if entry is None:
+            return
+        sort_key, profile, distance_meters = entry
+        stored_key = _stored_key(sort_key)
+        self.by_created.remove(stored_key)
+        self._discard(self.by_profile, profile, stored_key)
+        if distance_meters is not None:
+            self._discard(self.by_distance, _distance_bucket(distance_meters), stored_key)
+        del self.entries[identifier]
+        self.count.change(-1)
+
+    @staticmethod
+    def _discard(tree: Any, key: Any, stored_key: StoredKey) -> None:
+        members = tree.get(key)
+        if members is not None:
+            members.remove(stored_key)
+            if not members:
+                del tree[key]
+
+    def query(
+        self,
+        profile: Optional[str] = None,
+        min_distance_meters: Optional[float] = None,
+        max_distance_meters: Optional[float] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        after: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Kennungen passender Routen, neueste zuerst, ab dem Cursor `after` (exklusiv).
+        Ein Index liefert die Kandidaten (profile vor Distanz vor created_at), die
+        übrigen Bedingungen werden pro Kandidat über `entries` geprüft. Die Iteration
+        ist lazy: für k Ergebnisse kostet sie O(log n + k) (plus übersprungene Kandidaten).
+        """
+        start: Optional[SortKey] = None
+        exclude_start = False
+        if created_to is not None:
+            start = (-utc_timestamp(created_to), "")
+        if after is not None:
+            entry = self.entries.get(after)
+            if entry is None:
+                raise KeyError(after)
+            if start is None or entry[0] >= start:
+                start, exclude_start = entry[0], True
+        stop = -utc_timestamp(created_from) if created_from is not None else None
+
+        def shard_keys(members: OOTreeSet, shard: int) -> Iterator[SortKey]:
+            lower = (shard,) if start is None else (shard, *start)
+            for stored_key in members.keys(
+                min=lower, max=(shard + 1,), excludemin=exclude_start, excludemax=True
+            ):
+                yield stored_key[1:]
+
+        def keys(members: OOTreeSet) -> Iterable[SortKey]:
+            return heapq.merge(*(shard_keys(members, shard) for shard in range(INDEX_SHARDS)))
+
+        distance_filtered = min_distance_meters is not None or max_distance_meters is not None
+        if profile is not None:
+            members = self.by_profile.get(profile)
+            candidates: Iterable[SortKey] = keys(members) if members is not None else ()
+        elif distance_filtered:
+            buckets = self.by_distance.values(
+                min=_distance_bucket(min_distance_meters) if min_distance_meters is not None else None,
+                max=_distance_bucket(max_distance_meters) if max_distance_meters is not None else None,
+            )
+            candidates = heapq.merge(*(keys(members) for members in buckets))
+        else:
+            candidates = keys(self.by_created)
+
+        for sort_key in candidates:
+            if stop is not None and sort_key[0] > stop:
+                break
+            identifier = sort_key[1]
+            if distance_filtered:
+                # profile ist durch die Kandidatenmenge bereits erfüllt
+                distance_meters = self.entries[identifier][2]
+                if distance_meters is None:
+                    continue
+                if min_distance_meters is not None and distance_meters < min_distance_meters:
+                    continue
+                if max_distance_meters is not None and distance_meters > max_distance_meters:
+                    continue
+            yield identifier
+
+    def rebuild(self, routes: Iterable[Tuple[str, Any]]) -> int:
+        self.by_created.clear()
+        self.by_profile.clear()
+        self.by_distance.clear()
+        self.entries.clear()
+        self.count.set(0)
+        self.shards = INDEX_SHARDS
+        count = 0
+        for identifier, route in routes:
+            self.add(identifier, route)
+            count += 1
+        return count
+
+
+def get_route_indexes(root, routes_store: OOBTree) -> RouteIndexes:
+    """Liefert die Sekundärindizes; fehlen sie, werden sie aus den Routen aufgebaut (Commit durch Aufrufer)."""
+    if "routes_indexes" not in root:
+        indexes = RouteIndexes()
+        indexes.rebuild(routes_store.items())
+        root["routes_indexes"] = indexes
+    indexes = root["routes_indexes"]
+    if getattr(indexes, "count", None) is None:
+        # Indizes aus einer älteren Version ohne Zähler
+        indexes.count = Length(len(indexes.entries))
+    if indexes.shards != INDEX_SHARDS:
+        # Indizes aus einer älteren Version ohne bzw. mit anderer Aufteilung
+        indexes.rebuild(routes_store.items())
+    return indexes
@@ -0,0 +1,271 @@
+from __future__ import annotations
+import heapq
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from persistent import Persistent
+from BTrees.OOBTree import OOBTree, OOTreeSet
+
+from .geometry import BoundingBox, bounding_box, decode_polyline
+
+# ==========================================================
+# Geohash
+# ==========================================================
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Zeichen, das grösser als jedes Geohash-Zeichen ist → Obergrenze für Präfix-Bereiche
+_PREFIX_END = "~"
+
+BBOX_MAX_PRECISION = 8        # ≈ 38 m × 19 m
+START_PRECISION = 9           # ≈ 5 m × 5 m
+MAX_COVERING_CELLS = 16
+# Umkreissuche: feinere Überdeckung (Zellen ausserhalb des Kreises werden verworfen),
+# damit kaum Startpunkte ausserhalb des Umkreises gelesen werden
+NEARBY_MAX_COVERING_CELLS = 256
+EARTH_RADIUS_METERS = 6_371_000.0
+
+
+def encode_geohash(longitude: float, latitude: float, precision: int) -> str:
+    longitude_range = [-180.0, 180.0]
+    latitude_range = [-90.0, 90.0]
+    characters: List[str] = []
+    bits = value = 0
+    even = True  # Geohash beginnt mit einem Längengrad-Bit
+    while len(characters) < precision:
+        current_range, coordinate = (longitude_range, longitude) if even else (latitude_range, latitude)
+        middle = (current_range[0] + current_range[1]) / 2
+        if coordinate >= middle:
+            value = (value << 1) | 1
+            current_range[0] = middle
+        else:
+            value <<= 1
+            current_range[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            characters.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return "".join(characters)
+
+
+def _cell_size(precision: int) -> Tuple[float, float]:
+    """Breite (Längengrad) und Höhe (Breitengrad) einer Geohash-Zelle dieser Länge."""
+    longitude_bits = math.ceil(precision * 5 / 2)
+    latitude_bits = precision * 5 // 2
+    return 360.0 / (1 << longitude_bits), 180.0 / (1 << latitude_bits)
+
+
+def _cell_range(minimum: float, maximum: float, origin: float, size: float, cells: int) -> range:
+    first = min(cells - 1, max(0, int((minimum - origin) // size)))
+    last = min(cells - 1, max(0, int((maximum - origin) // size)))
+    return range(first, last + 1)
+
+
+def _covering(box: BoundingBox, max_precision: int, max_cells: int) -> List[Tuple[str, BoundingBox]]:
+    min_longitude, min_latitude, max_longitude, max_latitude = box
+    best: List[Tuple[str, BoundingBox]] = [("", (-180.0, -90.0, 180.0, 90.0))]
+    for precision in range(1, max_precision + 1):
+        width, height = _cell_size(precision)
+        columns = _cell_range(min_longitude, max_longitude, -180.0, width, round(360.0 / width))
+        rows = _cell_range(min_latitude, max_latitude, -90.0, height, round(180.0 / height))
+        if len(columns) * len(rows) > max_cells:
+            break
+        best = []
+        for column in columns:
+            for row in rows:
+                west, south = -180.0 + column * width, -90.0 + row * height
+                cell = encode_geohash(west + width / 2, south + height / 2, precision)
+                best.append((cell, (west, south, west + width, south + height)))
+    return best
+
+
+def covering_cells(box: BoundingBox, max_precision: int, max_cells: int = MAX_COVERING_CELLS) -> List[str]:
+    """
+    Geohash-Zellen, die das Rechteck vollständig überdecken – mit der grössten
+    Genauigkeit, bei der höchstens `max_cells` Zellen nötig sind.
+    """
+    return [cell for cell, _ in _covering(box, max_precision, max_cells)]
+
+
+def _common_prefix(first: str, second: str) -> str:
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return first[:length]
+
+
+def _intersects(first: BoundingBox, second: BoundingBox) -> bool:
+    return not (
+        first[2] < second[0] or second[2] < first[0]
+        or first[3] < second[1] or second[3] < first[1]
+    )
+
+
+def haversine_meters(longitude_a: float, latitude_a: float, longitude_b: float, latitude_b: float) -> float:
+    phi_a, phi_b = math.radians(latitude_a), math.radians(latitude_b)
+    delta_phi = phi_b - phi_a
+    delta_lambda = math.radians(longitude_b - longitude_a)
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi_a) * math.cos(phi_b) * math.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+# ==========================================================
+# Persistenter Index
+# ==========================================================
+def _point(coordinates: Dict[str, float]) -> Optional[Tuple[float, float]]:
+    try:
+        return float(coordinates["longitude"]), float(coordinates["latitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def route_bounding_box(route: Any) -> Optional[BoundingBox]:
+    """Rechteck über Start, Ziel und (falls dekodierbar) die Routengeometrie."""
+    points = [point for point in (_point(route.start_coordinates), _point(route.end_coordinates)) if point]
+    if route.geometry_encoded:
+        try:
+            points.extend((longitude, latitude) for latitude, longitude in decode_polyline(route.geometry_encoded))
+        except (IndexError, ValueError):
+            pass  # unlesbare Geometrie → nur Start/Ziel
+    return bounding_box(points)
+
+
+class SpatialIndex(Persistent):
+    """
+    Räumlicher Index der gespeicherten Routen (liegt als eigenes Objekt im ZODB-Root
+    und wird in derselben Transaktion wie die Route gepflegt).
+
+    - `cells`: Geohash-Zelle → Routen, deren Rechteck vollständig in dieser Zelle liegt
+      (längster gemeinsamer Präfix der Rechteck-Ecken, wie in einem Quadtree).
+    - `starts`: "Geohash des Startpunkts|Kennung" → Startpunkt, für Umkreissuchen per
+      Präfix-Bereich; der Startpunkt liegt im selben Bucket wie der Schlüssel.
+    - `entries`: Kennung → (Zelle, Start-Schlüssel, Rechteck, Startpunkt) zum Entfernen und Nachprüfen.
+    """
+    def __init__(self) -> None:
+        self.cells = OOBTree()
+        self.starts = OOBTree()
+        self.entries = OOBTree()
+
+    def add(self, identifier: str, route: Any) -> None:
+        self.remove(identifier)
+        box = route_bounding_box(route)
+        if box is None:
+            return
+        cell = _common_prefix(
+            encode_geohash(box[0], box[1], BBOX_MAX_PRECISION),
+            encode_geohash(box[2], box[3], BBOX_MAX_PRECISION),
+        )
+        members = self.cells.get(cell)
+        if members is None:
+            members = self.cells[cell] = OOTreeSet()
+        members.add(identifier)
+
+        start = _point(route.start_coordinates)
+        start_key = None
+        if start is not None:
+            start_key = f"{encode_geohash(start[0], start[1], START_PRECISION)}|{identifier}"
+            self.starts[start_key] = start
+        self.entries[identifier] = (cell, start_key, box, start)
+
+    def remove(self, identifier: str) -> None:
+        entry = self.entries.get(identifier)
+        if entry is None:
+            return
+        cell, start_key, _, _ = entry
+        members = self.cells.get(cell)
+        if members is not None:
+            members.remove(identifier)
+            if not members:
+                del self.cells[cell]
+        if start_key is not None:
+            del self.starts[start_key]
+        del self.entries[identifier]
+
+    def _candidates(self, box: BoundingBox) -> Set[str]:
+        candidates: Set[str] = set()
+        visited_prefixes: Set[str] = set()
+        for cell in covering_cells(box, BBOX_MAX_PRECISION):
+            # grössere Zellen, die diese Zelle enthalten (Vorfahren, inkl. der Zelle selbst)
+            for length in range(len(cell) + 1):
+                prefix = cell[:length]
+                if prefix in visited_prefixes:
+                    continue
+                visited_prefixes.add(prefix)
+                members = self.cells.get(prefix)
+                if members is not None:
+                    candidates.update(members)
+            # kleinere Zellen innerhalb dieser Zelle (Nachfahren) per Schlüsselbereich
+            for _, members in self.cells.items(min=cell, max=cell + _PREFIX_END, excludemin=True):
+                candidates.update(members)
+        return candidates
+
+    def intersecting(self, box: BoundingBox, limit: Optional[int] = None) -> List[str]:
+        """Kennungen aller Routen, deren Rechteck das gegebene Rechteck schneidet (sortiert)."""
+        result = sorted(
+            identifier for identifier in self._candidates(box)
+            if _intersects(self.entries[identifier][2], box)
+        )
+        return result[:limit] if limit is not None else result
+
+    def starting_near(
+        self, longitude: float, latitude: float, radius_meters: float, limit: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        (Kennung, Distanz in Metern) der Routen mit Start im Umkreis, nach Distanz sortiert.
+        Liest nur die Startpunkte in Zellen, die den Kreis berühren; Punkte ausserhalb des
+        umschliessenden Rechtecks werden ohne Haversine verworfen, und bei `limit` bleiben
+        nur die nächsten `limit` Treffer in einem begrenzten Heap.
+        """
+        latitude_delta = math.degrees(radius_meters / EARTH_RADIUS_METERS)
+        longitude_delta = latitude_delta / max(math.cos(math.radians(latitude)), 1e-6)
+        box = (
+            max(-180.0, longitude - longitude_delta),
+            max(-90.0, latitude - latitude_delta),
+            min(180.0, longitude + longitude_delta),
+            min(90.0, latitude + latitude_delta),
+        )
+
+        def found() -> Iterator[Tuple[float, str]]:
+            for cell, cell_box in _covering(box, START_PRECISION, NEARBY_MAX_COVERING_CELLS):
+                # nächster Punkt der Zelle zum Mittelpunkt: ausserhalb des Radius → Zelle überspringen
+                nearest_longitude = min(max(longitude, cell_box[0]), cell_box[2])
+                nearest_latitude = min(max(latitude, cell_box[1]), cell_box[3])
+                if haversine_meters(longitude, latitude, nearest_longitude, nearest_latitude) > radius_meters:
+                    continue
+                for start_key, (start_longitude, start_latitude) in self.starts.items(
+                    min=cell, max=cell + _PREFIX_END
+                ):
+                    if not (box[0] <= start_longitude <= box[2] and box[1] <= start_latitude <= box[3]):
+                        continue
+                    distance = haversine_meters(longitude, latitude, start_longitude, start_latitude)
+                    if distance <= radius_meters:
+                        yield distance, start_key.split("|", 1)[1]
+
+        nearest = heapq.nsmallest(limit, found()) if limit is not None else sorted(found())
+        return [(identifier, distance) for distance, identifier in nearest]
+
+    def rebuild(self, routes: Iterable[Tuple[str, Any]]) -> int:
+        self.cells.clear()
+        self.starts.clear()
+        self.entries.clear()
+        count = 0
+        for identifier, route in routes:
+            self.add(identifier, route)
+            count += 1
+        return count
+
+
+def get_spatial_index(root, routes_store: OOBTree) -> SpatialIndex:
+    """Liefert den Index; fehlt er (ältere Datenbank), wird er aus den Routen aufgebaut (Commit durch Aufrufer)."""
+    if "routes_spatial_index" not in root:
+        index = SpatialIndex()
+        index.rebuild(routes_store.items())
+        root["routes_spatial_index"] = index
+    index = root["routes_spatial_index"]
+    if not isinstance(index.starts, OOBTree):
+        # Index aus einer älteren Version: Startpunkte nur als Schlüsselmenge
+        index.starts = OOBTree(
+            {start_key: start for _, start_key, _, start in index.entries.values() if start_key is not None}
+        )
+    return index
@@ -0,0 +1,70 @@
+"""
+Auswahl des ZODB-Storages: lokale FileStorage oder ZEO-Client mit persistentem Cache.
+"""
+from __future__ import annotations
+import os
+from typing import Any, Optional, Tuple, Union
+
+from ZODB import FileStorage
+
+STORAGE_MODE_FILESTORAGE = "filestorage"
+STORAGE_MODE_ZEO = "zeo"
+
+# Obergrenze für Cache-Slots: jeder Worker-Prozess belegt einen eigenen, gesperrten Cache
+MAX_CLIENT_CACHE_SLOTS = 64
+
+
+def parse_zeo_address(address: str) -> Union[Tuple[str, int], str]:
+    """Wandelt "host:port" in (host, port) um; alles andere gilt als Pfad eines Unix-Sockets."""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def _open_client_cache(cache_dir: str, cache_size_bytes: int) -> Tuple[Any, str]:
+    # Persistenter Client-Cache: übersteht Neustarts, darf aber nur von einem
+    # Prozess gleichzeitig benutzt werden → ersten freien Slot nehmen.
+    # Liefert den Cache und den Pfad des Slots (ohne Endung) für den Blob-Cache.
+    import zc.lockfile
+    from ZEO.cache import ClientCache
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for slot in range(MAX_CLIENT_CACHE_SLOTS):
+        slot_path = os.path.join(cache_dir, f"worker-{slot}")
+        try:
+            return ClientCache(slot_path + ".zec", cache_size_bytes), slot_path
+        except zc.lockfile.LockError:
+            continue
+    raise RuntimeError(f"no free ZEO client cache slot in {cache_dir}")
+
+
+def open_storage(
+    mode: str,
+    database_file: str,
+    zeo_address: str,
+    client_cache_dir: str,
+    client_cache_size_mb: int,
+    blob_dir: Optional[str] = None,
+) -> Any:
+    """
+    Öffnet den ZODB-Storage.
+    - filestorage (Standard): lokale Datei, exklusiv gesperrt → nur ein Prozess
+    - zeo: Verbindung zu einem ZEO-Server, mehrere Worker-Prozesse möglich
+    Mit `blob_dir` unterstützt der Storage ZODB-Blobs (bei ZEO muss der Server
+    ebenfalls mit Blob-Verzeichnis laufen; der Client cacht Blobs pro Slot).
+    """
+    if mode == STORAGE_MODE_FILESTORAGE:
+        return FileStorage.FileStorage(database_file, blob_dir=blob_dir)
+    if mode == STORAGE_MODE_ZEO:
+        # Optionale Abhängigkeit: nur im ZEO-Modus nötig
+        from ZEO.ClientStorage import ClientStorage
+
+        cache, slot_path = _open_client_cache(client_cache_dir, client_cache_size_mb * 1024 * 1024)
+        return ClientStorage(
+            parse_zeo_address(zeo_address),
+            cache=cache,
+            blob_dir=slot_path + "-blobs" if blob_dir else None,
+            wait_timeout=30,
+        )
+    raise RuntimeError(f"unknown STORAGE_MODE {mode!r} (expected filestorage or zeo)")
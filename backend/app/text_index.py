@@ -0,0 +1,155 @@
+"""
+Trigramm-Index über Start- und Zieltext gespeicherter Routen für die Textsuche.
+
+Texte werden vor dem Zerlegen vereinheitlicht (Unicode-Kompatibilitätszerlegung,
+diakritische Zeichen entfernt, Kleinschreibung), "zurich" findet damit "Zürich". Jedes
+Wort wird vorne mit zwei und hinten mit einem Leerzeichen aufgefüllt ("  zurich "), so
+zählen Treffer am Wortanfang mehr. Eine Suche liest nur die Postings der Trigramme des
+Suchtexts und bewertet die Kandidaten nach dem Anteil gefundener Trigramme – auch
+Tippfehler ("zurch") finden so noch etwas.
+"""
+from __future__ import annotations
+import heapq
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Any, Iterable, List, Set, Tuple
+
+from persistent import Persistent
+from BTrees.OOBTree import OOBTree, OOTreeSet
+
+_NON_WORD = re.compile(r"[\W_]+")
+# Version des gespeicherten Aufbaus; ältere Indizes werden beim Start neu aufgebaut
+TEXT_INDEX_LAYOUT = 3
+# Postings in Teilbereichen (Hash der Kennung): gleichzeitig gespeicherte Routen ändern
+# meist verschiedene Posting-Bäume statt dieselben Mengen häufiger Trigramme
+TEXT_INDEX_SHARDS = 16
+
+
+def _shard(identifier: str) -> int:
+    return zlib.crc32(identifier.encode("utf-8")) % TEXT_INDEX_SHARDS
+
+
+def fold_text(text: str) -> str:
+    """Vereinheitlicht für die Suche: ohne Diakritika, Kleinschreibung, nur Wörter mit einfachem Leerzeichen."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(character for character in decomposed if not unicodedata.combining(character))
+    return " ".join(_NON_WORD.sub(" ", stripped.casefold()).split())
+
+
+def document_trigrams(text: str) -> Set[str]:
+    """Trigramme eines gespeicherten Textes (jedes Wort vorne und hinten aufgefüllt)."""
+    terms: Set[str] = set()
+    for word in fold_text(text).split():
+        padded = f"  {word} "
+        terms.update(padded[position:position + 3] for position in range(len(padded) - 2))
+    return terms
+
+
+def query_trigrams(text: str) -> Set[str]:
+    """
+    Trigramme eines Suchtexts: vorne aufgefüllt, hinten nicht – das letzte Wort ist
+    beim Tippen meist unvollständig ("bahnh" soll "Bahnhof" finden).
+    """
+    terms: Set[str] = set()
+    for word in fold_text(text).split():
+        padded = f"  {word}"
+        terms.update(padded[position:position + 3] for position in range(len(padded) - 2))
+    return terms
+
+
+class RouteTextIndex(Persistent):
+    """
+    `postings`: pro Teilbereich ein OOBTree Trigramm → OOTreeSet(Kennungen); `texts`:
+    Kennung → (vereinheitlichter Text, created_at) (zum Entfernen und für die Bewertung,
+    ohne die Route zu laden). Gepflegt in derselben Transaktion wie
+    `create_route`/`delete_route`, damit eine gespeicherte Route sofort gefunden wird.
+    """
+
+    layout: int = 1
+
+    def __init__(self) -> None:
+        self.postings = tuple(OOBTree() for _ in range(TEXT_INDEX_SHARDS))
+        self.texts = OOBTree()
+        self.layout = TEXT_INDEX_LAYOUT
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, identifier: str, route: Any) -> None:
+        self.remove(identifier)
+        text = f"{route.start_text} {route.end_text}"
+        postings = self.postings[_shard(identifier)]
+        for term in document_trigrams(text):
+            members = postings.get(term)
+            if members is None:
+                members = postings[term] = OOTreeSet()
+            members.add(identifier)
+        self.texts[identifier] = (fold_text(text), route.created_at)
+
+    def remove(self, identifier: str) -> None:
+        stored = self.texts.get(identifier)
+        if stored is None:
+            return
+        text, _ = stored
+        postings = self.postings[_shard(identifier)]
+        for term in document_trigrams(text):
+            members = postings.get(term)
+            if members is not None:
+                members.remove(identifier)
+                if not members:
+                    del postings[term]
+        del self.texts[identifier]
+
+    def search(self, query: str, limit: int, min_similarity: float = 0.5) -> List[Tuple[str, float]]:
+        """
+        Bis zu `limit` (Kennung, Ähnlichkeit), beste zuerst. Ähnlichkeit = Anteil der
+        Trigramme des Suchtexts, die in der Route vorkommen. Routen, die alle Suchwörter
+        wörtlich enthalten ("hof" in "bahnhof"), kommen unabhängig von `min_similarity` in
+        das Ergebnis und vor allen anderen; bei Gleichstand die neuere Route zuerst.
+        Aufwand: Summe der Posting-Längen der Suchtrigramme, unabhängig von der Anzahl Routen.
+        """
+        terms = query_trigrams(query)
+        if not terms:
+            return []
+        matches: Counter = Counter()
+        for postings in self.postings:
+            for term in terms:
+                members = postings.get(term)
+                if members is not None:
+                    matches.update(members.keys())
+        words = fold_text(query).split()
+        ranked = []
+        for identifier, count in matches.items():
+            similarity = count / len(terms)
+            text, created_at = self.texts[identifier]
+            literal = all(word in text for word in words)
+            if literal or similarity >= min_similarity:
+                ranked.append((literal, similarity, created_at, identifier))
+        return [
+            (identifier, round(similarity, 3)) for _, similarity, _, identifier in heapq.nlargest(limit, ranked)
+        ]
+
+    def rebuild(self, routes: Iterable[Tuple[str, Any]]) -> int:
+        self.postings = tuple(OOBTree() for _ in range(TEXT_INDEX_SHARDS))
+        self.texts.clear()
+        self.layout = TEXT_INDEX_LAYOUT
+        count = 0
+        for identifier, route in routes:
+            self.add(identifier, route)
+            count += 1
+        return count
+
+
+def get_route_text_index(root, routes_store: OOBTree) -> RouteTextIndex:
+    """Liefert den Textindex; fehlt er, wird er aus den Routen aufgebaut (Commit durch Aufrufer)."""
+    if "routes_text_index" not in root:
+        index = RouteTextIndex()
+        index.rebuild(routes_store.items())
+        root["routes_text_index"] = index
+    index = root["routes_text_index"]
+    if index.layout != TEXT_INDEX_LAYOUT:
+        # Index aus einer älteren Version (ohne Teilbereiche bzw. ohne Zeitstempel)
+        index.rebuild(routes_store.items())
+    return index
@@ -0,0 +1,222 @@
+"""
+Globale Top-Suchanfragen mit fester Speichergrösse (Space-Saving-Algorithmus).
+
+Es werden höchstens `capacity` Suchbegriffe gezählt. Ist die Tabelle voll, übernimmt
+ein neuer Begriff den Platz des seltensten und erbt dessen Zählerstand als
+Fehlerschranke: häufige Begriffe werden nie verdrängt, die Zähler sind höchstens um
+`error` zu hoch. Der Stand wird periodisch in die ZODB geschrieben (und dabei mit
+den Ständen anderer Worker zusammengeführt).
+"""
+from __future__ import annotations
+import heapq
+import threading
+from typing import Any, Dict, Hashable, List, Optional
+
+from persistent import Persistent
+
+# Schlüssel → [Anzahl, Fehlerschranke, Anzeigetext]
+Entries = Dict[Hashable, List[Any]]
+
+
+class _Bucket:
+    """Alle Schlüssel mit derselben Anzahl (in der Reihenfolge, in der sie sie erreicht haben)."""
+
+    __slots__ = ("count", "keys", "smaller", "larger")
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+        self.keys: Dict[Hashable, None] = {}
+        self.smaller: Optional[_Bucket] = None
+        self.larger: Optional[_Bucket] = None
+
+
+class SpaceSaving:
+    """
+    Heavy-Hitters-Zählung mit höchstens `capacity` Einträgen, gehalten als Stream-Summary:
+    eine doppelt verkettete Liste von Buckets, aufsteigend nach Anzahl. Ein Zählschritt
+    verschiebt den Schlüssel in den nächsten Bucket (O(1) bei Gewicht 1), der seltenste
+    Eintrag steht im ersten Bucket und `top(k)` liest nur die letzten k Einträge.
+    Nicht thread-sicher; siehe TopSearches.
+    """
+
+    def __init__(self, capacity: int, entries: Optional[Entries] = None):
+        self.capacity = max(1, capacity)
+        self._entries: Entries = {}
+        self._buckets: Dict[Hashable, _Bucket] = {}
+        self._smallest: Optional[_Bucket] = None
+        self._largest: Optional[_Bucket] = None
+        if entries:
+            self.merge(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _link(self, key: Hashable, count: int, after: Optional[_Bucket]) -> None:
+        # `after` und alle kleineren Buckets haben eine kleinere Anzahl als `count`
+        smaller, bucket = after, (after.larger if after is not None else self._smallest)
+        while bucket is not None and bucket.count < count:
+            smaller, bucket = bucket, bucket.larger
+        if bucket is None or bucket.count != count:
+            larger, bucket = bucket, _Bucket(count)
+            bucket.smaller, bucket.larger = smaller, larger
+            if smaller is None:
+                self._smallest = bucket
+            else:
+                smaller.larger = bucket
+            if larger is None:
+                self._largest = bucket
+            else:
+                larger.smaller = bucket
+        bucket.keys[key] = None
+        self._buckets[key] = bucket
+
+    def _unlink(self, key: Hashable) -> Optional[_Bucket]:
+        # liefert den Bucket, hinter dem eine grössere Anzahl einzuordnen ist
+        bucket = self._buckets.pop(key)
+        del bucket.keys[key]
+        if bucket.keys:
+            return bucket
+        if bucket.smaller is None:
+            self._smallest = bucket.larger
+        else:
+            bucket.smaller.larger = bucket.larger
+        if bucket.larger is None:
+            self._largest = bucket.smaller
+        else:
+            bucket.larger.smaller = bucket.smaller
+        return bucket.smaller
+
+    def add(self, key: Hashable, label: str, weight: int = 1) -> None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] += weight
+            entry[2] = label
+            after = self._unlink(key)
+        elif len(self._entries) < self.capacity:
+            entry = self._entries[key] = [weight, 0, label]
+            after = None
+        else:
+            # den seltensten (am längsten so seltenen) Eintrag ersetzen
+            evicted = next(iter(self._smallest.keys))
+            after = self._unlink(evicted)
+            minimum = self._entries.pop(evicted)[0]
+            entry = self._entries[key] = [minimum + weight, minimum, label]
+        self._link(key, entry[0], after)
+
+    def merge(self, entries: Entries) -> None:
+        """
+        Addiert einen anderen Stand (z. B. aus der ZODB oder eines anderen Workers):
+        Anzahl und Fehlerschranke werden summiert, danach die `capacity` häufigsten behalten.
+        """
+        merged: Entries = {key: list(entry) for key, entry in self._entries.items()}
+        for key, (weight, error, label) in entries.items():
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = [weight, error, label]
+            else:
+                existing[0] += weight
+                existing[1] += error
+        kept = heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1][0])
+        self._entries = {}
+        self._buckets = {}
+        self._smallest = self._largest = None
+        # aufsteigend angehängt: jeder Schlüssel landet im letzten oder in einem neuen Bucket dahinter
+        for key, entry in reversed(kept):
+            self._entries[key] = entry
+            largest = self._largest
+            if largest is not None and largest.count == entry[0]:
+                largest = largest.smaller
+            self._link(key, entry[0], largest)
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        ranked = []
+        bucket = self._largest
+        while bucket is not None and len(ranked) < limit:
+            for key in bucket.keys:
+                if len(ranked) == limit:
+                    break
+                weight, error, label = self._entries[key]
+                ranked.append({"key": key, "count": weight, "error": error, "label": label})
+            bucket = bucket.smaller
+        return ranked
+
+    def entries(self) -> Entries:
+        return {key: list(entry) for key, entry in self._entries.items()}
+
+
+class TopSearchesStore(Persistent):
+    """Persistenter Stand im ZODB-Root (`top_searches`); ein Datensatz mit allen Einträgen."""
+
+    def __init__(self) -> None:
+        self.entries: Entries = {}
+
+
+def get_top_searches_store(root) -> TopSearchesStore:
+    """Liefert den Container; wird beim ersten Zugriff angelegt (Commit durch Aufrufer)."""
+    if "top_searches" not in root:
+        root["top_searches"] = TopSearchesStore()
+    return root["top_searches"]
+
+
+class TopSearches:
+    """
+    Prozessweite Top-Suchanfragen: `record()` zählt im Speicher, sowohl in der Gesamtsicht
+    als auch in den noch nicht geschriebenen Zählschritten. Zum Schreiben werden die
+    ausstehenden Zählschritte mit `take_pending()` übernommen, per `write()` zum Stand in
+    der ZODB addiert und das Ergebnis mit `replace_summary()` als neue Gesamtsicht gesetzt.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._summary = SpaceSaving(capacity)
+        self._pending = SpaceSaving(capacity)
+        self.flushes = 0
+
+    def record(self, key: Hashable, label: str) -> None:
+        with self._lock:
+            self._summary.add(key, label)
+            self._pending.add(key, label)
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._summary.top(limit)
+
+    def take_pending(self) -> Entries:
+        with self._lock:
+            pending = self._pending.entries()
+            self._pending = SpaceSaving(self.capacity)
+            return pending
+
+    def restore_pending(self, pending: Entries) -> None:
+        # Schreiben fehlgeschlagen: beim nächsten Mal erneut versuchen
+        with self._lock:
+            self._pending.merge(pending)
+
+    def write(self, root, pending: Entries) -> Entries:
+        """Addiert `pending` zum Stand in `root` (Commit durch Aufrufer, bei Konflikt wiederholbar)."""
+        store = get_top_searches_store(root)
+        merged = SpaceSaving(self.capacity, store.entries)
+        merged.merge(pending)
+        store.entries = merged.entries()
+        return store.entries
+
+    def replace_summary(self, entries: Entries, flushed: bool = True) -> None:
+        # Stand aus der ZODB (inkl. Zählungen anderer Worker) plus inzwischen neu Gezähltes;
+        # flushed=False beim Laden nach dem Start
+        with self._lock:
+            summary = SpaceSaving(self.capacity, entries)
+            summary.merge(self._pending.entries())
+            self._summary = summary
+            if flushed:
+                self.flushes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "entries": len(self._summary),
+                "pending_entries": len(self._pending),
+                "flushes": self.flushes,
+            }
+
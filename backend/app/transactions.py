@@ -0,0 +1,84 @@
+"""
+Schreibtransaktionen mit automatischer Wiederholung bei ZODB-Konflikten.
+"""
+from __future__ import annotations
+import random
+import threading
+import time
+from contextlib import AbstractContextManager, nullcontext
+from typing import Callable, Dict, Optional, TypeVar
+
+import transaction
+from ZODB.POSException import ConflictError
+
+T = TypeVar("T")
+
+
+class TransactionStatistics:
+    """Zähler für Commits, Konflikte, Wiederholungen und endgültig gescheiterte Transaktionen."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commits = 0
+        self.conflicts = 0
+        self.retries = 0
+        self.failures = 0
+
+    def record(self, commits: int = 0, conflicts: int = 0, retries: int = 0, failures: int = 0) -> None:
+        with self._lock:
+            self.commits += commits
+            self.conflicts += conflicts
+            self.retries += retries
+            self.failures += failures
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "commits": self.commits,
+                "conflicts": self.conflicts,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+
+def run_in_transaction(
+    transaction_manager: transaction.TransactionManager,
+    work: Callable[[], T],
+    attempts: int,
+    backoff_seconds: float,
+    statistics: TransactionStatistics,
+    sleep: Callable[[float], None] = time.sleep,
+    observe_commit: Optional[Callable[[float], None]] = None,
+    max_backoff_seconds: Optional[float] = None,
+    lock: Optional[AbstractContextManager] = None,
+) -> T:
+    """
+    Führt work() in einer Transaktion aus und committet.
+    Bei ConflictError (auch beim Commit) wird abgebrochen, kurz gewartet
+    (exponentiell mit Jitter, höchstens `max_backoff_seconds`) und work() erneut
+    ausgeführt – work() muss daher alle Objekte selbst neu lesen. Nach `attempts`
+    Versuchen wird der Fehler weitergereicht.
+    `observe_commit` erhält die Dauer des erfolgreichen Commits in Sekunden.
+    `lock` wird pro Versuch um work() und Commit gehalten, nicht während des Wartens.
+    """
+    result = None
+    commit_started = 0.0
+    for attempt_number, attempt in enumerate(transaction_manager.attempts(attempts)):
+        if attempt_number:
+            # der vorherige Versuch ist an einem Konflikt gescheitert
+            statistics.record(conflicts=1, retries=1)
+            delay = backoff_seconds * 2 ** (attempt_number - 1)
+            if max_backoff_seconds is not None:
+                delay = min(delay, max_backoff_seconds)
+            sleep(random.uniform(0, delay))
+        try:
+            with lock or nullcontext(), attempt:
+                result = work()
+                commit_started = time.perf_counter()
+        except ConflictError:
+            statistics.record(conflicts=1, failures=1)
+            raise
+    statistics.record(commits=1)
+    if observe_commit is not None:
+        observe_commit(time.perf_counter() - commit_started)
+    return result  # type: ignore[return-value]
@@ -0,0 +1,95 @@
+"""
+Vergleich: Geometrie als Liste von Listen (bisher) vs. kompakter Puffer (GeometryData).
+
+    cd backend
+    python -m benchmarks.geometry_storage --routes 2000 --points 2000
+
+Gemessen werden Grösse der FileStorage-Datei, Laden einer Routenliste (ohne Geometrie)
+und Laden aller Routen inkl. Geometrie – jeweils mit kaltem Objekt-Cache.
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import transaction
+from BTrees.OOBTree import OOBTree
+from ZODB import DB
+from ZODB.FileStorage import FileStorage
+
+from app.geometry_storage import GeometryData, decode_coordinates, encode_coordinates
+
+COMMIT_EVERY_ROUTES = 500
+
+
+def _coordinates(points: int, seed: int) -> List[List[float]]:
+    return [
+        [8.5 + 0.001 * index + 0.0001 * math.sin(seed + index), 47.3 + 0.0005 * index]
+        for index in range(points)
+    ]
+
+
+def _legacy_record(coordinates: List[List[float]]) -> Dict[str, Any]:
+    return {"start_text": "Start", "end_text": "Ziel", "geometry": {"type": "LineString", "coordinates": coordinates}}
+
+
+def _compact_record(coordinates: List[List[float]]) -> Dict[str, Any]:
+    geometry = {"type": "LineString", "coordinates": GeometryData(encode_coordinates(coordinates))}
+    return {"start_text": "Start", "end_text": "Ziel", "geometry": geometry}
+
+
+def _write(path: str, routes: int, points: int, make_record: Callable) -> None:
+    database = DB(FileStorage(path))
+    connection = database.open()
+    connection.root()["routes"] = store = OOBTree()
+    for index in range(routes):
+        store[f"{index:08d}"] = make_record(_coordinates(points, index))
+        if index % COMMIT_EVERY_ROUTES == 0:
+            transaction.commit()
+            connection.cacheMinimize()
+    transaction.commit()
+    connection.close()
+    database.close()
+
+
+def _timed_read(path: str, with_geometry: bool) -> float:
+    database = DB(FileStorage(path, read_only=True))
+    connection = database.open()
+    started = time.perf_counter()
+    for value in connection.root()["routes"].values():
+        value["start_text"]
+        if with_geometry:
+            coordinates = value["geometry"]["coordinates"]
+            if isinstance(coordinates, GeometryData):
+                decode_coordinates(coordinates.read())
+    elapsed = time.perf_counter() - started
+    connection.close()
+    database.close()
+    return round(elapsed, 4)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.geometry_storage")
+    parser.add_argument("--routes", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=2000)
+    arguments = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, make_record in (("list", _legacy_record), ("compact", _compact_record)):
+            path = os.path.join(directory, f"{name}.fs")
+            _write(path, arguments.routes, arguments.points, make_record)
+            results[name] = {
+                "file_megabytes": round(os.path.getsize(path) / 1e6, 2),
+                "list_seconds": _timed_read(path, with_geometry=False),
+                "full_load_seconds": _timed_read(path, with_geometry=True),
+            }
+    print(json.dumps({"routes": arguments.routes, "points": arguments.points, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
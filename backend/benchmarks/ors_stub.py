@@ -0,0 +1,258 @@
+"""
+Lokaler OpenRouteService-Ersatz für Benchmarks mit realistischen Antworten.
+
+Antwortzeit und Grösse der Antworten (Anzahl Treffer, Punkte der Routengeometrie)
+sind einstellbar, ebenso ein Anteil fehlerhafter (`error_rate`) und langsamer
+(`slow_rate`) Antworten, um Deadlines, Hedging und Circuit Breaker zu testen.
+Eigenständig startbar:
+
+    cd backend
+    python -m benchmarks.ors_stub --port 8200 --latency-ms 80 --polyline-points 1500
+    python -m benchmarks.ors_stub --error-rate 0.2 --slow-rate 0.05 --slow-latency-ms 3000
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from app.geometry import encode_polyline
+
+# Grobe Mitte der Schweiz; Treffer und Routen werden darum herum erzeugt
+CENTER_LONGITUDE = 8.2
+CENTER_LATITUDE = 46.8
+
+
+def _seed(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def _feature(text: str, index: int) -> Dict[str, Any]:
+    seed = _seed(f"{text}/{index}")
+    longitude = CENTER_LONGITUDE + ((seed % 20000) - 10000) / 10000
+    latitude = CENTER_LATITUDE + (((seed // 20000) % 10000) - 5000) / 10000
+    name = f"{text.title()} {index + 1}"
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [round(longitude, 6), round(latitude, 6)]},
+        "properties": {
+            "id": f"node/{seed}",
+            "gid": f"openstreetmap:venue:node/{seed}",
+            "layer": "venue",
+            "source": "openstreetmap",
+            "name": name,
+            "housenumber": str(index + 1),
+            "street": "Bahnhofstrasse",
+            "postalcode": str(8000 + seed % 1000),
+            "confidence": round(1.0 - index * 0.05, 2),
+            "accuracy": "point",
+            "country": "Schweiz",
+            "country_code": "CH",
+            "region": "Zürich",
+            "county": "Bezirk Zürich",
+            "locality": "Zürich",
+            "label": f"{name}, Zürich, Schweiz",
+        },
+    }
+
+
+def feature_collection(text: str, size: int, features: int) -> Dict[str, Any]:
+    count = max(0, min(size, features))
+    return {
+        "geocoding": {"version": "0.2", "query": {"text": text, "size": size}},
+        "type": "FeatureCollection",
+        "features": [_feature(text, index) for index in range(count)],
+        "bbox": [CENTER_LONGITUDE - 1, CENTER_LATITUDE - 0.5, CENTER_LONGITUDE + 1, CENTER_LATITUDE + 0.5],
+    }
+
+
+def directions(coordinates: List[List[float]], profile: str, points: int) -> Dict[str, Any]:
+    (start_longitude, start_latitude), (end_longitude, end_latitude) = coordinates[0][:2], coordinates[-1][:2]
+    path: List[Tuple[float, float]] = []
+    for index in range(max(points, 2)):
+        fraction = index / (max(points, 2) - 1)
+        # leichte Schlangenlinie, damit die Polyline nicht trivial komprimiert
+        wiggle = 0.002 * math.sin(fraction * 40)
+        path.append((
+            start_latitude + (end_latitude - start_latitude) * fraction + wiggle,
+            start_longitude + (end_longitude - start_longitude) * fraction,
+        ))
+    distance = math.dist((start_longitude, start_latitude), (end_longitude, end_latitude)) * 111_000
+    steps = [
+        {
+            "distance": round(distance / 10, 1),
+            "duration": round(distance / 10 / 20, 1),
+            "type": step % 7,
+            "instruction": f"Turn onto Strasse {step}",
+            "name": f"Strasse {step}",
+            "way_points": [step * (points // 10), (step + 1) * (points // 10)],
+        }
+        for step in range(10)
+    ]
+    return {
+        "bbox": [
+            min(start_longitude, end_longitude), min(start_latitude, end_latitude),
+            max(start_longitude, end_longitude), max(start_latitude, end_latitude),
+        ],
+        "routes": [{
+            "summary": {"distance": round(distance, 1), "duration": round(distance / 20, 1)},
+            "segments": [{"distance": round(distance, 1), "duration": round(distance / 20, 1), "steps": steps}],
+            "geometry": encode_polyline(path),
+            "way_points": [0, len(path) - 1],
+        }],
+        "metadata": {"service": "routing", "query": {"coordinates": coordinates, "profile": profile}},
+    }
+
+
+def matrix(request: Dict[str, Any]) -> Dict[str, Any]:
+    locations = request["locations"]
+    sources = request.get("sources") or list(range(len(locations)))
+    targets = request.get("destinations") or list(range(len(locations)))
+    distances = [
+        [round(math.dist(locations[source], locations[target]) * 111_000, 1) for target in targets]
+        for source in sources
+    ]
+    return {
+        "distances": distances,
+        "durations": [[round(distance / 20, 1) for distance in row] for row in distances],
+        "metadata": {"service": "matrix"},
+    }
+
+
+class OrsStubServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_seconds: float = 0.0,
+        features: int = 10,
+        polyline_points: int = 1000,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        slow_rate: float = 0.0,
+        slow_latency_seconds: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency_seconds = latency_seconds
+        self.features = features
+        self.polyline_points = polyline_points
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_latency_seconds = slow_latency_seconds
+        self.requests = 0
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "OrsStubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Header und Body gehen getrennt raus; ohne TCP_NODELAY kämen ~40 ms Nagle-Verzögerung dazu
+            disable_nagle_algorithm = True
+
+            def _respond(self, status: int, payload: Any) -> None:
+                with stub._lock:
+                    stub.requests += 1
+                    # Attribute zur Laufzeit änderbar (Tests schalten Fehler ein und aus)
+                    failing = stub._random.random() < stub.error_rate
+                    slow = stub._random.random() < stub.slow_rate
+                    if failing:
+                        stub.injected_errors += 1
+                time.sleep(stub.slow_latency_seconds if slow else stub.latency_seconds)
+                if failing:
+                    status, payload = stub.error_status, {"error": "injected failure"}
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                text = query.get("text", [""])[0]
+                size = int(query.get("size", ["10"])[0])
+                if url.path in ("/geocode/autocomplete", "/geocode/search"):
+                    self._respond(200, feature_collection(text, size, stub.features))
+                else:
+                    self._respond(404, {"error": "unknown path"})
+
+            def do_POST(self) -> None:
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length", "0"))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if url.path.startswith("/v2/directions/"):
+                    profile = url.path.rsplit("/", 1)[-1]
+                    self._respond(200, directions(request["coordinates"], profile, stub.polyline_points))
+                elif url.path.startswith("/v2/matrix/"):
+                    self._respond(200, matrix(request))
+                else:
+                    self._respond(404, {"error": "unknown path"})
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ors_stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--features", type=int, default=10)
+    parser.add_argument("--polyline-points", type=int, default=1000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil Antworten mit --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Anteil Antworten mit --slow-latency-ms")
+    parser.add_argument("--slow-latency-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+    stub = OrsStubServer(
+        arguments.host,
+        arguments.port,
+        latency_seconds=arguments.latency_ms / 1000,
+        features=arguments.features,
+        polyline_points=arguments.polyline_points,
+        error_rate=arguments.error_rate,
+        error_status=arguments.error_status,
+        slow_rate=arguments.slow_rate,
+        slow_latency_seconds=arguments.slow_latency_ms / 1000,
+        seed=arguments.seed,
+    )
+    with stub:
+        print(f"ORS stub on {stub.base_url} (ORS_BASE_URL)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
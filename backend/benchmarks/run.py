@@ -0,0 +1,418 @@
+"""
+Benchmark-Suite: startet den lokalen ORS-Stub und die echte App unter uvicorn und misst
+Durchsatz sowie p50/p95/p99 für CRUD (bei 1k/10k/100k gespeicherten Routen) und für
+jeden Proxy-Endpunkt.
+
+    cd backend
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --route-counts 1000 --baseline benchmarks/baseline.json
+
+Mit --baseline werden die Ergebnisse verglichen; bei einer Verschlechterung über
+--tolerance hinaus endet der Lauf mit Exit-Code 1. Ebenso, wenn ein Szenario fehlgeschlagene
+Anfragen hat (ausser mit --allow-errors): Latenzen mit Fehlern sind keine gültige Messung.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+from .ors_stub import CENTER_LATITUDE, CENTER_LONGITUDE, directions
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PROFILES = ("driving-car", "cycling-regular", "foot-walking")
+SEED_CHUNK_ROUTES = 5000
+SEED_GEOMETRIES = 100
+
+RequestFactory = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+# ==========================================================
+# Auswertung
+# ==========================================================
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """Nearest-Rank-Perzentil einer aufsteigend sortierten Liste."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_per_second": round(len(values) / wall_seconds, 1) if wall_seconds else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+def compare_results(
+    current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float
+) -> List[Dict[str, Any]]:
+    """Vergleicht p95 und Durchsatz pro Szenario; `regression` bei Abweichung über `tolerance`."""
+    rows = []
+    for name in sorted(set(current) & set(baseline)):
+        now, before = current[name], baseline[name]
+        p95_ratio = now["p95_ms"] / before["p95_ms"] if before["p95_ms"] else 1.0
+        throughput_ratio = (
+            now["throughput_per_second"] / before["throughput_per_second"]
+            if before["throughput_per_second"]
+            else 1.0
+        )
+        rows.append({
+            "scenario": name,
+            "p95_ratio": round(p95_ratio, 3),
+            "throughput_ratio": round(throughput_ratio, 3),
+            "regression": p95_ratio > 1 + tolerance or throughput_ratio < 1 - tolerance,
+        })
+    return rows
+
+
+def scenario_errors(results: Dict[str, Dict[str, float]]) -> Dict[str, int]:
+    """Szenarien mit fehlgeschlagenen Anfragen (Status ≥ 400) → Anzahl Fehler."""
+    return {name: int(summary["errors"]) for name, summary in sorted(results.items()) if summary.get("errors")}
+
+
+# ==========================================================
+# Lastgenerator und Prozesse
+# ==========================================================
+async def measure(
+    client: httpx.AsyncClient, make_request: RequestFactory, total: int, concurrency: int
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    indexes = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for index in indexes:  # gemeinsamer Iterator → jede Anfrage genau einmal
+            started = time.perf_counter()
+            try:
+                response = await make_request(client, index)
+            except httpx.TransportError:
+                # abgebrochene Verbindung zählt als Fehler, statt den ganzen Lauf zu beenden
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _wait_until_ready(process: subprocess.Popen, url: str) -> None:
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up")
+        time.sleep(0.2)
+
+
+@contextmanager
+def _running(command: List[str], environment: Dict[str, str], ready_url: str) -> Iterator[None]:
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=environment, stdout=subprocess.DEVNULL)
+    try:
+        _wait_until_ready(process, ready_url)
+        yield
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@contextmanager
+def ors_stub_server(latency_ms: float, features: int, polyline_points: int) -> Iterator[str]:
+    """ORS-Stub in eigenem Prozess, damit er nicht mit dem Lastgenerator um den GIL konkurriert."""
+    port = _free_port()
+    command = [
+        sys.executable, "-m", "benchmarks.ors_stub",
+        "--port", str(port),
+        "--latency-ms", str(latency_ms),
+        "--features", str(features),
+        "--polyline-points", str(polyline_points),
+    ]
+    base_url = f"http://127.0.0.1:{port}"
+    with _running(command, dict(os.environ), f"{base_url}/"):
+        yield base_url
+
+
+@contextmanager
+def app_server(
+    database_file: str, ors_base_url: str, settings: Optional[Dict[str, str]] = None
+) -> Iterator[str]:
+    """Startet `uvicorn app.main:app` mit eigener Datenbank (und `settings` als Umgebung) und wartet auf /health."""
+    port = _free_port()
+    environment = dict(
+        os.environ,
+        DATABASE_FILE=database_file,
+        ORS_BASE_URL=ors_base_url,
+        ORS_API_KEY="benchmark",
+        DATABASE_PACK_INTERVAL_SECONDS="0",
+        # der Stub hat kein Kontingent; gemessen wird das Backend, nicht der Scheduler
+        ORS_RATE_LIMIT_PER_MINUTE="0",
+        **(settings or {}),
+    )
+    # Keep-Alive länger als beim Client (httpx: 5 s): sonst schliesst uvicorn eine Verbindung,
+    # die der Client im selben Moment wiederverwendet, und die Anfrage endet mit ReadError
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+        "--timeout-keep-alive", "30",
+    ]
+    base_url = f"http://127.0.0.1:{port}"
+    with _running(command, environment, f"{base_url}/health"):
+        yield base_url
+
+
+# ==========================================================
+# Szenarien
+# ==========================================================
+def _coordinates(index: int) -> List[float]:
+    generator = random.Random(index)
+    return [
+        round(CENTER_LONGITUDE + generator.uniform(-1, 1), 6),
+        round(CENTER_LATITUDE + generator.uniform(-0.5, 0.5), 6),
+    ]
+
+
+def _route_payloads(count: int, route_points: int) -> Iterator[Dict[str, Any]]:
+    geometries = [
+        directions([_coordinates(index), _coordinates(index + 1)], "driving-car", route_points)["routes"][0]["geometry"]
+        for index in range(SEED_GEOMETRIES)
+    ]
+    for index in range(count):
+        start, end = _coordinates(2 * index), _coordinates(2 * index + 1)
+        yield {
+            "start_text": f"Start {index}",
+            "end_text": f"Ziel {index}",
+            "start_coordinates": {"longitude": start[0], "latitude": start[1]},
+            "end_coordinates": {"longitude": end[0], "latitude": end[1]},
+            "distance_meters": 1000.0 + index % 50_000,
+            "duration_seconds": 60.0 + index % 3600,
+            "geometry_encoded": geometries[index % SEED_GEOMETRIES],
+            "profile": PROFILES[index % len(PROFILES)],
+        }
+
+
+async def seed_routes(client: httpx.AsyncClient, count: int, route_points: int) -> List[str]:
+    identifiers: List[str] = []
+    chunk: List[Dict[str, Any]] = []
+    for payload in _route_payloads(count, route_points):
+        chunk.append(payload)
+        if len(chunk) == SEED_CHUNK_ROUTES:
+            identifiers += await _post_batch(client, chunk)
+            chunk = []
+    if chunk:
+        identifiers += await _post_batch(client, chunk)
+    return identifiers
+
+
+async def _post_batch(client: httpx.AsyncClient, routes: List[Dict[str, Any]]) -> List[str]:
+    response = await client.post("/api/routes/batch", json={"routes": routes}, timeout=600)
+    response.raise_for_status()
+    return response.json()["identifiers"]
+
+
+async def crud_scenarios(
+    client: httpx.AsyncClient, identifiers: List[str], total: int, concurrency: int, route_points: int
+) -> Dict[str, Dict[str, float]]:
+    generator = random.Random(42)
+    payloads = list(_route_payloads(total, route_points))
+    created: List[str] = []
+
+    async def create(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        response = await client.post("/api/routes", json=payloads[index])
+        if response.status_code == 201:
+            created.append(response.json()["identifier"])
+        return response
+
+    async def get(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get(f"/api/routes/{generator.choice(identifiers)}")
+
+    async def list_page(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        params = {"limit": 50, "after": generator.choice(identifiers), "include_geometry": "false"}
+        return await client.get("/api/routes", params=params)
+
+    async def list_filtered(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        params = {"profile": PROFILES[index % len(PROFILES)], "min_distance_meters": 10_000, "limit": 50}
+        return await client.get("/api/routes", params=params)
+
+    async def nearby(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        longitude, latitude = _coordinates(index)
+        params = {"longitude": longitude, "latitude": latitude, "radius_meters": 5000, "limit": 50}
+        return await client.get("/api/routes/nearby", params=params)
+
+    async def delete(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.delete(f"/api/routes/{created[index]}")
+
+    results = {}
+    for name, make_request in (
+        ("create", create),
+        ("get", get),
+        ("list_page", list_page),
+        ("list_filtered", list_filtered),
+        ("nearby", nearby),
+    ):
+        results[name] = await measure(client, make_request, total, concurrency)
+    results["delete"] = await measure(client, delete, len(created), concurrency)
+    return results
+
+
+async def proxy_scenarios(client: httpx.AsyncClient, total: int, concurrency: int) -> Dict[str, Dict[str, float]]:
+    # miss: jede Anfrage anders → ORS-Stub wird aufgerufen; hit: immer dieselbe Anfrage → Cache
+    async def autocomplete_miss(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get("/api/ors/autocomplete", params={"text": f"Ort {index}", "size": 5})
+
+    async def autocomplete_hit(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get("/api/ors/autocomplete", params={"text": "Zürich", "size": 5})
+
+    async def geocode_miss(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get("/api/ors/geocode", params={"text": f"Adresse {index}", "size": 1})
+
+    async def geocode_hit(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.get("/api/ors/geocode", params={"text": "Bern Bahnhof", "size": 1})
+
+    async def directions_miss(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post(
+            "/api/ors/directions", json={"start": _coordinates(2 * index), "end": _coordinates(2 * index + 1)}
+        )
+
+    async def directions_hit(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post("/api/ors/directions", json={"start": _coordinates(0), "end": _coordinates(1)})
+
+    results = {}
+    for name, make_request in (
+        ("autocomplete_miss", autocomplete_miss),
+        ("autocomplete_hit", autocomplete_hit),
+        ("geocode_miss", geocode_miss),
+        ("geocode_hit", geocode_hit),
+        ("directions_miss", directions_miss),
+        ("directions_hit", directions_hit),
+    ):
+        results[name] = await measure(client, make_request, total, concurrency)
+    return results
+
+
+async def run_suite(arguments: argparse.Namespace, ors_base_url: str) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    limits = httpx.Limits(max_connections=arguments.concurrency)
+    with tempfile.TemporaryDirectory() as directory:
+        for position, route_count in enumerate(arguments.route_counts):
+            database_file = os.path.join(directory, f"routes-{route_count}.fs")
+            with app_server(database_file, ors_base_url) as base_url:
+                async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                    started = time.perf_counter()
+                    identifiers = await seed_routes(client, route_count, arguments.route_points)
+                    print(f"seeded {route_count} routes in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+                    crud = await crud_scenarios(
+                        client, identifiers, arguments.requests, arguments.concurrency, arguments.route_points
+                    )
+                    for name, summary in crud.items():
+                        results[f"crud/{route_count}/{name}"] = summary
+                    if position == 0:
+                        # Proxy-Endpunkte hängen nicht von der Anzahl Routen ab → einmal messen
+                        proxy = await proxy_scenarios(client, arguments.requests, arguments.concurrency)
+                        for name, summary in proxy.items():
+                            results[f"proxy/{name}"] = summary
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument(
+        "--route-counts",
+        type=lambda value: [int(part) for part in value.split(",")],
+        default=[1000, 10_000, 100_000],
+        help="gespeicherte Routen pro CRUD-Durchlauf, kommagetrennt",
+    )
+    parser.add_argument("--requests", type=int, default=500, help="Anfragen pro Szenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Antwortzeit des ORS-Stubs")
+    parser.add_argument("--features", type=int, default=10, help="Treffer pro Geocoding-Antwort")
+    parser.add_argument("--polyline-points", type=int, default=1000, help="Punkte pro ORS-Route")
+    parser.add_argument("--route-points", type=int, default=200, help="Punkte pro gespeicherter Route")
+    parser.add_argument("--output", default=None, help="Ergebnisse als JSON in diese Datei schreiben")
+    parser.add_argument("--baseline", default=None, help="früheres Ergebnis (JSON) zum Vergleich")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="erlaubte Abweichung, 0.2 = 20 %%")
+    parser.add_argument(
+        "--allow-errors", action="store_true", help="fehlgeschlagene Anfragen nur melden, nicht mit Exit-Code 1 enden"
+    )
+    arguments = parser.parse_args()
+
+    with ors_stub_server(arguments.latency_ms, arguments.features, arguments.polyline_points) as ors_base_url:
+        results = asyncio.run(run_suite(arguments, ors_base_url))
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "route_counts": arguments.route_counts,
+            "requests": arguments.requests,
+            "concurrency": arguments.concurrency,
+            "stub": {
+                "latency_ms": arguments.latency_ms,
+                "features": arguments.features,
+                "polyline_points": arguments.polyline_points,
+            },
+        },
+        "results": results,
+    }
+    errors = scenario_errors(results)
+    if errors:
+        report["errors"] = errors
+    comparison: Optional[List[Dict[str, Any]]] = None
+    if arguments.baseline:
+        with open(arguments.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        comparison = compare_results(results, baseline, arguments.tolerance)
+        report["comparison"] = comparison
+
+    text = json.dumps(report, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text + "\n")
+    print(text)
+    for name, count in errors.items():
+        print(f"WARNING: {name}: {count} failed requests", file=sys.stderr)
+    if comparison and any(row["regression"] for row in comparison):
+        sys.exit(1)
+    if errors and not arguments.allow_errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
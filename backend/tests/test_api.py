@@ -1,13 +1,20 @@
 # backend/tests/test_api.py
+import asyncio
 import os
+import time
 from contextlib import ExitStack
 from datetime import datetime
 from typing import Any, Dict
 import json
+import math
 
+import anyio
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 
+from ors_stub import OrsStubServer
+
 
 def _load_app_with_env(tmp_path):
     """
@@ -45,6 +52,37 @@ def test_health_endpoint(tmp_path):
         stack.close()
 
 
+def test_health_does_not_leak_connections(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    try:
+        for _ in range(3 * main.DATABASE_POOL_SIZE):
+            assert client.get("/health").status_code == 200
+        pool = client.get("/health").json()["database_pool"]
+        assert pool["pool_size"] == main.DATABASE_POOL_SIZE
+        assert pool["connections_in_use"] == 0
+        assert pool["open_connections"] <= main.DATABASE_POOL_SIZE
+    finally:
+        stack.close()
+
+
+def test_failed_request_aborts_transaction(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    try:
+        def failing_commit(self):
+            raise RuntimeError("disk full")
+
+        monkeypatch.setattr(main.transaction.TransactionManager, "commit", failing_commit)
+        with pytest.raises(RuntimeError):
+            client.post("/api/routes", json=_route_payload())
+        monkeypatch.undo()
+
+        # nichts wurde gespeichert, die Verbindung ist wieder im Pool
+        assert client.get("/api/routes").json() == []
+        assert client.get("/health").json()["database_pool"]["connections_in_use"] == 0
+    finally:
+        stack.close()
+
+
 def _route_payload() -> Dict[str, Any]:
     return {
         "start_text": "Zürich HB, Schweiz",
@@ -98,33 +136,30 @@ def test_crud_routes(tmp_path):
 # -----------------------
 # ORS-Proxy-Tests (mocked)
 # -----------------------
-class _MockResp:
-    def __init__(self, status=200, data=None):
-        self.status_code = status
-        self._data = data or {}
-
-    @property
-    def ok(self):
-        return 200 <= self.status_code < 300
-
-    def json(self):
-        return self._data
-
-    @property
-    def text(self):
-        return json.dumps(self._data)
+def _mock_ors(monkeypatch, main, handler):
+    """
+    Ersetzt den gemeinsamen ORS-Client durch einen mit httpx.MockTransport.
+    `handler` erhält den httpx.Request und liefert eine httpx.Response.
+    """
+    ors_client = main.OrsClient(
+        pool_size=1,
+        connect_timeout_seconds=1,
+        read_timeout_seconds=1,
+        transport=httpx.MockTransport(handler),
+    )
+    monkeypatch.setattr(main, "_ors_client", ors_client)
 
 
 def test_ors_autocomplete_proxy(tmp_path, monkeypatch):
     main, client, stack = _load_app_with_env(tmp_path)
     try:
-        # requests.get in app.main mocken
-        def fake_get(url, params=None, timeout=None, **kwargs):
-            assert "/geocode/autocomplete" in url
-            assert "text" in params
-            return _MockResp(
+        # ORS-Client in app.main mocken
+        def fake_get(request):
+            assert "/geocode/autocomplete" in request.url.path
+            assert "text" in request.url.params
+            return httpx.Response(
                 200,
-                {
+                json={
                     "features": [
                         {
                             "properties": {"label": "Zürich HB, Schweiz"},
@@ -134,7 +169,7 @@ def test_ors_autocomplete_proxy(tmp_path, monkeypatch):
                 },
             )
 
-        monkeypatch.setattr(main.requests, "get", fake_get)
+        _mock_ors(monkeypatch, main, fake_get)
 
         r = client.get("/api/ors/autocomplete", params={"text": "Zuerich", "size": 5})
         assert r.status_code == 200
@@ -148,11 +183,11 @@ def test_ors_autocomplete_proxy(tmp_path, monkeypatch):
 def test_ors_geocode_proxy(tmp_path, monkeypatch):
     main, client, stack = _load_app_with_env(tmp_path)
     try:
-        def fake_get(url, params=None, timeout=None, **kwargs):
-            assert "/geocode/search" in url
-            return _MockResp(
+        def fake_get(request):
+            assert "/geocode/search" in request.url.path
+            return httpx.Response(
                 200,
-                {
+                json={
                     "features": [
                         {
                             "properties": {"label": "Bern Bahnhof, Schweiz"},
@@ -162,7 +197,7 @@ def test_ors_geocode_proxy(tmp_path, monkeypatch):
                 },
             )
 
-        monkeypatch.setattr(main.requests, "get", fake_get)
+        _mock_ors(monkeypatch, main, fake_get)
 
         r = client.get("/api/ors/geocode", params={"text": "Bern Bahnhof", "size": 1})
         assert r.status_code == 200
@@ -175,13 +210,14 @@ def test_ors_geocode_proxy(tmp_path, monkeypatch):
 def test_ors_directions_proxy(tmp_path, monkeypatch):
     main, client, stack = _load_app_with_env(tmp_path)
     try:
-        def fake_post(url, json=None, timeout=None, **kwargs):
-            assert "/v2/directions/" in url
-            assert json and "coordinates" in json
-            assert "start" not in json and "end" not in json
-            return _MockResp(
+        def fake_post(request):
+            assert "/v2/directions/" in request.url.path
+            body = json.loads(request.content)
+            assert body and "coordinates" in body
+            assert "start" not in body and "end" not in body
+            return httpx.Response(
                 200,
-                {
+                json={
                     "routes": [
                         {
                             "geometry": "_p~iF~ps|U_ulLnnqC_mqNvxq`@",
@@ -191,7 +227,7 @@ def test_ors_directions_proxy(tmp_path, monkeypatch):
                 },
             )
 
-        monkeypatch.setattr(main.requests, "post", fake_post)
+        _mock_ors(monkeypatch, main, fake_post)
 
         body = {
             "start": [8.537087, 47.378177],
@@ -203,4 +239,908 @@ def test_ors_directions_proxy(tmp_path, monkeypatch):
         j = r.json()
         assert j["routes"][0]["summary"]["distance"] == 1000.0
     finally:
-        stack.close()
\ No newline at end of file
+        stack.close()
+
+def test_ors_autocomplete_cache_reuses_prefix(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    try:
+        main._autocomplete_cache.clear()
+        calls = []
+
+        labels = {
+            "Zür": ["Zürich HB", "Zürich Oerlikon", "Zürichberg", "Zürich Flughafen", "Züri West"],
+            "Zürich": ["Zürich HB", "Zürich Oerlikon", "Zürich Flughafen"],
+        }
+
+        def fake_get(request):
+            text = request.url.params["text"]
+            calls.append(text)
+            return httpx.Response(
+                200,
+                json={"features": [{"properties": {"label": label}} for label in labels[text]]},
+            )
+
+        _mock_ors(monkeypatch, main, fake_get)
+
+        r = client.get("/api/ors/autocomplete", params={"text": "Zür", "size": 5})
+        assert r.status_code == 200
+        # gleicher Text in anderer Schreibweise → exakter Treffer
+        r = client.get("/api/ors/autocomplete", params={"text": " ZÜR ", "size": 5})
+        assert len(r.json()["features"]) == 5
+        # "Zür" enthält nur 4 passende Kandidaten → ORS wird gefragt
+        r = client.get("/api/ors/autocomplete", params={"text": "Zürich", "size": 5})
+        assert len(r.json()["features"]) == 3
+        # "Zürich" ist vollständig (weniger als size) → "Zürich O" wird daraus gefiltert
+        r = client.get("/api/ors/autocomplete", params={"text": "Zürich O", "size": 5})
+        assert [f["properties"]["label"] for f in r.json()["features"]] == ["Zürich Oerlikon"]
+        assert calls == ["Zür", "Zürich"]
+
+        stats = client.get("/api/admin/caches").json()["autocomplete"]
+        assert stats["hits"] == 1
+        assert stats["prefix_hits"] == 1
+        assert stats["misses"] == 2
+    finally:
+        stack.close()
+
+
+def test_ors_stale_autocomplete_while_upstream_fails(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    try:
+        now = [1000.0]
+        monkeypatch.setattr(main, "_autocomplete_cache", main.AutocompleteCache(
+            max_entries=10, ttl_seconds=60, clock=lambda: now[0], stale_seconds=3600,
+        ))
+        breakers = {"autocomplete": main.CircuitBreaker("autocomplete", failure_threshold=2, open_seconds=60)}
+        monkeypatch.setattr(main, "_ors_breakers", breakers)
+        failing = [False]
+        calls = []
+
+        def fake_get(request):
+            calls.append(request.url.params["text"])
+            if failing[0]:
+                return httpx.Response(503, json={"error": "down"})
+            return httpx.Response(200, json={"features": [{"properties": {"label": "Bern"}}]})
+
+        monkeypatch.setattr(main, "_ors_client", main.OrsClient(
+            pool_size=1,
+            connect_timeout_seconds=1,
+            read_timeout_seconds=1,
+            transport=httpx.MockTransport(fake_get),
+            breakers=breakers,
+        ))
+
+        assert client.get("/api/ors/autocomplete", params={"text": "Bern", "size": 5}).status_code == 200
+        now[0] += 120
+        failing[0] = True
+        # abgelaufen: sofort die alte Antwort, das Neuladen scheitert im Hintergrund
+        for _ in range(3):
+            r = client.get("/api/ors/autocomplete", params={"text": "Bern", "size": 5})
+            assert r.status_code == 200
+            assert r.json()["features"][0]["properties"]["label"] == "Bern"
+            for _ in range(50):
+                if not main._revalidator.running():
+                    break
+                time.sleep(0.01)
+        # zwei Fehler in Folge → Breaker offen, der dritte Versuch erreicht ORS nicht mehr
+        assert calls == ["Bern"] * 3
+        circuit = client.get("/health").json()["ors_circuits"]["autocomplete"]
+        assert circuit["state"] == "open"
+        assert circuit["rejected"] == 1
+
+        # ohne veraltete Antwort: sofort 503 statt auf ORS zu warten
+        r = client.get("/api/ors/autocomplete", params={"text": "Basel", "size": 5})
+        assert r.status_code == 503
+        assert "Retry-After" in r.headers
+    finally:
+        stack.close()
+
+
+def test_ors_geocode_persistent_cache(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    try:
+        assert client.delete("/api/admin/geocode-cache").status_code == 200
+        calls = []
+
+        def fake_get(request):
+            calls.append(request.url.params["text"])
+            return httpx.Response(
+                200,
+                json={"features": [{"properties": {"label": "Zürich HB, Schweiz"}}]},
+            )
+
+        _mock_ors(monkeypatch, main, fake_get)
+
+        for text in ("Zürich HB", "zürich  hb"):
+            r = client.get("/api/ors/geocode", params={"text": text, "size": 1})
+            assert r.status_code == 200
+            assert r.json()["features"][0]["properties"]["label"] == "Zürich HB, Schweiz"
+        assert calls == ["Zürich HB"]
+
+        # Eintrag liegt in der Datenbank (überlebt damit einen Neustart)
+        connection = main._database.open()
+        try:
+            assert ("zürich hb", 1) in connection.root()["geocode_cache"].entries
+        finally:
+            connection.close()
+
+        info = client.get("/api/admin/geocode-cache").json()
+        assert info["entries"] == 1
+        assert info["hits"] == 1 and info["misses"] == 1
+        assert info["oldest"][0]["text"] == "zürich hb"
+
+        assert client.delete("/api/admin/geocode-cache").json() == {"removed": 1}
+        client.get("/api/ors/geocode", params={"text": "Zürich HB", "size": 1})
+        assert calls == ["Zürich HB", "Zürich HB"]
+
+        # gleichzeitig gespeichertes Ergebnis → Konflikt beim Leeren, wird wiederholt statt 500
+        clear = main._geocode_cache.clear
+        conflicts_before = main._write_statistics.stats()["conflicts"]
+
+        def clear_during_store(store):
+            if main._write_statistics.stats()["conflicts"] == conflicts_before:
+                main._store_geocode_cache("Basel SBB", 1, {"features": []})
+            return clear(store)
+
+        monkeypatch.setattr(main._geocode_cache, "clear", clear_during_store)
+        r = client.delete("/api/admin/geocode-cache")
+        assert r.status_code == 200
+        assert main._write_statistics.stats()["conflicts"] == conflicts_before + 1
+        assert client.get("/api/admin/geocode-cache").json()["entries"] == 0
+    finally:
+        stack.close()
+
+
+def test_ors_directions_cache_quantizes_coordinates(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    try:
+        main._directions_cache.clear()
+        calls = []
+
+        def fake_post(request):
+            calls.append(json.loads(request.content)["coordinates"])
+            return httpx.Response(200, json={"routes": [{"summary": {"distance": 1000.0, "duration": 120.0}}]})
+
+        _mock_ors(monkeypatch, main, fake_post)
+
+        body = {"start": [8.537087, 47.378177], "end": [7.439136, 46.94809], "profile": "driving-car"}
+        assert client.post("/api/ors/directions", json=body).status_code == 200
+        body["start"] = [8.537088, 47.378177]
+        assert client.post("/api/ors/directions", json=body).status_code == 200
+        assert len(calls) == 1
+        # anderes Profil → eigener Eintrag
+        body["profile"] = "cycling-regular"
+        assert client.post("/api/ors/directions", json=body).status_code == 200
+        assert len(calls) == 2
+
+        stats = client.get("/api/admin/caches").json()["directions"]
+        assert stats["hits"] == 1 and stats["executions"] >= 2
+    finally:
+        stack.close()
+
+
+def test_ors_proxy_concurrency_exceeds_threadpool(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    stack.close()  # Lebenszyklus läuft unten im eigenen Event-Loop
+    main._autocomplete_cache.clear()
+    threadpool_size = 4
+    parallel_requests = 12
+
+    with OrsStubServer(latency_seconds=0.3) as stub:
+        monkeypatch.setattr(main, "ORS_BASE", stub.base_url)
+        # gemessen wird die Nebenläufigkeit, nicht das ORS-Kontingent
+        monkeypatch.setattr(main, "_ors_scheduler", None)
+
+        async def run():
+            anyio.to_thread.current_default_thread_limiter().total_tokens = threadpool_size
+            async with main.app.router.lifespan_context(main.app):
+                transport = httpx.ASGITransport(app=main.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                    return await asyncio.gather(*(
+                        http.get("/api/ors/autocomplete", params={"text": f"Ort {index}"})
+                        for index in range(parallel_requests)
+                    ))
+
+        responses = anyio.run(run)
+
+    assert all(r.status_code == 200 for r in responses)
+    # async-Handler warten ohne Threadpool-Worker → mehr gleichzeitige ORS-Anfragen als Worker
+    assert stub.max_in_flight > threadpool_size
+
+
+def _store_routes_directly(main, identifiers):
+    """Legt Routen mit festen Schlüsseln direkt in der ZODB an (schneller als per POST)."""
+    with main.open_connection() as connection:
+        routes_store = main.get_routes_store(existing_connection=connection)
+        payload = _route_payload()
+        for identifier in identifiers:
+            routes_store[identifier] = main.Route(**payload)
+        connection.transaction_manager.commit()
+
+
+def test_list_routes_cursor_pagination(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    identifiers = [f"route-{index:03d}" for index in range(7)]
+    _store_routes_directly(main, identifiers)
+    try:
+        seen = []
+        after = None
+        while True:
+            params = {"limit": 3}
+            if after:
+                params["after"] = after
+            r = client.get("/api/routes", params=params)
+            assert r.status_code == 200
+            seen.extend(item["identifier"] for item in r.json())
+            after = r.headers.get("X-Next-Cursor")
+            if after is None:
+                break
+        assert seen == identifiers
+
+        r = client.get("/api/routes", params={"limit": 10, "after": "route-004"})
+        assert [item["identifier"] for item in r.json()] == identifiers[5:]
+        assert "X-Next-Cursor" not in r.headers
+    finally:
+        for identifier in identifiers:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_list_routes_ndjson_stream(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    identifiers = [f"route-{index:03d}" for index in range(5)]
+    _store_routes_directly(main, identifiers)
+    try:
+        r = client.get("/api/routes", params={"format": "ndjson", "after": "route-001"})
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in r.text.splitlines()]
+        assert [line["identifier"] for line in lines] == identifiers[2:]
+        assert lines[0]["start_text"] == _route_payload()["start_text"]
+
+        r = client.get("/api/routes", params={"format": "ndjson", "limit": 2})
+        assert len(r.text.splitlines()) == 2
+    finally:
+        for identifier in identifiers:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_routes_in_bounds_and_nearby(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        for start, end in (
+            ({"longitude": 8.537087, "latitude": 47.378177}, {"longitude": 8.544, "latitude": 47.4116}),
+            ({"longitude": 7.439136, "latitude": 46.94809}, {"longitude": 7.45, "latitude": 46.95}),
+        ):
+            payload = {**_route_payload(), "start_coordinates": start, "end_coordinates": end, "geometry_encoded": None}
+            r = client.post("/api/routes", json=payload)
+            assert r.status_code == 201
+            created.append(r.json()["identifier"])
+
+        r = client.get(
+            "/api/routes/in-bounds",
+            params={"min_longitude": 8.5, "min_latitude": 47.3, "max_longitude": 8.6, "max_latitude": 47.45},
+        )
+        assert r.status_code == 200
+        assert [item["identifier"] for item in r.json()] == [created[0]]
+
+        r = client.get(
+            "/api/routes/nearby",
+            params={"longitude": 7.44, "latitude": 46.948, "radius_meters": 1000},
+        )
+        assert r.status_code == 200
+        body = r.json()
+        assert [item["identifier"] for item in body] == [created[1]]
+        assert body[0]["start_distance_meters"] < 1000
+
+        # Löschen entfernt die Route auch aus dem Index
+        client.delete(f"/api/routes/{created[1]}")
+        created.pop()
+        r = client.get(
+            "/api/routes/nearby",
+            params={"longitude": 7.44, "latitude": 46.948, "radius_meters": 1000},
+        )
+        assert r.json() == []
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_list_routes_with_index_filters(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        for profile, distance in (("driving-car", 5_000.0), ("cycling-regular", 20_000.0), ("driving-car", 40_000.0)):
+            r = client.post("/api/routes", json={**_route_payload(), "profile": profile, "distance_meters": distance})
+            created.append(r.json()["identifier"])
+            time.sleep(0.002)  # "neueste zuerst" sortiert nach created_at
+
+        r = client.get("/api/routes", params={"order": "newest", "limit": 2})
+        assert [item["identifier"] for item in r.json()] == [created[2], created[1]]
+        assert r.headers["X-Next-Cursor"] == created[1]
+
+        r = client.get("/api/routes", params={"profile": "driving-car"})
+        assert [item["identifier"] for item in r.json()] == [created[2], created[0]]
+
+        r = client.get("/api/routes", params={"min_distance_meters": 10_000, "max_distance_meters": 50_000})
+        assert [item["identifier"] for item in r.json()] == [created[2], created[1]]
+
+        r = client.get("/api/routes", params={"profile": "driving-car", "format": "ndjson"})
+        assert [json.loads(line)["identifier"] for line in r.text.splitlines()] == [created[2], created[0]]
+
+        assert client.get("/api/routes", params={"order": "newest", "after": "unknown"}).status_code == 400
+
+        assert main.rebuild_route_indexes() == {"spatial": 3, "secondary": 3, "text": 3}
+        r = client.get("/api/routes", params={"profile": "cycling-regular"})
+        assert [item["identifier"] for item in r.json()] == [created[1]]
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_routes_batch_import_and_export(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        payloads = [{**_route_payload(), "start_text": f"Start {index}"} for index in range(5)]
+        r = client.post("/api/routes/batch", params={"chunk_size": 2}, json={"routes": payloads})
+        assert r.status_code == 201
+        body = r.json()
+        created = body["identifiers"]
+        assert body["created"] == 5
+        assert body["commits"] == 3
+        assert len(set(created)) == 5  # gleiche Millisekunde → trotzdem eindeutige Kennungen
+
+        # ein einziger Commit für den ganzen Batch
+        r = client.post("/api/routes/batch", json={"routes": payloads[:2]})
+        assert r.json()["commits"] == 1
+        created += r.json()["identifiers"]
+
+        # eine ungültige Route → nichts wird gespeichert
+        r = client.post("/api/routes/batch", json={"routes": [payloads[0], {"start_text": "kaputt"}]})
+        assert r.status_code == 422
+
+        r = client.get("/api/routes/export")
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        exported = [json.loads(line) for line in r.text.splitlines()]
+        assert [item["identifier"] for item in exported] == sorted(created)
+        single = client.get("/api/routes").json()
+        assert exported == json.loads(json.dumps(single))
+        assert {item["start_text"] for item in exported} == {f"Start {index}" for index in range(5)}
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_concurrent_route_writes_lose_nothing(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    writers, routes_per_writer = 8, 25
+    created, statuses = [], []
+
+    async def write_all():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            async def writer(number):
+                for index in range(routes_per_writer):
+                    r = await async_client.post(
+                        "/api/routes", json={**_route_payload(), "start_text": f"Writer {number}/{index}"}
+                    )
+                    statuses.append(r.status_code)
+                    if r.status_code == 201:
+                        created.append(r.json()["identifier"])
+
+            # kein Abbruch mitten im Schreiben: alle Writer laufen zu Ende, bevor geprüft wird
+            return await asyncio.gather(*(writer(number) for number in range(writers)), return_exceptions=True)
+
+    try:
+        outcomes = asyncio.run(write_all())
+        assert [outcome for outcome in outcomes if outcome is not None] == []
+        assert statuses == [201] * (writers * routes_per_writer)
+        assert len(set(created)) == writers * routes_per_writer
+
+        stored = client.get("/api/routes").json()
+        assert sorted(item["identifier"] for item in stored) == sorted(created)
+        assert len({item["start_text"] for item in stored}) == writers * routes_per_writer
+        writes = client.get("/health").json()["database_writes"]
+        assert writes["failures"] == 0
+        assert writes["retries"] == writes["conflicts"]
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_route_geometry_is_loaded_lazily_and_migrated(tmp_path):
+    from app.geometry_storage import GeometryData
+
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        r = client.post("/api/routes", json=_route_payload())
+        created.append(r.json()["identifier"])
+        encoded = r.json()["geometry_encoded"]
+
+        r = client.get("/api/routes", params={"include_geometry": "false"})
+        assert [item["geometry_encoded"] for item in r.json()] == [None]
+        r = client.get(f"/api/routes/{created[0]}")
+        assert r.status_code == 200
+        assert r.json()["geometry_encoded"] == encoded
+        assert client.get("/api/routes/unknown").status_code == 404
+
+        # Datensatz im alten Format: Polyline direkt im Routen-Objekt
+        with main.open_connection() as connection:
+            routes_store = main.get_routes_store(existing_connection=connection)
+            legacy = main.Route(**{**_route_payload(), "geometry_encoded": None})
+            legacy.__dict__["geometry_encoded"] = encoded
+            routes_store["legacy"] = legacy
+            connection.transaction_manager.commit()
+        created.append("legacy")
+        assert client.get("/api/routes/legacy").json()["geometry_encoded"] == encoded
+
+        assert main.migrate_route_geometries() == {"migrated": 1, "routes": 2}
+        with main.open_connection() as connection:
+            route = main.get_routes_store(existing_connection=connection)["legacy"]
+            assert not route.has_legacy_geometry
+            assert isinstance(route.geometry, GeometryData)
+        assert client.get("/api/routes/legacy").json()["geometry_encoded"] == encoded
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_route_geometry_levels_by_zoom(tmp_path):
+    from app.geometry import decode_polyline, encode_polyline
+
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        # lange, leicht gewellte Route über ~50 km
+        points = [(47.0 + index * 1e-4 + 0.001 * math.sin(index / 30), 8.0 + index * 1e-4) for index in range(5000)]
+        encoded = encode_polyline(points)
+        r = client.post("/api/routes", json={**_route_payload(), "geometry_encoded": encoded})
+        created.append(r.json()["identifier"])
+
+        r = client.get(f"/api/routes/{created[0]}/geometry", params={"zoom": 6})
+        assert r.status_code == 200
+        assert r.json()["level_zoom"] == 8
+        coarse = r.json()["geometry_encoded"]
+        assert len(coarse) * 100 < len(encoded)
+        assert decode_polyline(coarse)[0] == decode_polyline(encoded)[0]
+        assert decode_polyline(coarse)[-1] == decode_polyline(encoded)[-1]
+
+        r = client.get(f"/api/routes/{created[0]}/geometry", params={"zoom": 12, "format": "coordinates"})
+        assert r.json()["level_zoom"] == 14
+        assert 10 < len(r.json()["coordinates"]) < 1000
+        assert r.json()["coordinates"][0] == list(decode_polyline(encoded)[0])
+
+        # ohne bzw. mit sehr hohem Zoom: volle Geometrie
+        r = client.get(f"/api/routes/{created[0]}/geometry")
+        assert r.json()["level_zoom"] is None
+        assert r.json()["geometry_encoded"] == encoded
+        assert client.get(f"/api/routes/{created[0]}/geometry", params={"zoom": 18}).json()["level_zoom"] is None
+
+        assert client.get("/api/routes/unknown/geometry").status_code == 404
+        assert client.get(f"/api/routes/{created[0]}/geometry", params={"format": "svg"}).status_code == 422
+
+        # Route ohne gespeicherte Stufen (vor dem Update angelegt): Berechnung beim Abruf, dann Migration
+        with main.open_connection() as connection:
+            route = main.get_routes_store(existing_connection=connection)[created[0]]
+            del route.geometry_levels
+            connection.transaction_manager.commit()
+        assert client.get(f"/api/routes/{created[0]}/geometry", params={"zoom": 6}).json()["geometry_encoded"] == coarse
+        main.migrate_route_geometries()
+        with main.open_connection() as connection:
+            route = main.get_routes_store(existing_connection=connection)[created[0]]
+            assert sorted(route.geometry_levels) == [8, 11, 14]
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_top_searches_are_counted_persisted_and_prewarmed(tmp_path, monkeypatch):
+    from app.top_searches import TopSearches
+
+    main, client, stack = _load_app_with_env(tmp_path)
+    monkeypatch.setattr(main, "_top_searches", TopSearches(capacity=50))
+    requested = []
+
+    def fake_ors(request: httpx.Request) -> httpx.Response:
+        requested.append((request.url.path, request.url.params["text"]))
+        return httpx.Response(200, json={"features": [{"properties": {"label": request.url.params["text"]}}]})
+
+    try:
+        for _ in range(3):
+            assert client.post("/api/searches", json={"start_text": "Zürich HB", "end_text": "Bern"}).status_code == 204
+        client.post("/api/searches", json={"start_text": "zürich  hb", "end_text": "BERN"})
+        client.post("/api/searches", json={"start_text": "Basel", "end_text": "Luzern"})
+        assert client.post("/api/searches", json={"start_text": "", "end_text": "Bern"}).status_code == 422
+
+        top = client.get("/api/searches/top", params={"limit": 1}).json()
+        assert top == [{"label": "zürich  hb → BERN", "start_text": "zürich hb", "end_text": "bern", "count": 4, "error": 0}]
+
+        r = client.post("/api/admin/top-searches/flush")
+        assert r.json()["flushed"] is True
+        assert r.json()["pending_entries"] == 0
+        with main.open_connection() as connection:
+            entries = connection.root()["top_searches"].entries
+            assert entries[("zürich hb", "bern")][0] == 4
+
+        # ein neuer Prozess (frische Zählung) lädt den gespeicherten Stand
+        monkeypatch.setattr(main, "_top_searches", TopSearches(capacity=50))
+        main._load_top_searches()
+        assert [item["count"] for item in client.get("/api/searches/top").json()] == [4, 1]
+
+        _mock_ors(monkeypatch, main, fake_ors)
+        main._autocomplete_cache.clear()
+        client.delete("/api/admin/geocode-cache")
+        r = client.post("/api/admin/top-searches/prewarm", params={"limit": 1})
+        assert r.json() == {"texts": 2, "requests": 4, "failed": 0}
+        assert sorted(requested) == [
+            ("/geocode/autocomplete", "bern"),
+            ("/geocode/autocomplete", "zürich hb"),
+            ("/geocode/search", "bern"),
+            ("/geocode/search", "zürich hb"),
+        ]
+        # vorgeladen → keine weitere ORS-Anfrage
+        client.get("/api/ors/autocomplete", params={"text": "Zürich HB", "size": 5})
+        client.get("/api/ors/geocode", params={"text": "Bern", "size": 1})
+        assert len(requested) == 4
+    finally:
+        with main.open_connection() as connection:
+            connection.root().pop("top_searches", None)
+            connection.transaction_manager.commit()
+        main._autocomplete_cache.clear()
+        client.delete("/api/admin/geocode-cache")
+        stack.close()
+
+
+def test_route_listing_fast_path_etag_and_gzip(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        for index in range(3):
+            r = client.post("/api/routes", json={**_route_payload(), "start_text": f"Etag {index} " + "x" * 600})
+            created.append(r.json()["identifier"])
+
+        r = client.get("/api/routes")
+        assert r.status_code == 200
+        # gleiche Ausgabe wie über das RouteOut-Modell
+        with main.open_connection() as connection:
+            routes_store = main.get_routes_store(existing_connection=connection)
+            expected = [
+                json.loads(main._route_out(identifier, routes_store[identifier]).model_dump_json())
+                for identifier in sorted(created)
+            ]
+        assert r.json() == expected
+        etag = r.headers["etag"]
+        assert etag.startswith('W/"')
+
+        # unverändert → 304 ohne Inhalt, auch mit mehreren Kandidaten
+        r = client.get("/api/routes", headers={"If-None-Match": f'"other", {etag}'})
+        assert r.status_code == 304
+        assert r.content == b""
+        assert r.headers["etag"] == etag
+        assert client.get("/api/routes", params={"format": "ndjson"}, headers={"If-None-Match": etag}).status_code == 304
+
+        # Paginierung behält den Cursor-Header
+        r = client.get("/api/routes", params={"limit": 2})
+        assert r.headers["x-next-cursor"] == sorted(created)[1]
+
+        # nach einer Änderung → neues ETag, volle Antwort
+        client.delete(f"/api/routes/{created.pop()}")
+        r = client.get("/api/routes", headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert len(r.json()) == 2
+        assert r.headers["etag"] != etag
+
+        # grosse Antworten komprimiert, kleine nicht
+        r = client.get("/api/routes", headers={"Accept-Encoding": "gzip"})
+        assert r.headers["content-encoding"] == "gzip"
+        assert len(r.json()) == 2
+        r = client.get("/health", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in r.headers
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_route_change_feed_and_event_stream(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        token = client.get("/api/routes/changes").json()["token"]
+        for index in range(2):
+            r = client.post("/api/routes", json={**_route_payload(), "start_text": f"Feed {index}"})
+            created.append(r.json()["identifier"])
+        client.delete(f"/api/routes/{created[0]}")
+
+        r = client.get("/api/routes/changes", params={"since": token})
+        assert r.status_code == 200
+        result = r.json()
+        assert [(item["kind"], item["identifier"]) for item in result["changes"]] == [
+            ("created", created[0]), ("created", created[1]), ("deleted", created[0]),
+        ]
+        # bereits gelöschte Route ohne Daten, die andere ohne Geometrie
+        assert result["changes"][0]["route"] is None
+        assert result["changes"][1]["route"]["start_text"] == "Feed 1"
+        assert result["changes"][1]["route"]["geometry_encoded"] is None
+        assert not result["more"]
+
+        # mit limit in Schritten, jede Transaktion vollständig
+        r = client.get("/api/routes/changes", params={"since": token, "limit": 1}).json()
+        assert [item["identifier"] for item in r["changes"]] == [created[0]]
+        assert r["more"]
+
+        # nichts Neues → leere Antwort, Token bleibt gültig
+        r = client.get("/api/routes/changes", params={"since": result["token"]}).json()
+        assert r["changes"] == []
+        assert client.get("/api/routes/changes", params={"since": "zz"}).status_code == 400
+        assert client.get("/api/routes/changes", params={"since": "0" * 16}).status_code == 410
+
+        # Event-Stream: neue Ereignisse werden ohne erneute Anfrage geschoben
+        monkeypatch.setattr(main, "ROUTE_CHANGES_POLL_SECONDS", 0.01)
+
+        async def first_event():
+            events = main._route_change_events(bytes.fromhex(result["token"]))
+            try:
+                assert await events.__anext__() == b"retry: 3000\n\n"
+                pending = asyncio.ensure_future(events.__anext__())
+                await asyncio.sleep(0.05)
+                assert not pending.done()
+                r = await anyio.to_thread.run_sync(
+                    lambda: client.post("/api/routes", json={**_route_payload(), "start_text": "Feed pushed"})
+                )
+                created.append(r.json()["identifier"])
+                return await asyncio.wait_for(pending, timeout=5)
+            finally:
+                await events.aclose()
+
+        event = asyncio.run(first_event()).decode()
+        lines = event.strip().split("\n")
+        assert lines[1] == "event: changes"
+        pushed = json.loads(lines[2][len("data: "):])
+        assert lines[0] == f"id: {pushed['token']}"
+        assert [(item["kind"], item["route"]["start_text"]) for item in pushed["changes"]] == [("created", "Feed pushed")]
+        assert main._route_change_streams == 0
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_route_change_polls_return_each_change_once(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    last_transaction = main._last_transaction
+    try:
+        token = client.get("/api/routes/changes").json()["token"]
+
+        def racing_last_transaction(connection):
+            # ein Commit zwischen dem Lesen der Transaktionskennung und dem Aktualisieren der Verbindung
+            current = main._database.lastTransaction()
+            if not created:
+                with main.open_connection() as other:
+                    identifier, _ = main.write_transaction(other, lambda: main._store_route(
+                        other.root(), main.get_routes_store(existing_connection=other), main.RouteIn(**_route_payload())
+                    ))
+                created.append(identifier)
+            connection.transaction_manager.abort()
+            return current
+
+        monkeypatch.setattr(main, "_last_transaction", racing_last_transaction)
+        first = client.get("/api/routes/changes", params={"since": token}).json()
+        assert [item["identifier"] for item in first["changes"]] == created
+        second = client.get("/api/routes/changes", params={"since": first["token"]}).json()
+        assert second["changes"] == []
+        assert second["token"] == first["token"]
+    finally:
+        monkeypatch.setattr(main, "_last_transaction", last_transaction)
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_route_text_search(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        for start_text, end_text in (
+            ("Zürich HB, Schweiz", "Bern Bahnhof, Schweiz"),
+            ("Genève Cornavin", "Lausanne"),
+            ("Winterthur", "Zürich Oerlikon"),
+        ):
+            r = client.post("/api/routes", json={**_route_payload(), "start_text": start_text, "end_text": end_text})
+            created.append(r.json()["identifier"])
+
+        r = client.get("/api/routes/search", params={"q": "zurich"})
+        assert r.status_code == 200
+        results = r.json()
+        # beide gleich gut → neuere zuerst; ohne Geometrie
+        assert [item["identifier"] for item in results] == [created[2], created[0]]
+        assert results[0]["score"] == 1.0
+        assert results[0]["geometry_encoded"] is None
+        assert client.get("/api/routes/search", params={"q": "GENEVE", "limit": 1}).json()[0]["identifier"] == created[1]
+
+        # gelöschte Routen verschwinden aus dem Index
+        client.delete(f"/api/routes/{created[1]}")
+        assert client.get("/api/routes/search", params={"q": "geneve"}).json() == []
+        assert client.get("/api/routes/search", params={"q": ""}).status_code == 422
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_route_writes_with_group_commit(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    committer = main.GroupCommitter(main.open_connection, main.write_transaction, window_seconds=0.01, max_operations=8)
+    monkeypatch.setattr(main, "_group_commit", committer)
+    try:
+        r = client.post("/api/routes", json=_route_payload())
+        assert r.status_code == 201
+        identifier = r.json()["identifier"]
+        assert client.get(f"/api/routes/{identifier}").json()["start_text"] == r.json()["start_text"]
+        assert client.delete("/api/routes/does-not-exist").status_code == 404
+        assert client.delete(f"/api/routes/{identifier}").status_code == 204
+        assert client.get(f"/api/routes/{identifier}").status_code == 404
+        stats = client.get("/health").json()["group_commit"]
+        assert stats["operations"] == 3 and stats["fallbacks"] == 0
+    finally:
+        stack.close()
+        committer.close()
+
+
+def test_request_profiling_admin_endpoints(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    try:
+        r = client.get("/api/routes")
+        assert r.status_code == 200
+        assert "server-timing" not in r.headers
+        assert client.get("/api/admin/profiling/slowest").status_code == 404
+        assert client.post("/api/admin/profiling/sample", params={"seconds": 0.01}).status_code == 404
+
+        # Admin-Endpunkte bei eingeschalteter Messung (Middleware ist nur beim Import wählbar)
+        monkeypatch.setattr(main, "REQUEST_PROFILING_ENABLED", True)
+        monkeypatch.setattr(main, "REQUEST_PROFILING_MAX_WINDOW_SECONDS", 0.05)
+        r = client.post("/api/admin/profiling/sample", params={"seconds": 10, "interval_ms": 5})
+        assert r.status_code == 200
+        assert r.json()["seconds"] == 0.05
+        assert {"samples", "idle_samples", "functions", "stacks"} <= set(r.json())
+        assert client.get("/api/admin/profiling/slowest").json() == {"recorded": 0, "slowest": []}
+        assert client.delete("/api/admin/profiling/slowest").status_code == 204
+    finally:
+        stack.close()
+
+
+def test_admin_storage_pack(tmp_path):
+    main, client, stack = _load_app_with_env(tmp_path)
+    try:
+        r = client.get("/api/admin/storage")
+        assert r.status_code == 200
+        assert r.json()["file_size_bytes"] > 0
+        assert r.json()["records"] > 0
+
+        r = client.post("/api/admin/storage/pack")
+        assert r.status_code == 200
+        assert r.json()["packs"] >= 1
+        assert r.json()["last_pack_at"] is not None
+    finally:
+        stack.close()
+
+
+def test_metrics_endpoint(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    created = []
+    try:
+        _mock_ors(monkeypatch, main, lambda request: httpx.Response(429, json={"error": "quota"}))
+        assert client.get("/api/ors/geocode", params={"text": "Metrikstadt"}).status_code == 429
+        r = client.post("/api/routes", json=_route_payload())
+        created.append(r.json()["identifier"])
+        client.get(f"/api/routes/{created[0]}")
+
+        r = client.get("/metrics")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/plain")
+        text = r.text
+        assert 'http_request_duration_seconds_count{method="POST",route="/api/routes",status="201"}' in text
+        # Vorlage statt konkreter Kennung → begrenzte Anzahl Label-Kombinationen
+        assert 'route="/api/routes/{identifier}",status="200"' in text
+        assert created[0] not in text
+        assert 'ors_upstream_request_duration_seconds_count{upstream="geocode"}' in text
+        assert 'ors_upstream_errors_total{upstream="geocode",status="429"}' in text
+        assert "zodb_commit_duration_seconds_count" in text
+        assert 'zodb_connection_pool{state="in_use"}' in text
+        assert "routes_stored 1" in text
+        assert 'ors_scheduler_queue_depth{priority="directions"} 0' in text
+
+        scheduler = client.get("/api/admin/ors-scheduler").json()
+        assert scheduler["burst"] == main.ORS_RATE_LIMIT_BURST
+        assert scheduler["queue_depth"] == {"directions": 0, "geocode": 0, "autocomplete": 0}
+    finally:
+        for identifier in created:
+            client.delete(f"/api/routes/{identifier}")
+        stack.close()
+
+
+def test_ors_directions_batch_bounded_fan_out(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    in_flight = {"now": 0, "max": 0}
+    try:
+        async def fake_directions(request):
+            start = json.loads(request.content)["coordinates"][0]
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.02)
+            in_flight["now"] -= 1
+            if start[0] == 0.0:
+                return httpx.Response(404, json={"error": "no route"})
+            if start[0] == 1.0:
+                return httpx.Response(200, json={"routes": []})
+            return httpx.Response(200, json={"routes": [{
+                "summary": {"distance": start[0] * 1000, "duration": 60.0}, "geometry": "abc",
+            }]})
+
+        _mock_ors(monkeypatch, main, fake_directions)
+        monkeypatch.setattr(main, "DIRECTIONS_BATCH_CONCURRENCY", 3)
+        main._directions_cache.clear()
+        pairs = [{"start": [float(index), 47.0], "end": [8.5, 47.4]} for index in range(10)]
+        r = client.post("/api/ors/directions/batch", json={"pairs": pairs})
+        assert r.status_code == 200
+        body = r.json()
+        assert body["failed"] == 2
+        assert body["results"][0]["status"] == 404 and "no route" in body["results"][0]["error"]
+        # Antwort ohne Route → 502 nur für dieses Paar
+        assert body["results"][1]["status"] == 502 and "error" in body["results"][1]
+        assert body["results"][3]["distance_meters"] == 3000
+        assert "geometry_encoded" not in body["results"][3]
+        assert [item["index"] for item in body["results"]] == list(range(10))
+        assert in_flight["max"] == 3
+
+        # ungültige Koordinate → 422 für den ganzen Request
+        r = client.post("/api/ors/directions/batch", json={"pairs": [{"start": [8.5], "end": [8.5, 47.4]}]})
+        assert r.status_code == 422
+        r = client.post("/api/ors/directions", json={"start": [8.5, 47.4, 3.0], "end": [8.5, 47.4]})
+        assert r.status_code == 422
+    finally:
+        main._directions_cache.clear()
+        stack.close()
+
+
+def test_ors_matrix_splits_large_requests(tmp_path, monkeypatch):
+    main, client, stack = _load_app_with_env(tmp_path)
+    calls = []
+    try:
+        def fake_matrix(request):
+            assert request.url.path == "/v2/matrix/driving-car"
+            body = json.loads(request.content)
+            calls.append(body)
+            sources = [body["locations"][index] for index in body["sources"]]
+            if any(source[0] == 99.0 for source in sources):
+                return httpx.Response(503, json={"error": "busy"})
+            targets = [body["locations"][index] for index in body["destinations"]]
+            return httpx.Response(200, json={
+                "distances": [[source[0] * 100 + target[0] for target in targets] for source in sources],
+                "durations": [[1.0 for _ in targets] for _ in sources],
+            })
+
+        _mock_ors(monkeypatch, main, fake_matrix)
+        monkeypatch.setattr(main, "MATRIX_MAX_ELEMENTS", 4)
+        origins = [[1.0, 47.0], [2.0, 47.0], [3.0, 47.0], [99.0, 47.0]]
+        destinations = [[5.0, 46.0], [6.0, 46.0]]
+        r = client.post("/api/ors/matrix", json={"origins": origins, "destinations": destinations})
+        assert r.status_code == 200
+        body = r.json()
+        # 4 Zellen pro Aufruf bei 2 Zielen → 2 Quellen pro Block
+        assert body["ors_requests"] == 2 and len(calls) == 2
+        assert body["distances_meters"][:2] == [[105.0, 106.0], [205.0, 206.0]]
+        assert body["distances_meters"][2:] == [None, None]
+        assert [(error["origins"], error["status"]) for error in body["errors"]] == [([2, 3], 503)]
+    finally:
+        stack.close()
@@ -0,0 +1,63 @@
+# backend/tests/test_benchmarks.py
+import httpx
+
+from app.geometry import decode_polyline, encode_polyline
+from benchmarks.ors_stub import OrsStubServer
+from benchmarks.run import compare_results, percentile, scenario_errors, summarize
+
+
+def test_percentile_and_summary():
+    values = [index / 1000 for index in range(1, 101)]  # 1 … 100 ms
+    assert percentile(values, 50) == 0.05
+    assert percentile(values, 99) == 0.099
+    assert percentile([], 95) == 0.0
+    summary = summarize(values, wall_seconds=2.0, errors=3)
+    assert summary["requests"] == 100
+    assert summary["throughput_per_second"] == 50.0
+    assert summary["p95_ms"] == 95.0
+    assert summary["errors"] == 3
+
+
+def test_compare_results_flags_regressions():
+    baseline = {
+        "crud/1000/get": {"p95_ms": 10.0, "throughput_per_second": 100.0},
+        "proxy/geocode_miss": {"p95_ms": 60.0, "throughput_per_second": 50.0},
+    }
+    current = {
+        "crud/1000/get": {"p95_ms": 11.0, "throughput_per_second": 95.0},
+        "proxy/geocode_miss": {"p95_ms": 90.0, "throughput_per_second": 50.0},
+        "proxy/new_scenario": {"p95_ms": 1.0, "throughput_per_second": 1.0},
+    }
+    rows = {row["scenario"]: row for row in compare_results(current, baseline, tolerance=0.2)}
+    assert set(rows) == {"crud/1000/get", "proxy/geocode_miss"}
+    assert rows["crud/1000/get"]["regression"] is False
+    assert rows["proxy/geocode_miss"]["regression"] is True
+    assert rows["proxy/geocode_miss"]["p95_ratio"] == 1.5
+
+
+def test_scenario_errors_lists_failing_scenarios():
+    results = {
+        "crud/1000/create": summarize([0.01], wall_seconds=1.0, errors=4),
+        "crud/1000/get": summarize([0.01], wall_seconds=1.0, errors=0),
+    }
+    assert scenario_errors(results) == {"crud/1000/create": 4}
+    assert scenario_errors({}) == {}
+
+
+def test_ors_stub_returns_realistic_payloads():
+    with OrsStubServer(features=3, polyline_points=250) as stub:
+        features = httpx.get(f"{stub.base_url}/geocode/autocomplete", params={"text": "bern", "size": 5}).json()
+        assert len(features["features"]) == 3
+        assert features["features"][0]["properties"]["label"].startswith("Bern 1")
+
+        route = httpx.post(
+            f"{stub.base_url}/v2/directions/driving-car", json={"coordinates": [[8.5, 47.3], [7.4, 46.9]]}
+        ).json()["routes"][0]
+        assert len(decode_polyline(route["geometry"])) == 250
+        assert route["summary"]["distance"] > 0
+
+
+def test_encode_polyline_roundtrip():
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert decode_polyline(encode_polyline(points)) == points
@@ -0,0 +1,80 @@
+# backend/tests/test_caching.py
+import asyncio
+
+from app.caching import SingleFlight, TtlLruCache, normalize_query, quantize_coordinates
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_lru_cache_expires_entries():
+    clock = _FakeClock()
+    cache = TtlLruCache(max_entries=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["expirations"] == 1
+
+
+def test_ttl_lru_cache_evicts_least_recently_used():
+    cache = TtlLruCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "a" ist jetzt neuer als "b"
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_normalize_query():
+    assert normalize_query("  Zürich   HB ") == "zürich hb"
+    # zusammengesetztes "ü" (u + Trema) wird gleich behandelt
+    assert normalize_query("Zürich") == normalize_query("Zürich")
+
+
+def test_quantize_coordinates():
+    assert quantize_coordinates([8.537087, 47.378177], 5) == quantize_coordinates([8.537088, 47.378177], 5)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    calls = []
+
+    async def slow_call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"routes": []}
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", slow_call) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert results == [{"routes": []}] * 5
+    assert flights.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+
+def test_single_flight_shares_errors():
+    flights = SingleFlight()
+
+    async def failing_call():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(
+            *(flights.do("key", failing_call) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats()["in_flight"] == 0
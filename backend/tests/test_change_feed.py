@@ -0,0 +1,141 @@
+# backend/tests/test_change_feed.py
+import time
+
+import pytest
+import transaction
+from ZODB import DB
+
+from app.change_feed import (
+    CREATED,
+    DELETED,
+    FEED_SHARDS,
+    SCAN_WINDOW_SECONDS,
+    ChangeTokenExpired,
+    RouteChange,
+    get_route_change_feed,
+    parse_change_token,
+)
+
+
+@pytest.fixture()
+def connection():
+    database = DB(None)
+    connection = database.open(transaction_manager=transaction.TransactionManager())
+    yield connection
+    connection.close()
+    database.close()
+
+
+def _commit(connection, *events):
+    feed = get_route_change_feed(connection.root())
+    for kind, identifier, recorded_at in events:
+        feed.record(kind, identifier, now=recorded_at)
+    connection.transaction_manager.commit()
+    return connection.db().lastTransaction()
+
+
+def test_changes_follow_commit_order_not_recording_time(connection):
+    now = time.time()
+    start = _commit(connection)
+    # "slow" wurde früher aufgenommen, aber später committet
+    first = _commit(connection, (CREATED, "fast", now))
+    _commit(connection, (CREATED, "slow", now - 5), (DELETED, "fast", now - 4))
+
+    changes, last_serial, more = get_route_change_feed(connection.root()).changes_since(start, limit=10)
+    assert [(change.kind, change.identifier) for change in changes] == [
+        (CREATED, "fast"), (CREATED, "slow"), (DELETED, "fast"),
+    ]
+    assert last_serial == connection.db().lastTransaction()
+    assert not more
+
+    changes, _, _ = get_route_change_feed(connection.root()).changes_since(first, limit=10)
+    assert [change.identifier for change in changes] == ["slow", "fast"]
+
+
+def test_limit_never_splits_a_transaction(connection):
+    now = time.time()
+    start = _commit(connection)
+    first = _commit(connection, (CREATED, "a", now), (CREATED, "b", now))
+    _commit(connection, (CREATED, "c", now))
+
+    changes, last_serial, more = get_route_change_feed(connection.root()).changes_since(start, limit=1)
+    assert [change.identifier for change in changes] == ["a", "b"]
+    assert last_serial == first
+    assert more
+
+
+def test_trim_expires_old_tokens(connection):
+    now = time.time()
+    start = _commit(connection, (CREATED, "old", now - 3600))
+    _commit(connection, (CREATED, "new", now))
+    feed = get_route_change_feed(connection.root())
+    assert feed.trim(retention_seconds=600, now=now) == 1
+    connection.transaction_manager.commit()
+    # "new" ist noch da, das Token damit noch gültig
+    assert [change.identifier for change in feed.changes_since(start, limit=10)[0]] == ["new"]
+
+    assert feed.trim(retention_seconds=600, now=now + 1000) == 1
+    connection.transaction_manager.commit()
+
+    with pytest.raises(ChangeTokenExpired):
+        feed.changes_since(start, limit=10)
+    # vor dem Anlegen des Protokolls gibt es keine Ereignisse
+    with pytest.raises(ChangeTokenExpired):
+        feed.changes_since(parse_change_token("0" * 16), limit=10)
+    with pytest.raises(ValueError):
+        parse_change_token("abc")
+
+
+def test_events_are_spread_over_shards_and_old_feeds_are_rekeyed(connection):
+    now = time.time()
+    start = _commit(connection)
+    _commit(connection, *[(CREATED, f"route-{index}", now + index) for index in range(64)])
+    feed = get_route_change_feed(connection.root())
+    assert len({key[0] for key in feed.events.keys()}) > FEED_SHARDS // 2
+
+    # Protokoll im alten Format: (recorded_at, Kennung, Art) → Ereignis
+    feed.events.clear()
+    del feed.shards
+    old = RouteChange(CREATED, "legacy", now + 100)
+    feed.events[(old.recorded_at, old.identifier, old.kind)] = old
+    connection.transaction_manager.commit()
+    serial = old.serial
+
+    feed = get_route_change_feed(connection.root())
+    connection.transaction_manager.commit()
+    assert feed.shards == FEED_SHARDS
+    changes, last_serial, _ = feed.changes_since(start, limit=10)
+    # das Ereignis behält seine Transaktion, nur der Schlüssel ist neu
+    assert [change.identifier for change in changes] == ["legacy"] and last_serial == serial
+
+
+def test_paging_reads_only_the_returned_part_of_a_long_backlog(connection, monkeypatch):
+    # Transaktionen im Abstand von 10 s (die ZODB nimmt die Uhrzeit für die Kennung)
+    clock = [time.time() + 60]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+
+    def commit_one(identifier):
+        clock[0] += 10
+        return _commit(connection, (CREATED, identifier, clock[0]))
+
+    get_route_change_feed(connection.root())
+    clock[0] += 1
+    start = _commit(connection)
+    serials = [commit_one(f"route-{index:03d}") for index in range(300)]
+
+    loaded = []
+    serial_property = RouteChange.serial
+    monkeypatch.setattr(RouteChange, "serial", property(lambda change: loaded.append(1) or serial_property.fget(change)))
+    feed = get_route_change_feed(connection.root())
+    token, received = start, []
+    while True:
+        loaded.clear()
+        changes, last_serial, more = feed.changes_since(token, limit=20)
+        # geliefert plus die Ereignisse im Zeitfenster danach, nicht der ganze Rest
+        assert len(loaded) <= len(changes) + 2 * (SCAN_WINDOW_SECONDS / 10 + 1)
+        received.extend(change.identifier for change in changes)
+        if not more:
+            break
+        token = last_serial
+    assert received == [f"route-{index:03d}" for index in range(300)]
+    assert last_serial == serials[-1]
@@ -0,0 +1,60 @@
+# backend/tests/test_geocode_cache.py
+import transaction
+from ZODB import DB
+
+from app.geocode_cache import GeocodeCache, get_geocode_cache_store
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _open_store():
+    database = DB(None)  # MappingStorage im Speicher
+    connection = database.open()
+    return database, connection, get_geocode_cache_store(connection.root())
+
+
+def test_geocode_cache_expires_entries():
+    clock = _FakeClock()
+    cache = GeocodeCache(max_entries=10, ttl_seconds=60, clock=clock)
+    database, connection, store = _open_store()
+    try:
+        cache.store(store, "Bern Bahnhof", 1, {"features": []})
+        transaction.commit()
+        assert cache.lookup(store, "bern bahnhof", 1) == {"features": []}
+        assert cache.lookup(store, "Bern Bahnhof", 5) is None
+        clock.now += 60
+        assert cache.lookup(store, "Bern Bahnhof", 1) is None
+    finally:
+        transaction.abort()
+        connection.close()
+        database.close()
+
+
+def test_geocode_cache_evicts_oldest_entries():
+    clock = _FakeClock()
+    cache = GeocodeCache(max_entries=2, ttl_seconds=600, clock=clock)
+    database, connection, store = _open_store()
+    try:
+        for text in ("a", "b", "c"):
+            clock.now += 1
+            cache.store(store, text, 1, {"text": text})
+        transaction.commit()
+        assert store.length() == 2
+        assert cache.lookup(store, "a", 1) is None
+        assert cache.lookup(store, "c", 1) == {"text": "c"}
+        # erneutes Speichern verjüngt einen Eintrag
+        clock.now += 1
+        cache.store(store, "b", 1, {"text": "b"})
+        clock.now += 1
+        cache.store(store, "d", 1, {"text": "d"})
+        assert [entry["text"] for entry in cache.inspect(store)["oldest"]] == ["b", "d"]
+    finally:
+        transaction.abort()
+        connection.close()
+        database.close()
@@ -0,0 +1,47 @@
+# backend/tests/test_geometry.py
+import math
+
+from app.geometry import (
+    decode_polyline,
+    decode_polyline_arrays,
+    encode_polyline,
+    select_level_zoom,
+    simplify_indices,
+    simplify_polyline_levels,
+)
+
+
+def test_decode_polyline_arrays_matches_decode_polyline():
+    encoded = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    latitudes, longitudes = decode_polyline_arrays(encoded)
+    assert list(zip(latitudes, longitudes)) == [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert decode_polyline(encoded) == list(zip(latitudes, longitudes))
+    assert [len(values) for values in decode_polyline_arrays("")] == [0, 0]
+
+
+def test_simplify_indices_keeps_corners_and_endpoints():
+    # Gerade mit einem deutlichen Knick in der Mitte
+    xs = [0, 1, 2, 3, 4, 5, 6]
+    ys = [0, 0.01, 0, 3, 0, 0.01, 0]
+    assert simplify_indices(xs, ys, 0.1) == [0, 2, 3, 4, 6]
+    assert simplify_indices(xs, ys, 5) == [0, 6]
+    assert simplify_indices([0, 1], [0, 1], 1) == [0, 1]
+
+
+def test_simplify_polyline_levels_coarser_at_lower_zoom():
+    points = [(46.8 + index * 1e-4 + 0.002 * math.sin(index / 50), 8.2 + index * 1e-4) for index in range(3000)]
+    levels = simplify_polyline_levels(encode_polyline(points), [5, 8, 11, 14])
+    counts = {zoom: len(decode_polyline(encoded)) for zoom, encoded in levels.items()}
+    assert counts[14] < 3000
+    # kleinerer Zoom → weniger Punkte; Stufen ohne Einsparung gegenüber der feineren fehlen
+    ordered = [counts[zoom] for zoom in sorted(counts)]
+    assert ordered == sorted(set(ordered))
+    assert ordered[0] * 20 < 3000
+
+
+def test_select_level_zoom():
+    assert select_level_zoom([8, 11, 14], None) is None
+    assert select_level_zoom([8, 11, 14], 3) == 8
+    assert select_level_zoom([8, 11, 14], 9) == 11
+    assert select_level_zoom([8, 11, 14], 14) == 14
+    assert select_level_zoom([8, 11, 14], 15) is None
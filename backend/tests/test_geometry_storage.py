@@ -0,0 +1,53 @@
+# backend/tests/test_geometry_storage.py
+import pytest
+from ZODB import DB
+from ZODB.FileStorage import FileStorage
+
+from app.database import _pack_geometry, _unpack_geometry
+from app.geometry_storage import GeometryData, decode_coordinates, encode_coordinates
+
+
+def test_coordinates_roundtrip_as_float64_buffer():
+    coordinates = [[8.537087, 47.378177], [8.544, 47.4116], [-0.1, -51.5]]
+    data = encode_coordinates(coordinates)
+    assert len(data) == 3 * 2 * 8
+    assert decode_coordinates(data) == coordinates
+
+
+def test_coordinates_with_elevation():
+    # ORS mit elevation=true liefert [lon, lat, höhe]
+    coordinates = [[8.537087, 47.378177, 408.5], [8.544, 47.4116, 431.0]]
+    assert decode_coordinates(encode_coordinates(coordinates, dimensions=3), dimensions=3) == coordinates
+    assert decode_coordinates(encode_coordinates(coordinates)) == [point[:2] for point in coordinates]
+    with pytest.raises(ValueError):
+        encode_coordinates([[8.5, 47.3, 400.0], [8.6, 47.4]], dimensions=3)
+
+
+def test_geometry_data_goes_to_blob_above_threshold(tmp_path):
+    storage = FileStorage(str(tmp_path / "geometry.fs"), blob_dir=str(tmp_path / "blobs"))
+    database = DB(storage)
+    small = b"x" * 10
+    large = b"y" * 5000
+    with database.transaction() as connection:
+        connection.root()["small"] = GeometryData(small, blob_threshold_bytes=1024)
+        connection.root()["large"] = GeometryData(large, blob_threshold_bytes=1024)
+
+    with database.transaction() as connection:
+        assert not connection.root()["small"].in_blob
+        assert connection.root()["large"].in_blob
+        assert connection.root()["small"].read() == small
+        assert connection.root()["large"].read() == large
+        assert connection.root()["large"].size_bytes == 5000
+    database.close()
+
+
+def test_personal_route_geometry_is_packed_and_legacy_lists_stay_readable():
+    geometry = {"type": "LineString", "coordinates": [[8.5, 47.3], [8.6, 47.4]]}
+    packed = _pack_geometry(geometry)
+    assert isinstance(packed["coordinates"], GeometryData)
+    assert _unpack_geometry(packed) == geometry
+    with_elevation = {"type": "LineString", "coordinates": [[8.5, 47.3, 400.0], [8.6, 47.4, 412.5]]}
+    assert _unpack_geometry(_pack_geometry(with_elevation)) == with_elevation
+    # Datensätze vor der Migration enthalten noch die Liste
+    assert _unpack_geometry(geometry) == geometry
+    assert _pack_geometry(None) is None
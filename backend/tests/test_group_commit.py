@@ -0,0 +1,123 @@
+# backend/tests/test_group_commit.py
+import threading
+from contextlib import contextmanager
+
+import pytest
+import transaction
+from BTrees.OOBTree import OOBTree
+from ZODB import DB
+
+from app.group_commit import GroupCommitter
+from app.transactions import TransactionStatistics, run_in_transaction
+
+
+def _committer(database, statistics, window_seconds=0.2, max_operations=64):
+    @contextmanager
+    def open_connection():
+        connection = database.open(transaction_manager=transaction.TransactionManager())
+        try:
+            yield connection
+        finally:
+            connection.transaction_manager.abort()
+            connection.close()
+
+    def write_transaction(connection, work):
+        return run_in_transaction(
+            connection.transaction_manager, work, attempts=3, backoff_seconds=0, statistics=statistics
+        )
+
+    return GroupCommitter(open_connection, write_transaction, window_seconds, max_operations)
+
+
+def _stored(database):
+    connection = database.open(transaction_manager=transaction.TransactionManager())
+    try:
+        return dict(connection.root().get("items", {}))
+    finally:
+        connection.close()
+
+
+def _put(key):
+    def work(connection):
+        root = connection.root()
+        if "items" not in root:
+            root["items"] = OOBTree()
+        if key in root["items"]:
+            raise KeyError(key)
+        root["items"][key] = key.upper()
+        return key.upper()
+
+    return work
+
+
+def _submit_concurrently(committer, works):
+    results = [None] * len(works)
+
+    def submit(index, work):
+        try:
+            results[index] = committer.submit(work)
+        except Exception as error:
+            results[index] = error
+
+    threads = [threading.Thread(target=submit, args=(index, work)) for index, work in enumerate(works)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_writes_share_one_commit():
+    database = DB(None)
+    statistics = TransactionStatistics()
+    committer = _committer(database, statistics, max_operations=8)
+    try:
+        keys = [f"k{index}" for index in range(8)]
+        assert _submit_concurrently(committer, [_put(key) for key in keys]) == [key.upper() for key in keys]
+        assert _stored(database) == {key: key.upper() for key in keys}
+        stats = committer.stats()
+        # volle Gruppe → sofort committet, ohne das Fenster abzuwarten
+        assert stats["groups"] == 1 and stats["operations"] == 8 and stats["largest_group"] == 8
+        assert statistics.stats()["commits"] == 1
+    finally:
+        committer.close()
+
+
+def test_failing_operation_is_left_out_of_the_group():
+    database = DB(None)
+    statistics = TransactionStatistics()
+    committer = _committer(database, statistics, max_operations=3)
+    try:
+        committer.submit(_put("taken"))
+        results = _submit_concurrently(committer, [_put("a"), _put("taken"), _put("b")])
+        assert results[0] == "A" and results[2] == "B"
+        assert isinstance(results[1], KeyError)
+        assert _stored(database) == {"taken": "TAKEN", "a": "A", "b": "B"}
+        assert committer.stats()["fallbacks"] == 0
+    finally:
+        committer.close()
+
+
+def test_failing_commit_falls_back_to_single_commits():
+    database = DB(None)
+    statistics = TransactionStatistics()
+    committer = _committer(database, statistics, max_operations=3)
+
+    def unpicklable(connection):
+        # scheitert erst beim Commit (Lock lässt sich nicht speichern)
+        connection.root()["broken"] = threading.Lock()
+
+    try:
+        results = _submit_concurrently(committer, [_put("a"), unpicklable, _put("b")])
+        assert results[0] == "A" and results[2] == "B"
+        assert isinstance(results[1], Exception)
+        assert _stored(database) == {"a": "A", "b": "B"}
+        assert committer.stats()["fallbacks"] == 1
+    finally:
+        committer.close()
+    # nach close() startet der Schreib-Thread bei Bedarf neu
+    assert committer.submit(_put("c")) == "C"
+    committer.close()
+    with pytest.raises(KeyError):
+        committer.submit(_put("c"))
+    committer.close()
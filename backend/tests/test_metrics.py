@@ -0,0 +1,32 @@
+# backend/tests/test_metrics.py
+from app.metrics import CallbackMetric, Counter, Histogram, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("request_seconds", "Dauer", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 3.0)
+    lines = histogram.render()
+    assert 'request_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'request_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'request_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'request_seconds_sum{route="/a"} 3.55' in lines
+    assert 'request_seconds_count{route="/a"} 3' in lines
+    assert histogram.count(("/a",)) == 3
+
+
+def test_registry_renders_counters_and_callbacks_with_escaped_labels():
+    counter = Counter("errors_total", "Fehler", ("status",))
+    counter.inc(("502",))
+    counter.inc(("502",))
+    registry = MetricsRegistry()
+    registry.register(counter)
+    registry.register(CallbackMetric(
+        "pool", "Pool", "gauge", ("state",), lambda: [(('in "use"',), 2), (("unknown",), None)]
+    ))
+    text = registry.render()
+    assert "# TYPE errors_total counter" in text
+    assert 'errors_total{status="502"} 2' in text
+    assert 'pool{state="in \\"use\\""} 2' in text
+    assert "unknown" not in text  # None = Wert nicht verfügbar
@@ -0,0 +1,120 @@
+# backend/tests/test_ors_scheduler.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.ors_client import OrsClient
+from app.ors_scheduler import UpstreamRejected, UpstreamScheduler
+
+
+def _scheduler(**overrides):
+    # 600 pro Minute → alle 0.1 s ein Token
+    options = dict(
+        requests_per_minute=600,
+        burst=2,
+        max_queue=10,
+        max_wait_seconds={"directions": 5, "geocode": 5, "autocomplete": 5},
+    )
+    options.update(overrides)
+    return UpstreamScheduler(**options)
+
+
+def test_burst_is_admitted_and_queue_is_served_by_priority():
+    async def scenario():
+        scheduler = _scheduler()
+        order = []
+
+        async def call(upstream):
+            await scheduler.acquire(upstream)
+            order.append(upstream)
+
+        await call("autocomplete")
+        await call("autocomplete")
+        # Bucket leer: erst Autocomplete, dann Geocoding und Routenberechnung einreihen
+        tasks = [asyncio.create_task(call(upstream)) for upstream in ("autocomplete", "geocode", "directions")]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depths() == {"directions": 1, "geocode": 1, "autocomplete": 1}
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["autocomplete", "autocomplete", "directions", "geocode", "autocomplete"]
+
+
+def test_low_priority_leaves_reserved_tokens_for_directions():
+    async def scenario():
+        scheduler = _scheduler(burst=4, reserve_tokens={"autocomplete": 2})
+        for _ in range(2):
+            await scheduler.acquire("autocomplete")
+        # zwei Tokens übrig, aber für Routenberechnungen reserviert
+        waiting = asyncio.create_task(scheduler.acquire("autocomplete"))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depths()["autocomplete"] == 1
+        await scheduler.acquire("directions")
+        await scheduler.acquire("matrix")
+        await waiting
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_evicts_lowest_priority_and_rejects_equal_priority():
+    async def scenario():
+        scheduler = _scheduler(burst=1, max_queue=2)
+        await scheduler.acquire("directions")
+        autocomplete = asyncio.create_task(scheduler.acquire("autocomplete"))
+        geocode = asyncio.create_task(scheduler.acquire("geocode"))
+        await asyncio.sleep(0)
+
+        # volle Warteschlange: Routenberechnung verdrängt den Autocomplete-Aufruf
+        directions = asyncio.create_task(scheduler.acquire("directions"))
+        with pytest.raises(UpstreamRejected) as rejected:
+            await autocomplete
+        assert rejected.value.reason == "evicted"
+
+        # nichts Niedrigeres mehr in der Warteschlange → neuer Autocomplete-Aufruf abgewiesen
+        with pytest.raises(UpstreamRejected) as rejected:
+            await scheduler.acquire("autocomplete")
+        assert rejected.value.reason == "queue_full"
+        assert rejected.value.retry_after_seconds > 0
+        await asyncio.gather(directions, geocode)
+
+    asyncio.run(scenario())
+
+
+def test_stale_low_priority_requests_are_shed():
+    async def scenario():
+        scheduler = _scheduler(requests_per_minute=6, burst=1, max_wait_seconds={"autocomplete": 0.05})
+        await scheduler.acquire("autocomplete")
+        with pytest.raises(UpstreamRejected) as rejected:
+            await scheduler.acquire("autocomplete")
+        assert rejected.value.reason == "stale"
+        assert scheduler.queue_depths()["autocomplete"] == 0
+        assert scheduler.stats()["requests"]["autocomplete"]["stale"] >= 1
+
+    asyncio.run(scenario())
+
+
+def test_ors_client_maps_rejection_to_429_and_throttles_on_upstream_429():
+    async def scenario():
+        scheduler = _scheduler(requests_per_minute=6, burst=3, max_wait_seconds={"autocomplete": 0.01})
+        client = OrsClient(
+            pool_size=1,
+            connect_timeout_seconds=1,
+            read_timeout_seconds=1,
+            transport=httpx.MockTransport(lambda request: httpx.Response(429, json={"error": "quota"})),
+            scheduler=scheduler,
+        )
+        with pytest.raises(HTTPException) as error:
+            await client.get_json("http://ors.test/geocode/search", params={}, upstream="geocode")
+        assert error.value.status_code == 429
+        # ORS meldet erschöpftes Kontingent → angesparte Tokens verworfen
+        assert scheduler.stats()["tokens"] < 1
+        with pytest.raises(HTTPException) as error:
+            await client.get_json("http://ors.test/geocode/autocomplete", params={}, upstream="autocomplete")
+        assert error.value.status_code == 429
+        assert "autocomplete: stale" in error.value.detail
+        assert int(error.value.headers["Retry-After"]) >= 1
+        await client.aclose()
+
+    asyncio.run(scenario())
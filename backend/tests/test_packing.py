@@ -0,0 +1,79 @@
+# backend/tests/test_packing.py
+import asyncio
+
+import pytest
+from ZODB import DB
+from ZODB.FileStorage import FileStorage
+
+from app.packing import PackAlreadyRunning, PackScheduler
+
+
+def _database_with_history(path):
+    database = DB(FileStorage(str(path)))
+    for value in range(200):
+        with database.transaction() as connection:
+            connection.root()["value"] = "x" * 1000 + str(value)
+    return database
+
+
+def test_pack_now_shrinks_file_and_reports_statistics(tmp_path):
+    path = tmp_path / "history.fs"
+    database = _database_with_history(path)
+    scheduler = PackScheduler(database, str(path), interval_seconds=60, retention_seconds=0)
+    before = scheduler.stats()
+    assert before["packs"] == 0 and before["last_pack_at"] is None
+
+    after = scheduler.pack_now()
+    assert after["packs"] == 1
+    assert after["file_size_bytes"] < before["file_size_bytes"] / 10
+    assert after["records"] == before["records"]
+    assert after["last_pack_at"] is not None
+    assert after["last_pack_duration_seconds"] >= 0
+    with database.transaction() as connection:
+        assert connection.root()["value"].endswith("199")
+    database.close()
+
+
+def test_pack_is_not_started_twice(tmp_path):
+    database = DB(FileStorage(str(tmp_path / "twice.fs")))
+    scheduler = PackScheduler(database, None, interval_seconds=60, retention_seconds=0)
+    scheduler._lock.acquire()
+    try:
+        assert scheduler.stats()["running"] is True
+        with pytest.raises(PackAlreadyRunning):
+            scheduler.pack_now()
+    finally:
+        scheduler._lock.release()
+    database.close()
+
+
+def test_scheduler_packs_periodically(tmp_path):
+    database = _database_with_history(tmp_path / "periodic.fs")
+    scheduler = PackScheduler(database, None, interval_seconds=0.05, retention_seconds=0)
+
+    async def run_briefly():
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.5)
+        task.cancel()
+
+    asyncio.run(run_briefly())
+    assert scheduler.packs >= 2
+    database.close()
+
+
+def test_launcher_pack_loop_packs_until_stopped(tmp_path):
+    import threading
+    import time
+
+    from app.launcher import _pack_periodically
+
+    database = _database_with_history(tmp_path / "launcher.fs")
+    scheduler = PackScheduler(database, None, interval_seconds=0.05, retention_seconds=0)
+    stop = threading.Event()
+    thread = threading.Thread(target=_pack_periodically, args=(scheduler, stop))
+    thread.start()
+    time.sleep(0.5)
+    stop.set()
+    thread.join()
+    assert scheduler.packs >= 2
+    database.close()
@@ -0,0 +1,107 @@
+# backend/tests/test_profiling.py
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.profiling import (
+    ProfiledRoute,
+    ProfilingMiddleware,
+    SlowestRequests,
+    add_span,
+    sample_stacks,
+    server_timing,
+    span,
+)
+
+
+def _profiled_app(slowest):
+    app = FastAPI()
+    app.router.route_class = ProfiledRoute
+    app.add_middleware(ProfilingMiddleware, slowest=slowest)
+
+    @app.get("/work")
+    def work():
+        with span("load"):
+            time.sleep(0.01)
+        add_span("commit", 0.002)
+        return {"ok": True}
+
+    @app.get("/async-work")
+    async def async_work():
+        with span("ors"):
+            pass
+        return {"ok": True}
+
+    return app
+
+
+def _parse_server_timing(value):
+    entries = {}
+    for entry in value.split(", "):
+        name, duration = entry.split(";dur=")
+        entries[name] = float(duration)
+    return entries
+
+
+def test_server_timing_header_and_slowest_requests():
+    slowest = SlowestRequests(capacity=5)
+    with TestClient(_profiled_app(slowest)) as client:
+        r = client.get("/work")
+        assert r.status_code == 200
+        timing = _parse_server_timing(r.headers["server-timing"])
+        assert {"load", "commit", "endpoint", "route", "framework", "total"} <= set(timing)
+        assert timing["load"] >= 10
+        assert timing["commit"] == 2
+        assert timing["endpoint"] >= timing["load"]
+        assert timing["total"] >= timing["route"] >= timing["endpoint"]
+
+        r = client.get("/async-work")
+        assert "ors" in _parse_server_timing(r.headers["server-timing"])
+        client.get("/missing")
+
+    samples = slowest.slowest()
+    assert slowest.recorded == 3
+    assert samples[0]["route"] == "/work"
+    assert samples[0]["status"] == 200
+    assert samples[0]["spans"]["load"] >= 10
+    assert {sample["route"] for sample in samples} == {"/work", "/async-work", "unmatched"}
+
+
+def test_slowest_requests_keeps_the_slowest():
+    slowest = SlowestRequests(capacity=3)
+    for milliseconds in (5, 1, 9, 3, 7, 2):
+        slowest.record(milliseconds / 1000, {"milliseconds": milliseconds})
+    assert [sample["milliseconds"] for sample in slowest.slowest()] == [9, 7, 5]
+    assert slowest.recorded == 6
+    slowest.clear()
+    assert slowest.slowest() == [] and slowest.recorded == 0
+
+
+def test_span_without_trace_is_free():
+    # ohne ProfilingMiddleware: immer dasselbe nullcontext, add_span ignoriert
+    assert span("load") is span("commit")
+    with span("load"):
+        add_span("commit", 1.0)
+    assert server_timing({"route": 0.003, "endpoint": 0.001}) == "route;dur=3.000, endpoint;dur=1.000, framework;dur=2.000"
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_stacks_sees_busy_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    try:
+        profile = sample_stacks(0.2, interval_seconds=0.002)
+    finally:
+        stop.set()
+        worker.join()
+    assert profile["samples"] > 0
+    busy = [entry for entry in profile["functions"] if entry["function"].startswith("_busy_loop ")]
+    assert busy and busy[0]["total"] > 0
+    assert any("_busy_loop" in entry["stack"] for entry in profile["stacks"])
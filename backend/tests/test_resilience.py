@@ -0,0 +1,122 @@
+# backend/tests/test_resilience.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.caching import TtlLruCache
+from app.ors_client import OrsClient
+from app.resilience import CircuitBreaker, CircuitOpen, Revalidator, hedged
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_breaker_opens_probes_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("geocode", failure_threshold=3, open_seconds=30, clock=clock)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen) as rejected:
+        breaker.before_call()
+    assert rejected.value.retry_after_seconds == 30
+
+    # nach Ablauf genau ein Probeaufruf; schlägt er fehl, wieder offen
+    clock.now += 30
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "opened": 2, "rejected": 2}
+
+
+def test_hedged_request_returns_faster_second_call():
+    async def scenario():
+        delays = [1.0, 0.01]
+        started = []
+
+        async def call():
+            delay = delays[len(started)]
+            started.append(delay)
+            await asyncio.sleep(delay)
+            return delay
+
+        result = await asyncio.wait_for(hedged(call, 0.02, "geocode"), timeout=0.5)
+        return result, started
+
+    assert asyncio.run(scenario()) == (0.01, [1.0, 0.01])
+
+
+def test_ors_client_deadline_and_open_circuit():
+    async def scenario():
+        calls = []
+
+        async def slow_upstream(request):
+            calls.append(request.url.path)
+            await asyncio.sleep(1)
+            return httpx.Response(200, json={})
+
+        breaker = CircuitBreaker("geocode", failure_threshold=2, open_seconds=60)
+        client = OrsClient(
+            pool_size=2,
+            connect_timeout_seconds=5,
+            read_timeout_seconds=5,
+            transport=httpx.MockTransport(slow_upstream),
+            deadlines={"geocode": 0.05},
+            breakers={"geocode": breaker},
+        )
+        for _ in range(2):
+            with pytest.raises(HTTPException) as error:
+                await client.get_json("http://ors.test/geocode/search", params={}, upstream="geocode")
+            assert error.value.status_code == 504
+        # Breaker offen: kein weiterer Aufruf an ORS
+        with pytest.raises(HTTPException) as error:
+            await client.get_json("http://ors.test/geocode/search", params={}, upstream="geocode")
+        assert error.value.status_code == 503
+        assert int(error.value.headers["Retry-After"]) >= 1
+        assert len(calls) == 2
+        await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_stale_entry_is_served_and_revalidated_once():
+    clock = FakeClock()
+    cache = TtlLruCache(max_entries=10, ttl_seconds=10, clock=clock, stale_seconds=100)
+    cache.set("key", "old")
+    clock.now += 20
+    assert cache.get("key") is None
+    assert cache.get_stale("key") == "old"
+    clock.now += 100
+    assert cache.get_stale("key") is None
+
+    async def scenario():
+        revalidator = Revalidator()
+        refreshed = []
+
+        async def refresh():
+            await asyncio.sleep(0.01)
+            refreshed.append(True)
+
+        revalidator.serve_stale("geocode", "key", refresh)
+        revalidator.serve_stale("geocode", "key", refresh)
+        assert revalidator.running() == 1
+        await asyncio.sleep(0.05)
+        assert revalidator.running() == 0
+        return refreshed
+
+    assert asyncio.run(scenario()) == [True]
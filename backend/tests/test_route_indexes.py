@@ -0,0 +1,78 @@
+# backend/tests/test_route_indexes.py
+from datetime import datetime, timedelta
+from itertools import islice
+from types import SimpleNamespace
+
+import pytest
+
+from app.route_indexes import RouteIndexes
+
+BASE_TIME = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def _route(minutes, profile, distance_meters):
+    return SimpleNamespace(
+        created_at=BASE_TIME + timedelta(minutes=minutes),
+        profile=profile,
+        distance_meters=distance_meters,
+    )
+
+
+@pytest.fixture()
+def indexes():
+    indexes = RouteIndexes()
+    indexes.add("a", _route(0, "driving-car", 5_000))
+    indexes.add("b", _route(1, "cycling-regular", 12_000))
+    indexes.add("c", _route(2, "driving-car", 30_000))
+    indexes.add("d", _route(3, "cycling-regular", 49_999))
+    indexes.add("e", _route(4, "driving-car", None))
+    return indexes
+
+
+def test_query_newest_first(indexes):
+    assert list(indexes.query()) == ["e", "d", "c", "b", "a"]
+    assert list(islice(indexes.query(), 2)) == ["e", "d"]
+    assert list(indexes.query(after="d")) == ["c", "b", "a"]
+
+
+def test_query_by_profile_and_distance(indexes):
+    assert list(indexes.query(profile="driving-car")) == ["e", "c", "a"]
+    assert list(indexes.query(min_distance_meters=10_000, max_distance_meters=50_000)) == ["d", "c", "b"]
+    assert list(indexes.query(profile="cycling-regular", max_distance_meters=20_000)) == ["b"]
+    assert list(indexes.query(min_distance_meters=30_000, after="d")) == ["c"]
+
+
+def test_query_by_created_range(indexes):
+    result = indexes.query(
+        created_from=BASE_TIME + timedelta(minutes=1),
+        created_to=BASE_TIME + timedelta(minutes=3),
+    )
+    assert list(result) == ["d", "c", "b"]
+
+
+def test_remove_updates_all_indexes(indexes):
+    indexes.remove("c")
+    assert list(indexes.query(profile="driving-car")) == ["e", "a"]
+    assert list(indexes.query(min_distance_meters=25_000)) == ["d"]
+    assert "c" not in indexes.entries
+    with pytest.raises(KeyError):
+        list(indexes.query(after="c"))
+
+
+def test_new_routes_spread_over_shards_and_old_indexes_are_rebuilt():
+    from BTrees.OOBTree import OOBTree
+
+    from app.route_indexes import INDEX_SHARDS, get_route_indexes
+
+    routes = OOBTree({f"route-{index:03d}": _route(index, "driving-car", 1_000) for index in range(64)})
+    indexes = RouteIndexes()
+    indexes.rebuild(routes.items())
+    # gleichzeitig angelegte Routen schreiben in verschiedene Bereiche der Menge
+    assert len({shard for shard, _, _ in indexes.by_created.keys()}) > INDEX_SHARDS // 2
+    assert list(islice(indexes.query(), 3)) == ["route-063", "route-062", "route-061"]
+
+    indexes.shards = None  # ältere Version
+    indexes.by_created.clear()
+    rebuilt = get_route_indexes({"routes_indexes": indexes}, routes)
+    assert rebuilt.shards == INDEX_SHARDS
+    assert len(list(rebuilt.query(profile="driving-car"))) == 64
@@ -0,0 +1,95 @@
+# backend/tests/test_spatial_index.py
+from types import SimpleNamespace
+
+from app.spatial_index import SpatialIndex, covering_cells, encode_geohash, haversine_meters
+
+
+def _route(start, end, geometry_encoded=None):
+    return SimpleNamespace(
+        start_coordinates={"longitude": start[0], "latitude": start[1]},
+        end_coordinates={"longitude": end[0], "latitude": end[1]},
+        geometry_encoded=geometry_encoded,
+    )
+
+
+ZURICH = (8.537087, 47.378177)
+OERLIKON = (8.544, 47.4116)
+BERN = (7.439136, 46.94809)
+GENEVA = (6.1432, 46.2104)
+
+
+def test_encode_geohash_known_value():
+    assert encode_geohash(-5.6, 42.6, 5) == "ezs42"
+
+
+def test_covering_cells_cover_the_box():
+    box = (8.5, 47.3, 8.6, 47.4)
+    cells = covering_cells(box, max_precision=8)
+    assert 1 <= len(cells) <= 16
+    for longitude in (8.5, 8.55, 8.6):
+        for latitude in (47.3, 47.35, 47.4):
+            point = encode_geohash(longitude, latitude, 12)
+            assert any(point.startswith(cell) for cell in cells)
+
+
+def test_spatial_index_intersecting_and_remove():
+    index = SpatialIndex()
+    index.add("zurich-local", _route(ZURICH, OERLIKON))
+    index.add("zurich-bern", _route(ZURICH, BERN))
+    index.add("geneva-local", _route(GENEVA, (6.15, 46.22)))
+
+    zurich_viewport = (8.50, 47.35, 8.58, 47.42)
+    assert index.intersecting(zurich_viewport) == ["zurich-bern", "zurich-local"]
+    # Viewport zwischen Bern und Zürich: nur die lange Route schneidet ihn
+    assert index.intersecting((7.9, 47.1, 8.0, 47.2)) == ["zurich-bern"]
+    assert index.intersecting((-10.0, 30.0, 20.0, 60.0)) == ["geneva-local", "zurich-bern", "zurich-local"]
+
+    index.remove("zurich-bern")
+    assert index.intersecting(zurich_viewport) == ["zurich-local"]
+    assert "zurich-bern" not in index.entries
+
+
+def test_spatial_index_starting_near():
+    index = SpatialIndex()
+    index.add("zurich", _route(ZURICH, BERN))
+    index.add("oerlikon", _route(OERLIKON, BERN))
+    index.add("bern", _route(BERN, ZURICH))
+
+    near = index.starting_near(ZURICH[0], ZURICH[1], radius_meters=5_000)
+    assert [identifier for identifier, _ in near] == ["zurich", "oerlikon"]
+    assert near[0][1] < 1.0
+    assert abs(near[1][1] - haversine_meters(*ZURICH, *OERLIKON)) < 1e-6
+    assert index.starting_near(ZURICH[0], ZURICH[1], radius_meters=100) == [("zurich", near[0][1])]
+
+
+def test_starting_near_limit_matches_full_scan():
+    index = SpatialIndex()
+    points = {}
+    for row in range(20):
+        for column in range(20):
+            point = (ZURICH[0] + (column - 10) * 0.01, ZURICH[1] + (row - 10) * 0.007)
+            points[f"r{row:02d}-{column:02d}"] = point
+            index.add(f"r{row:02d}-{column:02d}", _route(point, BERN))
+    expected = sorted(
+        (haversine_meters(*ZURICH, *point), identifier)
+        for identifier, point in points.items()
+        if haversine_meters(*ZURICH, *point) <= 4_000
+    )
+    near = index.starting_near(ZURICH[0], ZURICH[1], radius_meters=4_000)
+    assert [(distance, identifier) for identifier, distance in near] == expected
+    assert index.starting_near(ZURICH[0], ZURICH[1], radius_meters=4_000, limit=5) == near[:5]
+
+
+def test_old_start_set_is_migrated():
+    from BTrees.OOBTree import OOBTree, OOTreeSet
+
+    from app.spatial_index import get_spatial_index
+
+    index = SpatialIndex()
+    index.add("zurich", _route(ZURICH, BERN))
+    # ältere Version: Startpunkte nur als Menge von Schlüsseln
+    index.starts = OOTreeSet(index.starts.keys())
+    root = {"routes_spatial_index": index}
+    migrated = get_spatial_index(root, OOBTree())
+    assert isinstance(migrated.starts, OOBTree)
+    assert [identifier for identifier, _ in migrated.starting_near(ZURICH[0], ZURICH[1], 100)] == ["zurich"]
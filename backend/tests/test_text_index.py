@@ -0,0 +1,78 @@
+# backend/tests/test_text_index.py
+from datetime import datetime, timedelta
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+
+from app.text_index import RouteTextIndex, fold_text, query_trigrams
+
+
+_seconds = count()
+
+
+def _route(start_text, end_text):
+    created_at = datetime(2024, 5, 1) + timedelta(seconds=next(_seconds))
+    return SimpleNamespace(start_text=start_text, end_text=end_text, created_at=created_at)
+
+
+@pytest.fixture()
+def index():
+    index = RouteTextIndex()
+    index.add("001", _route("Zürich HB, Schweiz", "Bern Bahnhof, Schweiz"))
+    index.add("002", _route("Zürichberg", "Uetliberg"))
+    index.add("003", _route("Basel SBB", "Genève Cornavin"))
+    index.add("004", _route("Straße des 17. Juni", "Bahnhofstrasse"))
+    return index
+
+
+def test_fold_text_removes_diacritics_and_punctuation():
+    assert fold_text("  Zürich HB,  Genève–Cornavin ") == "zurich hb geneve cornavin"
+    assert fold_text("Straße") == "strasse"
+    assert query_trigrams("zu") == {"  z", " zu"}
+
+
+def test_search_ranks_whole_word_matches_first(index):
+    results = index.search("zurich", limit=10)
+    assert [identifier for identifier, _ in results] == ["002", "001"]
+    assert results[0][1] == 1.0
+
+    # Wortanfang unvollständig getippt
+    assert [identifier for identifier, _ in index.search("bahnh", limit=10)] == ["004", "001"]
+    assert [identifier for identifier, _ in index.search("geneve", limit=10)] == ["003"]
+    assert [identifier for identifier, _ in index.search("strasse", limit=1)] == ["004"]
+
+
+def test_search_tolerates_typos_and_respects_threshold(index):
+    assert index.search("zurch", limit=10)[0][0] in ("001", "002")
+    assert index.search("zurch", limit=10, min_similarity=0.9) == []
+    assert index.search("!!!", limit=10) == []
+
+
+def test_remove_drops_postings(index):
+    index.remove("003")
+    index.remove("003")
+    assert index.search("basel", limit=10) == []
+    assert all("bas" not in postings for postings in index.postings)
+    assert len(index) == 3
+    assert index.rebuild([("005", _route("Luzern", "Zug"))]) == 1
+    assert [identifier for identifier, _ in index.search("luz", limit=10)] == ["005"]
+
+
+def test_equal_scores_rank_newer_routes_first():
+    index = RouteTextIndex()
+    # Kennungen sind zufällig, die Reihenfolge kommt aus created_at
+    index.add("f0", _route("Luzern", "Zug"))
+    index.add("a0", _route("Luzern", "Zug"))
+    assert [identifier for identifier, _ in index.search("luzern", limit=10)] == ["a0", "f0"]
+
+
+def test_postings_are_sharded_by_identifier():
+    index = RouteTextIndex()
+    for number in range(64):
+        index.add(f"{number:032x}", _route("Zürich HB", "Bern"))
+    used = [postings for postings in index.postings if "zur" in postings]
+    # gleiche Trigramme, aber verschiedene Posting-Bäume je nach Kennung
+    assert len(used) > len(index.postings) // 2
+    assert sum(len(postings["zur"]) for postings in used) == 64
+    assert len(index.search("zurich", limit=100)) == 64
@@ -0,0 +1,78 @@
+# backend/tests/test_top_searches.py
+import random
+
+from app.top_searches import SpaceSaving, TopSearches
+
+
+def test_space_saving_keeps_heavy_hitters_in_fixed_memory():
+    summary = SpaceSaving(capacity=20)
+    generator = random.Random(7)
+    for _ in range(5000):
+        summary.add("zürich", "Zürich")
+        summary.add("bern", "Bern")
+        # viele seltene Begriffe, die sich gegenseitig verdrängen
+        rare = f"ort-{generator.randrange(10_000)}"
+        summary.add(rare, rare)
+    assert len(summary) == 20
+    top = summary.top(2)
+    assert [item["key"] for item in top] == ["zürich", "bern"] or [item["key"] for item in top] == ["bern", "zürich"]
+    for item in top:
+        # Zähler sind Obergrenzen: count - error ≤ tatsächliche Anzahl ≤ count
+        assert item["count"] - item["error"] <= 5000 <= item["count"]
+
+
+def test_space_saving_replaces_minimum_and_inherits_its_count():
+    summary = SpaceSaving(capacity=2)
+    summary.add("a", "A", weight=5)
+    summary.add("b", "B", weight=2)
+    summary.add("c", "C")
+    assert {item["key"]: (item["count"], item["error"]) for item in summary.top(5)} == {"a": (5, 0), "c": (3, 2)}
+
+
+def test_space_saving_merge_sums_and_trims_to_capacity():
+    first = SpaceSaving(capacity=2)
+    first.add("a", "A", weight=3)
+    first.add("b", "B", weight=1)
+    second = SpaceSaving(capacity=2)
+    second.add("b", "B", weight=4)
+    second.add("c", "C", weight=2)
+    first.merge(second.entries())
+    assert [(item["key"], item["count"]) for item in first.top(5)] == [("b", 5), ("a", 3)]
+
+
+def test_top_searches_pending_counts_survive_failed_write():
+    top_searches = TopSearches(capacity=10)
+    top_searches.record("zürich", "Zürich")
+    pending = top_searches.take_pending()
+    top_searches.record("zürich", "Zürich")
+    top_searches.restore_pending(pending)
+    assert top_searches.take_pending() == {"zürich": [2, 0, "Zürich"]}
+
+    root = {}
+    entries = top_searches.write(root, {"bern": [3, 0, "Bern"]})
+    entries = top_searches.write(root, {"bern": [1, 0, "Bern"]})
+    assert entries == {"bern": [4, 0, "Bern"]}
+    top_searches.replace_summary(entries)
+    assert top_searches.top(1)[0]["count"] == 4
+    assert top_searches.stats()["flushes"] == 1
+
+
+def test_space_saving_buckets_stay_ordered_by_count():
+    summary = SpaceSaving(capacity=50)
+    generator = random.Random(3)
+    counts = {}
+    for _ in range(3000):
+        key = f"q{int(generator.paretovariate(1.2)) % 40}"
+        weight = generator.choice((1, 1, 1, 3))
+        summary.add(key, key, weight=weight)
+        counts[key] = counts.get(key, 0) + weight
+    top = summary.top(10)
+    assert [item["count"] for item in top] == sorted(counts.values(), reverse=True)[:10]
+    # die Bucket-Liste ist in beide Richtungen aufsteigend bzw. absteigend verkettet
+    bucket, seen = summary._smallest, []
+    while bucket is not None:
+        assert bucket.keys and (bucket.larger is None or bucket.larger.smaller is bucket)
+        seen.append(bucket.count)
+        bucket = bucket.larger
+    assert seen == sorted(set(counts.values()))
+    assert summary.top(0) == [] and len(summary.top(100)) == len(counts)
@@ -0,0 +1,109 @@
+# backend/tests/test_transactions.py
+import threading
+
+import pytest
+import transaction
+from persistent import Persistent
+from ZODB import DB
+from ZODB.POSException import ConflictError
+
+from app.identifiers import new_route_identifier
+from app.transactions import TransactionStatistics, run_in_transaction
+
+
+class _Counter(Persistent):
+    def __init__(self):
+        self.value = 0
+
+
+def _open(database):
+    return database.open(transaction_manager=transaction.TransactionManager())
+
+
+def test_run_in_transaction_retries_conflicts():
+    database = DB(None)
+    connection = _open(database)
+    connection.root()["counter"] = _Counter()
+    connection.transaction_manager.commit()
+
+    other = _open(database)
+    statistics = TransactionStatistics()
+    calls = []
+
+    def increment():
+        calls.append(1)
+        if len(calls) == 1:
+            # gleichzeitiger Schreiber committet dazwischen → ConflictError beim eigenen Commit
+            other.transaction_manager.begin()
+            other.root()["counter"].value += 10
+            other.transaction_manager.commit()
+        connection.root()["counter"].value += 1
+        return connection.root()["counter"].value
+
+    result = run_in_transaction(
+        connection.transaction_manager, increment, attempts=3, backoff_seconds=0,
+        statistics=statistics, sleep=lambda seconds: None,
+    )
+    assert result == 11
+    assert len(calls) == 2
+    assert statistics.stats() == {"commits": 1, "conflicts": 1, "retries": 1, "failures": 0}
+    database.close()
+
+
+def test_run_in_transaction_gives_up_after_attempts():
+    statistics = TransactionStatistics()
+    delays = []
+
+    def always_conflicting():
+        raise ConflictError()
+
+    with pytest.raises(ConflictError):
+        run_in_transaction(
+            transaction.TransactionManager(), always_conflicting, attempts=5, backoff_seconds=0.1,
+            statistics=statistics, sleep=delays.append, max_backoff_seconds=0.3,
+        )
+    assert statistics.stats() == {"commits": 0, "conflicts": 5, "retries": 4, "failures": 1}
+    # exponentieller Backoff mit Jitter: höchstens 0.1 s, 0.2 s, dann gedeckelt auf 0.3 s
+    assert 0 <= delays[0] <= 0.1 and 0 <= delays[1] <= 0.2
+    assert all(0 <= delay <= 0.3 for delay in delays[2:]) and len(delays) == 4
+
+
+
+def test_run_in_transaction_holds_the_lock_per_attempt():
+    lock = threading.Lock()
+    held_during_work = []
+    held_during_backoff = []
+
+    def conflicting_once():
+        held_during_work.append(lock.locked())
+        if len(held_during_work) == 1:
+            raise ConflictError()
+        return "done"
+
+    result = run_in_transaction(
+        transaction.TransactionManager(), conflicting_once, attempts=3, backoff_seconds=0.1,
+        statistics=TransactionStatistics(), sleep=lambda seconds: held_during_backoff.append(lock.locked()),
+        lock=lock,
+    )
+    assert result == "done"
+    # andere Schreiber kommen während des Backoffs dran
+    assert held_during_work == [True, True] and held_during_backoff == [False]
+    assert not lock.locked()
+
+def test_route_identifiers_are_unique_and_spread():
+    identifiers = []
+
+    def generate():
+        identifiers.extend(new_route_identifier() for _ in range(500))
+
+    threads = [threading.Thread(target=generate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(identifiers)) == 2000
+    assert all(len(identifier) == 32 for identifier in identifiers)
+    # nacheinander erzeugte Kennungen liegen nicht nebeneinander im BTree
+    assert len({identifier[0] for identifier in identifiers[:100]}) > 8
+    assert identifiers[:100] != sorted(identifiers[:100])
@@ -0,0 +1,178 @@
+# backend/tests/test_zeo.py
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+from contextlib import contextmanager
+
+import pytest
+import transaction
+
+from app.storage import parse_zeo_address
+
+ZEO = pytest.importorskip("ZEO")
+
+PROCESSES = 4
+ROUTES_PER_PROCESS = 25
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configure_zeo_environment(zeo_address, cache_dir, database_file):
+    os.environ.update(
+        STORAGE_MODE="zeo",
+        ZEO_ADDRESS=zeo_address,
+        ZEO_CLIENT_CACHE_DIR=cache_dir,
+        DATABASE_FILE=database_file,
+        ORS_API_KEY="test-key-not-used",
+    )
+
+
+def _route_in(main, text):
+    return main.RouteIn(
+        start_text=text,
+        end_text="Ziel",
+        start_coordinates={"longitude": 8.5, "latitude": 47.3},
+        end_coordinates={"longitude": 7.4, "latitude": 46.9},
+        distance_meters=1000.0,
+        duration_seconds=60.0,
+        geometry_encoded=None,
+        profile="driving-car",
+    )
+
+
+def _write_routes(process_number, zeo_address, cache_dir, database_file):
+    """Läuft in einem eigenen Prozess: Start wie im Lifespan, dann Anlegen über den Schreibpfad der App."""
+    _configure_zeo_environment(zeo_address, cache_dir, database_file)
+    from fastapi import HTTPException
+    from app import main
+
+    main.ensure_route_indexes()
+    unavailable = 0
+    for index in range(ROUTES_PER_PROCESS):
+        route_in = _route_in(main, f"Start process-{process_number}-{index:03d}")
+        with main.open_connection() as connection:
+            try:
+                main.write_transaction(connection, lambda: main._store_routes(connection, [route_in]))
+            except HTTPException:
+                unavailable += 1
+    return unavailable, main._write_statistics.stats()
+
+
+def _count_routes(zeo_address, cache_dir, database_file):
+    _configure_zeo_environment(zeo_address, cache_dir, database_file)
+    from app import main
+
+    with main.open_connection() as connection:
+        root = connection.root()
+        routes_store = main.get_routes_store(existing_connection=connection)
+        return (
+            sorted(route.start_text for route in routes_store.values()),
+            len(main.get_route_indexes(root, routes_store)),
+            len(main.get_route_text_index(root, routes_store).search("process", 1000, 0.0)),
+        )
+
+
+@contextmanager
+def _zeo_server(tmp_path):
+    # Wie der Launcher: runzeo als eigener Prozess mit backend als Arbeitsverzeichnis, ohne
+    # ORS_API_KEY und mit derselben Datenbankdatei in DATABASE_FILE wie die App
+    from app.launcher import _wait_for_port, _zeo_server_command
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    zeo_address = f"127.0.0.1:{port}"
+    database_file = str(tmp_path / "zeo.fs")
+    environment = {key: value for key, value in os.environ.items() if key != "ORS_API_KEY"}
+    environment.update(DATABASE_FILE=database_file, ORS_API_KEY="")
+    server = subprocess.Popen(
+        _zeo_server_command(zeo_address, database_file, None),
+        cwd=BACKEND_DIR,
+        env=environment,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    try:
+        _wait_for_port("127.0.0.1", port, timeout_seconds=30)
+        yield zeo_address, database_file
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+    log = server.stdout.read()
+    server.stdout.close()
+    assert "Unexpected error while trying to resolve conflict" not in log, log
+
+
+def test_concurrent_writes_from_several_processes(tmp_path):
+    cache_dir = str(tmp_path / "zeo-cache")
+    with _zeo_server(tmp_path) as (zeo_address, database_file):
+        # frische Datenbank: alle Worker legen beim Start gleichzeitig Store und Indizes an
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(PROCESSES) as pool:
+            results = pool.starmap(
+                _write_routes,
+                [(number, zeo_address, cache_dir, database_file) for number in range(PROCESSES)],
+            )
+        # Frischer Prozess zum Zählen: Invalidierungen erreichen bestehende Clients asynchron
+        with context.Pool(1) as pool:
+            texts, indexed, found = pool.apply(_count_routes, (zeo_address, cache_dir, database_file))
+
+    # kein Schreibzugriff ist mit 503 bzw. einem Konflikt beim Client gescheitert
+    assert [unavailable for unavailable, _ in results] == [0] * PROCESSES
+    assert [stats["failures"] for _, stats in results] == [0] * PROCESSES
+    assert len(texts) == indexed == found == PROCESSES * ROUTES_PER_PROCESS
+    assert texts[0] == "Start process-0-000"
+    # jeder Prozess hat einen eigenen persistenten Client-Cache belegt
+    assert len([name for name in os.listdir(cache_dir) if name.endswith(".zec")]) >= 2
+
+
+def test_disjoint_inserts_into_one_bucket_are_resolved_by_the_server(tmp_path):
+    from BTrees.OOBTree import OOBTree
+    from app import main
+
+    with _zeo_server(tmp_path) as (zeo_address, _):
+        database = ZEO.DB(parse_zeo_address(zeo_address))
+        try:
+            with database.transaction() as connection:
+                connection.root()["routes"] = OOBTree({"a": main.Route(**_route_in(main, "a").model_dump())})
+            first = database.open(transaction_manager=transaction.TransactionManager())
+            second = database.open(transaction_manager=transaction.TransactionManager())
+            for connection, key in ((first, "b"), (second, "c")):
+                connection.root()["routes"][key] = main.Route(**_route_in(main, key).model_dump())
+            first.transaction_manager.commit()
+            # gleicher Bucket, anderer Schlüssel → der Server führt beide Stände zusammen
+            second.transaction_manager.commit()
+            first.close()
+            second.close()
+            with database.transaction() as connection:
+                assert list(connection.root()["routes"].keys()) == ["a", "b", "c"]
+        finally:
+            database.close()
+
+
+def test_importing_the_app_has_no_side_effects(tmp_path):
+    # So importiert der ZEO-Server app.main zur Konfliktauflösung: ohne ORS_API_KEY und
+    # während er die Datenbankdatei selbst gesperrt hält
+    from ZODB.FileStorage import FileStorage
+
+    database_file = tmp_path / "locked.fs"
+    storage = FileStorage(str(database_file))
+    try:
+        environment = {key: value for key, value in os.environ.items() if key != "ORS_API_KEY"}
+        environment.update(DATABASE_FILE=str(database_file), ORS_API_KEY="")
+        completed = subprocess.run(
+            [
+                sys.executable, "-c",
+                "from app import main, models; "
+                "assert main.Route is models.Route and main._database is None",
+            ],
+            cwd=BACKEND_DIR,
+            env=environment,
+            capture_output=True,
+            text=True,
+        )
+        assert completed.returncode == 0, completed.stderr
+    finally:
+        storage.close()
@@ -23,6 +23,7 @@ const zielSug = document.getElementById('ziel-suggestions');
 const form = document.getElementById('route-form');
 const topList = document.getElementById('top-list');
 const savedList = document.getElementById('saved-list');
+const savedSearch = document.getElementById('saved-search');
 
 // ==============================
 // Helpers
@@ -53,18 +54,22 @@ function showSuggestions(listElem, items, onPick) {
   listElem.style.display = 'block';
 }
 
-function addTopSearch(key) {
-  const stats = JSON.parse(localStorage.getItem("topSearches") || "{}");
-  stats[key] = (stats[key] || 0) + 1;
-  localStorage.setItem("topSearches", JSON.stringify(stats));
+// Top-Suchanfragen werden im Backend über alle Nutzer gezählt
+async function addTopSearch(startText, endText) {
+  await fetch(API_BASE + "/api/searches", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ start_text: startText, end_text: endText })
+  });
   renderTopSearches();
 }
 
-function renderTopSearches() {
-  const stats = JSON.parse(localStorage.getItem("topSearches") || "{}");
-  const arr = Object.entries(stats).sort((a,b) => b[1]-a[1]).slice(0,10);
+async function renderTopSearches() {
+  const r = await fetch(API_BASE + "/api/searches/top?limit=10");
+  if (!r.ok) return;
+  const items = await r.json();
   topList.innerHTML = "";
-  arr.forEach(([label, count]) => {
+  items.forEach(({ label, count }) => {
     const li = document.createElement("li");
     li.textContent = `${label} (${count})`;
     topList.appendChild(li);
@@ -135,15 +140,45 @@ function decodePolyline(encoded, precision = 1e-5) {
   return coordinates;
 }
 
-async function drawEncodedRoute(encodedGeometry) {
-  const latlon = decodePolyline(encodedGeometry); // [ [lat, lon], ... ]
+function drawRouteCoordinates(latlon, fitBounds = true) {
   if (!latlon.length) return;
-  const leafletCoords = latlon.map(p => [p[0], p[1]]);
   if (currentRouteLayer) currentRouteLayer.remove();
-  currentRouteLayer = L.polyline(leafletCoords, { weight: 6 }).addTo(map);
-  map.fitBounds(currentRouteLayer.getBounds(), { padding: [30,30] });
+  currentRouteLayer = L.polyline(latlon, { weight: 6 }).addTo(map);
+  if (fitBounds) map.fitBounds(currentRouteLayer.getBounds(), { padding: [30,30] });
+}
+
+async function drawEncodedRoute(encodedGeometry) {
+  shownRouteIdentifier = null;
+  drawRouteCoordinates(decodePolyline(encodedGeometry)); // [ [lat, lon], ... ]
 }
 
+// ==============================
+// Gespeicherte Routen: Geometrie passend zur Zoomstufe vom Backend
+// (serverseitig vereinfacht und dekodiert)
+// ==============================
+let shownRouteIdentifier = null;
+
+async function fetchRouteGeometry(identifier, zoom) {
+  const r = await fetch(`${API_BASE}/api/routes/${identifier}/geometry?zoom=${zoom}&format=coordinates`);
+  return r.ok ? r.json() : null;
+}
+
+async function showSavedRoute(identifier) {
+  const geometry = await fetchRouteGeometry(identifier, map.getZoom());
+  if (!geometry) return;
+  shownRouteIdentifier = identifier;
+  drawRouteCoordinates(geometry.coordinates);
+}
+
+map.on("zoomend", async () => {
+  if (!shownRouteIdentifier) return;
+  const identifier = shownRouteIdentifier;
+  const geometry = await fetchRouteGeometry(identifier, map.getZoom());
+  // inzwischen eine andere Route angezeigt → Antwort verwerfen
+  if (!geometry || identifier !== shownRouteIdentifier) return;
+  drawRouteCoordinates(geometry.coordinates, false);
+});
+
 // ==============================
 // Backend-CRUD (ZODB)
 // ==============================
@@ -156,10 +191,25 @@ async function saveRouteToBackend(routeInfo) {
   return r.ok ? r.json() : null;
 }
 
-async function refreshSavedRoutes() {
-  const r = await fetch(API_BASE + "/api/routes");
-  if (!r.ok) return;
-  const items = await r.json();
+// Gespeicherte Routen: einmal vollständig laden, danach nur noch die Änderungen
+// (GET /api/routes/changes bzw. Event-Stream) anwenden
+const savedRoutes = new Map();
+let changeToken = null;
+let changeStream = null;
+
+function renderSavedRoutes() {
+  // Mit Suchtext: Treffer der Textsuche im Backend, sonst die ganze Sammlung
+  if (savedSearch.value.trim()) {
+    searchSavedRoutes();
+    return;
+  }
+  // Kennungen sind zufällig → Reihenfolge über den Zeitstempel, neueste zuerst
+  const items = [...savedRoutes.values()];
+  items.sort((a, b) => (a.created_at < b.created_at ? 1 : a.created_at > b.created_at ? -1 : 0));
+  renderSavedList(items);
+}
+
+function renderSavedList(items) {
   savedList.innerHTML = "";
   for (const it of items) {
     const li = document.createElement("li");
@@ -167,16 +217,12 @@ async function refreshSavedRoutes() {
     const showBtn = document.createElement("button");
     showBtn.className = "primary";
     showBtn.textContent = "Anzeigen";
-    showBtn.addEventListener("click", async () => {
-      if (it.geometry_encoded) {
-        await drawEncodedRoute(it.geometry_encoded);
-      }
-    });
+    showBtn.addEventListener("click", () => showSavedRoute(it.identifier));
     const delBtn = document.createElement("button");
     delBtn.textContent = "Löschen";
     delBtn.addEventListener("click", async () => {
       await fetch(API_BASE + "/api/routes/" + it.identifier, { method: "DELETE" });
-      refreshSavedRoutes();
+      syncSavedRoutes();
     });
     li.appendChild(showBtn);
     li.appendChild(delBtn);
@@ -184,6 +230,62 @@ async function refreshSavedRoutes() {
   }
 }
 
+async function searchSavedRoutes() {
+  const q = savedSearch.value.trim();
+  const r = await fetch(API_BASE + "/api/routes/search?limit=50&q=" + encodeURIComponent(q));
+  // inzwischen weitergetippt → veraltetes Ergebnis verwerfen
+  if (!r.ok || savedSearch.value.trim() !== q) return;
+  renderSavedList(await r.json());
+}
+
+function applyRouteChanges(result) {
+  // Tokens sind gleich lange Hex-Strings; ältere Antworten (Stream und Abfrage überholen sich) ignorieren
+  if (changeToken !== null && result.token <= changeToken) return;
+  for (const change of result.changes) {
+    if (change.kind === "deleted") savedRoutes.delete(change.identifier);
+    else if (change.route) savedRoutes.set(change.identifier, change.route);
+  }
+  changeToken = result.token;
+  renderSavedRoutes();
+}
+
+async function refreshSavedRoutes() {
+  // Token vor der Liste holen: was dazwischen passiert, kommt danach nochmals (doppelt ist harmlos).
+  // Liste ohne Geometrien; die Geometrie wird erst beim Anzeigen geladen
+  const t = await fetch(API_BASE + "/api/routes/changes");
+  const r = await fetch(API_BASE + "/api/routes?include_geometry=false");
+  if (!t.ok || !r.ok) return;
+  changeToken = (await t.json()).token;
+  savedRoutes.clear();
+  for (const it of await r.json()) savedRoutes.set(it.identifier, it);
+  renderSavedRoutes();
+  listenForRouteChanges();
+}
+
+async function syncSavedRoutes() {
+  if (changeToken === null) return refreshSavedRoutes();
+  let more = true;
+  while (more) {
+    const r = await fetch(API_BASE + "/api/routes/changes?since=" + changeToken);
+    if (r.status === 410) return refreshSavedRoutes(); // Token zu alt
+    if (!r.ok) return;
+    const result = await r.json();
+    applyRouteChanges(result);
+    more = result.more;
+  }
+}
+
+function listenForRouteChanges() {
+  // Änderungen anderer Clients kommen per Server-Sent Events, ohne Polling
+  if (changeStream) changeStream.close();
+  if (typeof EventSource === "undefined") return;
+  changeStream = new EventSource(API_BASE + "/api/routes/changes/stream?since=" + changeToken);
+  changeStream.addEventListener("changes", e => applyRouteChanges(JSON.parse(e.data)));
+  changeStream.addEventListener("resync", () => refreshSavedRoutes());
+}
+
+savedSearch.addEventListener('input', debounce(renderSavedRoutes, 250));
+
 // ==============================
 // Autocomplete-Bindings
 // ==============================
@@ -258,8 +360,8 @@ form.addEventListener('submit', async (e) => {
     await drawEncodedRoute(route.geometry); // encoded string
   }
 
-  // Top-10 lokal hochzählen
-  addTopSearch(`${startText} → ${zielText}`);
+  // Top-10 im Backend hochzählen
+  addTopSearch(startText, zielText);
 
   // In Backend speichern
   const dist = route.summary?.distance ?? null;
@@ -277,7 +379,7 @@ form.addEventListener('submit', async (e) => {
   };
 
   const saved = await saveRouteToBackend(payload);
-  if (saved) refreshSavedRoutes();
+  if (saved) syncSavedRoutes();
 });
 
 // ==============================
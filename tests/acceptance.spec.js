@@ -65,7 +65,7 @@ test.describe('Akzeptanztest – MapsLite', () => {
     await expect(target).toHaveCount(1);
     const loeschenBtn = target.getByRole('button', { name: /löschen/i });
     const waitDelete = page.waitForResponse(
-      r => /\/api\/routes\/\d+$/.test(r.url()) && r.request().method() === 'DELETE',
+      r => /\/api\/routes\/[^/]+$/.test(r.url()) && r.request().method() === 'DELETE',
       { timeout: 30_000 }
     );
     await loeschenBtn.click();